@@ -20,35 +20,20 @@ __email__ = 'dn220@yahoo.com'
 import os
 import sys
 import re
-
-#
-# VMware pyvmomi
-#
 import ssl
-import requests
-
-#
-# VMware pyvmomi API 0:wbinding
-#
-from pyVim.connect import SmartConnect
-from pyVmomi import vim
-from vmware.vapi.lib.connect import get_requests_connector
-from vmware.vapi.security.session import create_session_security_context
-from vmware.vapi.security.user_password import create_user_password_security_context
-from vmware.vapi.stdlib.client.factories import StubConfigurationFactory
 
 #
-# VMware pyvmomi vAPI 0:wbinding
-#   For connectivity to Inventory Services for Tag
+# The VMware modules are heavy to load, they are imported where they are used:
 #
-from com.vmware.cis.tagging_client import (Category, Tag, TagAssociation)
-from com.vmware.cis_client import Session
-from com.vmware.vapi.std_client import DynamicID
-
+#   pyvmomi (pyVim, pyVmomi)
+#       when a vcenter call is about to happen
+#   vAPI runtime, requests
+#       when logging into the inventory service
+#   vAPI bindings (com.vmware.cis.tagging_client, ...)
+#       only by the tag and category actions
 #
-# Disable urllib warning
+# so that vcli -h, encrypt/decrypt and argument errors never load them.
 #
-requests.packages.urllib3.disable_warnings()
 
 
 class VCLI(object):
@@ -62,6 +47,13 @@ class VCLI(object):
     _args = None
     _conf = None
 
+    #
+    # parsed conf files, {path: (mtime, data)}, and derived AES key,
+    # shared by the process
+    #
+    _confData = {}
+    _aesKey = None
+
     #
     # VMware pyvmoni Service Interface
     #
@@ -76,6 +68,112 @@ class VCLI(object):
     _username = None
     _password = None
 
+    #
+    # password that succeeded on the first login,
+    # reused by the other endpoint when it is needed later
+    #
+    _secret = None
+
+    #
+    # opt-in persistent session cache, see .vcli.conf session_cache
+    #
+    _sessionCache = None
+
+    #
+    # property collector page size (maxObjects), see .vcli.conf page_size
+    #
+    _pageSize = None
+
+    #
+    # opt-in local vm name index, see .vcli.conf vm_index
+    #
+    _vmIndex = None
+
+    #
+    # inventory cache time to live (seconds), see .vcli.conf inventory_ttl
+    #
+    _inventoryTtl = None
+
+    #
+    # keep the inventory cache current with property collector
+    # updates, see .vcli.conf inventory_sync
+    #
+    _inventorySync = None
+
+    #
+    # cached inventory files read by this process, {file: (mtime, inventory)}
+    #
+    _inventoryMemo = {}
+
+    #
+    # retrievals made by the current command, reused by later helper
+    # calls, {(types, roots): {'specs', 'properties', 'objects', 'dirty'}}
+    #
+    _requestInventory = None
+
+    #
+    # keep full retrievals in _requestInventory, set in _dispatch() for
+    # the actions that look the same objects up again (add, clone);
+    # single pass listings release each page once converted
+    #
+    _memoize = False
+
+    #
+    # dv portgroups of the current command, see _getPortgroupIndex()
+    #
+    _portgroupIndex = None
+
+    #
+    # lazy property reads of vms, hosts and datastores kept for the
+    # current command, {(type, moId): {property: value}}, see _cacheStub().
+    # One dict per instance, made in __init__()
+    #
+    _propertyCache = None
+    _propertyHits = 0
+    _propertyFetches = 0
+
+    #
+    # vcli --trace-fetches, {(caller, object.property): [count, seconds]}
+    #
+    _fetchTrace = None
+
+    #
+    # vcli --stats, counters and phase times of the current command
+    #
+    _stats = None
+    _statsPhase = None
+
+    #
+    # time spent reading .vcli.conf in the constructor
+    #
+    _configTime = 0.0
+
+    #
+    # vcli --record DIR / --replay DIR, see Cassette
+    #
+    _cassette = None
+
+    #
+    # vcli daemon, last time the sessions were checked
+    #
+    _sessionChecked = 0
+
+    #
+    # vcli daemon, True while a forwarded command runs, see _serve()
+    #
+    _serving = False
+
+    #
+    # opt-in parallel retrieval (processes), see .vcli.conf parallel
+    #
+    _parallel = None
+
+    #
+    # vcenter backend, 'fake' for the in-memory one of VCLIFake.py,
+    # see .vcli.conf backend
+    #
+    _backend = None
+
     #
     # timestamp
     #
@@ -468,6 +566,14 @@ class VCLI(object):
         server2         Off    1    4     74    No  No   Test server 2
         server3         Off    1    4     74    No  No   Test server 3
         # Total:  4
+
+    Example 2
+    ---------
+        Display the virtual machines of cluster 'prod' only.  Only the
+        vm under the matching datacenter, folder, cluster or host are
+        retrieved from vcenter.
+
+        [user ~]$ vcli list vm -C prod
     '''
 
     ## ---------- ---------- ---------- ----------
@@ -889,11 +995,41 @@ class VCLI(object):
 
     '''
 
+    ## ---------- ---------- ---------- ----------
+    #  vcli.py daemon -h
+    _helpDaemonSynopsis = '''SSYYNNOOPPSSIISS
+    Run vcli as a daemon that keeps the vcenter sessions and inventory. '''
+    _helpDaemonDescription = '''DDEESSCCRRIIPPTTIIOONN
+    The daemon logs in once and listens on the UNIX socket ~/.vcli/daemon.sock
+    (mode 0600).  While it runs, vcli forwards every command to it and prints
+    the output, so commands do not pay for start up, logins and inventory
+    retrieval.  The daemon keeps its inventory current with property
+    collector updates.
+
+    Commands run one at a time, in the daemon.  encrypt, decrypt and daemon
+    always run locally.'''
+    _helpDaemonExample = '''EEXXAAMMPPLLEESS
+    Example 1
+    ---------
+        Start the daemon in the background, then list vm through it.
+        [user ~]$ vcli daemon &
+        [user ~]$ vcli list vm server
+
+    Example 2
+    ---------
+        Stop the daemon.
+        [user ~]$ vcli daemon --stop
+    '''
+
 
     #
     # class constructor
     #
     def __init__(self):
+        import time
+
+        _start = time.time()
+        self._propertyCache = {}
         _confs = ['{home}/.vcli.conf'.format(home=os.path.expanduser('~')), '/etc/.vcli.conf']
         for _conf in _confs:
             if os.path.isfile(_conf):
@@ -918,6 +1054,28 @@ class VCLI(object):
             self._username = self._getConf('username')
         if self._password is None:
             self._password = self._getConf('password')
+        if self._sessionCache is None:
+            self._sessionCache = self._getConf('session_cache')
+        if self._pageSize is None:
+            self._pageSize = self._getConf('page_size')
+        if self._vmIndex is None:
+            self._vmIndex = self._getConf('vm_index')
+        if self._inventoryTtl is None:
+            self._inventoryTtl = self._getConf('inventory_ttl')
+        if self._inventorySync is None:
+            self._inventorySync = self._getConf('inventory_sync')
+        if self._parallel is None:
+            self._parallel = self._getConf('parallel')
+        if self._backend is None:
+            self._backend = self._getConf('backend')
+
+        #
+        # fake vcenter, one per process, installed by the first VCLI
+        #
+        if self._backend == 'fake':
+            import VCLIFake
+            if VCLIFake.getBackend() is None:
+                VCLIFake.install(self._getConf(group='fake'))
 
         if self._host is None or self._host == '':
             self._print('VCenter host not defined in .vcli.conf config file.')
@@ -931,8 +1089,13 @@ class VCLI(object):
                 pass
 
         if self._ts is None:
-            from datetime import datetime
-            self._ts = str(datetime.now()).replace('-', '').replace(':', '').split('.')[0].replace(' ', '.').split('.')[0]
+            self._ts = self._getTimestamp()
+
+        self._configTime = time.time() - _start
+
+    def _getTimestamp(self):
+        from datetime import datetime
+        return str(datetime.now()).replace('-', '').replace(':', '').split('.')[0].replace(' ', '.').split('.')[0]
 
     #
     # class desstructor
@@ -946,38 +1109,135 @@ class VCLI(object):
     #  private methods
     #
 
+    #
+    # Load the YAML conf file, once per process
+    #
+    # All documents are merged into one {group: {field: value}}
+    # dictionary, later documents override earlier ones.
+    #
+    def _loadConf(self):
+        _conf = self._conf
+        try:
+            _mtime = os.path.getmtime(_conf) if _conf is not None else None
+        except OSError:
+            _mtime = None
+
+        # read again when HOME, or the file, changed
+        _memo = VCLI._confData.get(_conf)
+        if _memo is not None and _memo[0] == _mtime:
+            return _memo[1]
+
+        _data = {}
+        if _conf is not None and os.path.isfile(_conf):
+            try:
+                import yaml
+                _stream = open(_conf, 'r')
+                for _doc in yaml.safe_load_all(_stream):
+                    if not isinstance(_doc, dict):
+                        continue
+                    for _group in _doc:
+                        if isinstance(_doc[_group], dict):
+                            _data.setdefault(_group, {}).update(_doc[_group])
+                _stream.close()
+            except IOError:
+                _data = {}
+
+        VCLI._confData[_conf] = (_mtime, _data)
+        return _data
+
     #
     # Get YAML conf entry
+    #   field None returns all fields of the group
     #
     def _getConf(self, field=None, group=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _group = group if group is not None else 'vcenter'
         _field = field
 
+        _fields = self._loadConf().get(_group, {})
+        if _field is None:
+            return _fields
+
         # return value, default = None
-        _value = None
+        _value = _fields.get(_field)
+        self._print('{0}.{1} = {2}'.format(_group, _field, _value), 3)
 
-        _conf = self._conf
-        if os.path.isfile(_conf):
+        return _value
+
+    #
+    # Get (and create) the per user cache directory ~/.vcli
+    #
+    def _getCacheDir(self):
+        _dir = '{home}/.vcli'.format(home=os.path.expanduser('~'))
+        if not os.path.isdir(_dir):
             try:
-                import yaml
-                _stream = open(_conf, 'r')
-                _docs = yaml.load_all(_stream)
-                for _doc in _docs:
-                    if _group in _doc and _field in _doc[_group]:
-                        _value = _doc[_group][_field]
-                self._print('{0}.{1} = {2}'.format(_group, _field, _value), 3)
-            except IOError:
-                _value = None
+                os.makedirs(_dir, 0700)
+            except OSError:
+                return None
+        return _dir
 
-        return _value
+    #
+    # Persistent session cache
+    #
+    # The vcenter SOAP session cookie and the inventory service (vAPI)
+    # session id are kept in ~/.vcli/session.<username>@<host>-<port>,
+    # readable by the owner only.  Entries are validated before reuse
+    # and replaced after the next full login.
+    #
+    def _getSessionCacheFile(self):
+        if not self._sessionCache:
+            return None
+
+        _dir = self._getCacheDir()
+        if _dir is None:
+            return None
+
+        _key = '{username}@{host}-{port}'.format(username=self._username, host=self._host, port=self._port)
+        _key = re.sub('[^0-9A-Za-z@._-]', '_', _key)
+
+        return '{dir}/session.{key}'.format(dir=_dir, key=_key)
+
+    def _loadSession(self, field):
+        _file = self._getSessionCacheFile()
+        if _file is None or not os.path.isfile(_file):
+            return None
+
+        import json
+        try:
+            _session = json.load(open(_file, 'r'))
+        except (IOError, ValueError):
+            return None
+
+        return _session.get(field) if isinstance(_session, dict) else None
+
+    def _saveSession(self, **fields):
+        _file = self._getSessionCacheFile()
+        if _file is None:
+            return None
+
+        import json
+        _session = {}
+        if os.path.isfile(_file):
+            try:
+                _session = json.load(open(_file, 'r'))
+            except (IOError, ValueError):
+                _session = {}
+        _session.update(fields)
+
+        try:
+            _fd = os.open(_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0600)
+            os.fchmod(_fd, 0600)
+            _hndl = os.fdopen(_fd, 'w')
+            json.dump(_session, _hndl)
+            _hndl.close()
+        except (IOError, OSError):
+            self._print('Unable to save session cache {0}'.format(_file), 1)
+            return None
+
+        return _file
 
     ## ---------- ---------- ---------- ----------
     # Debug function
     def _printObject(self, obj, title=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         from pprint import pprint
 
         _title = title
@@ -1018,14 +1278,57 @@ class VCLI(object):
             elif _verbose is not None and _verbose and _verbose >= _verbosity and _verbosity == 1:
                 print _line
             elif _verbose is not None and _verbose and _verbose >= _verbosity:
-                print '[{caller:<12}][{verbosity}]  {line}'.format(caller=sys._getframe(2).f_code.co_name + '()', verbosity=_verbosity, line=_line)
+                # report the caller, skipping the tracing wrappers
+                _caller = sys._getframe(2)
+                while _caller.f_code.co_name == '_tracer' and _caller.f_back is not None:
+                    _caller = _caller.f_back
+                print '[{caller:<12}][{verbosity}]  {line}'.format(caller=_caller.f_code.co_name + '()', verbosity=_verbosity, line=_line)
 
         except IOError:
             sys.exit(9)
 
-    def _printCsv(self, row):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+    ## ---------- ---------- ---------- ----------
+    #
+    # call tracing, vcli ... -vvv
+    #
+    # Tracing costs nothing when it is off.  The private methods are
+    # only wrapped, on this instance, by _enableTracing() once the
+    # verbosity is known to be at least _traceLevel.  Each traced call
+    # prints its name and arguments, e.g.
+    #   [_listVirtualMachine()][3]  _getVmObjects(names="None", match="None")
+    #
+    _traceLevel = 3
+
+    def _enableTracing(self):
+        import inspect
+
+        for _name in dir(self.__class__):
+            if not _name.startswith('_') or _name.startswith('__'):
+                continue
+            if _name in ['_print', '_enableTracing', '_traced', '_trace']:
+                continue
+            _method = getattr(self, _name)
+            if not inspect.ismethod(_method):
+                continue
+            setattr(self, _name, self._traced(_method))
+
+    def _traced(self, method):
+        _method = method
+
+        def _tracer(*args, **kwargs):
+            self._trace(_method, args, kwargs)
+            return _method(*args, **kwargs)
+
+        return _tracer
+
+    def _trace(self, method, args, kwargs):
+        import inspect
+
+        _callArgs = inspect.getcallargs(method, *args, **kwargs)
+        _args = ', '.join(['''{0}="{1}"'''.format(_arg, _callArgs[_arg]) for _arg in inspect.getargspec(method).args if _arg != 'self'])
+        self._print('{func}({args})'.format(func=method.__name__, args=_args), self._traceLevel)
 
+    def _printCsv(self, row):
         _row = row
 
         #
@@ -1041,8 +1344,6 @@ class VCLI(object):
             self._csvWriter.writerow(_row)
 
     def _printRow(self, row=None, fmt=None, verbosity=0):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _row = row
         _fmt = fmt
         _verbosity = verbosity
@@ -1142,8 +1443,6 @@ class VCLI(object):
         return _fmt
 
     def _confirm(self):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _proceed = None
 
         return _proceed
@@ -1151,9 +1450,7 @@ class VCLI(object):
     #
     # Define the CLI arguments
     #
-    def _parseArguments(self):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
+    def _parseArguments(self, argv=None):
         import argparse
 
         # application parseri
@@ -1164,6 +1461,16 @@ class VCLI(object):
         _spAction = _parser.add_subparsers(title='Action', dest='action', help='VM Informational Actions')
         _grpSep = _spAction.add_parser('', help='------------------------')
 
+        # instrumentation, given before the action
+        _parser.add_argument('--trace-fetches', dest='trace-fetches', action='store_true', help='Record every vcenter round trip and print a ranked summary at exit')
+        _optStats = _parser.add_mutually_exclusive_group()
+        _optStats.add_argument('--stats', action='store_true', help='Print API calls, bytes, time per phase and peak RSS at exit')
+        _optStats.add_argument('--stats-json', dest='stats-json', action='store_true', help='As --stats, as one JSON object')
+        _parser.add_argument('--profile', metavar='FILE', help='Write cProfile stats of the command to FILE, and print the time per phase')
+        _optCassette = _parser.add_mutually_exclusive_group()
+        _optCassette.add_argument('--record', metavar='DIR', help='Record every SOAP and vAPI exchange of the command in DIR')
+        _optCassette.add_argument('--replay', metavar='DIR', help='Answer the command from the exchanges recorded in DIR, without vcenter')
+
         # option groups
 
         # general authentication options
@@ -1238,12 +1545,23 @@ class VCLI(object):
         _optListGeneral = _optList.add_argument_group(title='General List Options')
         _optListGeneral.add_argument('-l', '--long', default=None, action='store_true', help='Include detail information')
         _optListGeneral.add_argument('-m', '--match', default=None, action='store_true', help='Match argument')
+        _optListGeneral.add_argument('-g', '--glob', default=None, action='store_true', help='Arguments are glob patterns, e.g. web-??')
+        _optListGeneral.add_argument('-r', '--regex', default=None, action='store_true', help='Arguments are regular expressions')
+        _optListGeneral.add_argument('--max', type=int, metavar='COUNT', help='Stop after COUNT rows')
         _optListGeneral.add_argument('-X', '--csv', metavar='OUTFILE', help='Write output in comma separated value (CSV) format to CSV file')
 
+        # inventory cache
+        _optListGroupCache = _optList.add_argument_group(title='List Cache Options')
+        _optListGroupCacheMutex = _optListGroupCache.add_mutually_exclusive_group()
+        _optListGroupCacheMutex.add_argument('--cached', default=None, action='store_true', help='Use the cached inventory only, whatever its age.  Works without vcenter.')
+        _optListGroupCacheMutex.add_argument('--refresh', default=None, action='store_true', help='Ignore the cached inventory and retrieve it again')
+
         _optListVm = argparse.ArgumentParser(add_help=False)
         _optListVmGeneral = _optListVm.add_argument_group(title='General VM List Options')
         _optListVmGeneral.add_argument('-C', '--cluster', help='Show Vms in CLUSTER')
         _optListVmGeneral.add_argument('-H', '--host', help='Show Vms in ESXi HOST')
+        _optListVmGeneral.add_argument('-d', '--datacenter', help='Show Vms in DATACENTER')
+        _optListVmGeneral.add_argument('-F', '--folder', help='Show Vms in FOLDER')
         _optListVmGeneral.add_argument('-O', '--os', default='linux', choices=['all', 'linux', 'windows'], help='Where applicable, filter by Operating System (OS).  Default = linux')
 
         _grpSep = _spList.add_parser('', help=None)
@@ -1736,8 +2054,19 @@ class VCLI(object):
         _grpEncryptArgument = _grpEncrypt.add_argument_group(title='Encrypt Argument')
         _grpEncryptArgument.add_argument('password', nargs='?', help='Password to encrypt, plaintext or filename')
 
+        ## ---------- ---------- ---------- ----------
+        # vcli.py daemon
+        #
+        _grpDaemon = _spAction.add_parser('daemon', help='Keep sessions and inventory in a daemon, see the help for further instruction.',
+            description=self._helpDaemonSynopsis,
+            epilog='{description}\n\n{example}'.format(description=self._helpDaemonDescription, example=self._helpDaemonExample),
+            formatter_class=argparse.RawDescriptionHelpFormatter)
+        _grpDaemonOption = _grpDaemon.add_argument_group(title='Daemon Options')
+        _grpDaemonOption.add_argument('--stop', default=None, action='store_true', help='Stop the running daemon')
+        _grpDaemonOption.add_argument('-v', '--verbose', default=0, action='count', help='increase verbosity')
+
 
-        _args = _parser.parse_args()
+        _args = _parser.parse_args(argv)
 
         return _args
 
@@ -1748,8 +2077,6 @@ class VCLI(object):
     # AES 256 encryption/decryption using pycrypto library
     #
     def _decrypt(self, cipher):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         try:
             _cipher = cipher
             _action = 'decrypt'
@@ -1759,22 +2086,35 @@ class VCLI(object):
 
         return _password
 
-    def _encrypt(self, data, action='encrypt'):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+    #
+    # AES key, derived once per process
+    #
+    def _getKey(self):
+        if VCLI._aesKey is not None:
+            return VCLI._aesKey
+
+        from Crypto.Protocol.KDF import PBKDF2
 
+        _pwd = 'Pink is the new black'
+
+        _salt = b'''Wife said your money is my money'''
+        _kdf = PBKDF2(_pwd, _salt, 64, 2048)
+        VCLI._aesKey = _kdf[:32]
+
+        return VCLI._aesKey
+
+    def _encrypt(self, data, action='encrypt'):
         import base64
         from Crypto.Cipher import AES
         from Crypto import Random
-        from Crypto.Protocol.KDF import PBKDF2
 
         _data = data
         _action = action
         _outfile = getattr(self._args, 'outfile') if hasattr(self._args, 'outfile') else None
 
         if _data is None:
-            import getpass
             _prompt = 'Password to Encrypt:  ' if _action == 'encrypt' else 'Password:  '
-            _data = getpass.getpass(_prompt)
+            _data = self._askPassword(_prompt)
 
         if os.path.isfile(_data):
             _data = open(_data, 'r').read()
@@ -1783,12 +2123,7 @@ class VCLI(object):
         _pad = lambda _s: _s + (_bs - len(_s) % _bs) * chr(_bs - len(_s) % _bs)
         _unpad = lambda _s: _s[:-ord(_s[len(_s) - 1:])]
 
-        _pwd = 'Pink is the new black'
-
-        _salt = b'''Wife said your money is my money'''
-        _kdf = PBKDF2(_pwd, _salt, 64, 2048)
-        _key = _kdf[:32]
-
+        _key = self._getKey()
 
         if action == 'encrypt':
             _data = _pad(_data)
@@ -1816,13 +2151,29 @@ class VCLI(object):
 
         return _data
 
-    def _loginVcenter(self):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+    #
+    # Prompt for the password.  Not in the daemon, its tty is not the
+    # client's, the forwarded command fails instead.
+    #
+    def _askPassword(self, prompt):
+        import getpass
+
+        if self._serving:
+            self._print('The vcli daemon cannot prompt for the password, restart it with vcli daemon --stop; vcli daemon &')
+            sys.exit(1)
+
+        return getpass.getpass(prompt)
 
+    def _loginVcenter(self):
         if self._si is not None:
             self._print('Already logged in', 1)
+            self._instrumentStub(self._si._stub)
             return self._si
 
+        import time
+        from pyVim.connect import SmartConnect
+        from pyVmomi import vim
+
         #
         # get login info
         #
@@ -1830,16 +2181,54 @@ class VCLI(object):
         _port = self._port
 
         _username = self._username
-        _password = self._decrypt(self._password)
+
+        _start = time.time()
+        self._statsPhase = 'login'
+
+        #
+        # vcli --replay, the recorded session stands in for the login
+        #
+        if self._cassette is not None and self._cassette.replay:
+            from pyVmomi import SoapStubAdapter
+            if self._cassette.session.get('version') is None:
+                self._print('No vcenter session recorded in {0}'.format(self._cassette.path))
+                sys.exit(1)
+            _stub = SoapStubAdapter(host=_host, port=int(_port) if _port is not None else 443, version=str(self._cassette.session['version']))
+            _stub.cookie = str(self._cassette.session.get('cookie'))
+            self._si = vim.ServiceInstance('ServiceInstance', _stub)
+            self._instrumentStub(_stub)
+            self._addStatsTime('login', _start)
+            return self._si
+
+        #
+        # reuse cached session, if still valid
+        #
+        _cookie = self._loadSession('cookie')
+        _version = self._loadSession('version')
+        if _cookie is not None and _version is not None:
+            try:
+                _stub = self._newStub(_version)
+                _stub.cookie = _cookie
+                _si = vim.ServiceInstance('ServiceInstance', _stub)
+                if _si.content.sessionManager.currentSession is not None:
+                    self._print('Reusing cached vcenter session', 1)
+                    self._si = _si
+                    self._instrumentStub(_stub)
+                    self._addStatsTime('login', _start)
+                    return self._si
+            except:
+                pass
+            self._print('Cached vcenter session expired', 1)
+
+        _password = self._secret if self._secret is not None else self._decrypt(self._password) if self._password is not None else None
 
 
         #
         # prompt for password if not detectable
         #
-        import getpass
         _prompt = 'VCenter Password:  '
         if _password is None:
-            _password = getpass.getpass(_prompt)
+            _password = self._askPassword(_prompt)
 
 
         #
@@ -1861,7 +2250,7 @@ class VCLI(object):
                 self._si = _si
             except:
                 self._print('Login failed')
-                _password = getpass.getpass(_prompt)
+                _password = self._askPassword(_prompt)
 
 
         if self._si is None:
@@ -1872,53 +2261,581 @@ class VCLI(object):
         # login successful
         #
         self._username = _username
+        self._secret = _password
+        self._saveSession(cookie=self._si._stub.cookie, version=self._si._stub.version)
+        if self._cassette is not None:
+            self._cassette.save(cookie=Cassette.cookie, version=self._si._stub.version)
+        self._instrumentStub(self._si._stub)
+        self._addStatsTime('login', _start)
 
         return self._si
 
-    def _loginInventoryService(self):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+    #
+    # SOAP stub to join an existing session, of the vcenter of host or
+    # of the fake one
+    #
+    def _newStub(self, version):
+        from pyVmomi import SoapStubAdapter
 
-        if self._stubConfig is not None:
-            self._print('Already logged in', 1)
-            return self._stubConfig
+        if self._backend == 'fake':
+            import VCLIFake
+            return VCLIFake.getBackend().stub
 
-        #
-        # get login info
-        #
-        _host = self._host
-        _port = self._port
+        _sslContext = ssl.SSLContext(ssl.PROTOCOL_TLSv1_2)
+        _sslContext.verify_mode = ssl.CERT_NONE
+        return SoapStubAdapter(host=self._host, port=int(self._port), version=version, sslContext=_sslContext)
 
-        _username = self._username
-        _password = self._decrypt(self._password)
+    #
+    # Hooks on the SOAP stub, each installed once per stub
+    #
+    def _instrumentStub(self, stub):
+        self._cassetteStub(stub)
+        self._cacheStub(stub)
+        self._traceStub(stub)
+        self._statsStub(stub)
 
+    #
+    # vcli --record / --replay, at the HTTP connection so that pyVmomi
+    # parses recorded responses as it parses live ones
+    #
+    def _cassetteStub(self, stub):
+        _cassette = self._cassette
+        _getConnection = getattr(stub, 'GetConnection', None)
+        if _cassette is None or _getConnection is None or getattr(stub, '_vcliCassette', None) is not None:
+            return
+        stub._vcliCassette = True
+
+        if _cassette.replay:
+            _replayConnection = CassetteConnection(_cassette)
+            stub.GetConnection = lambda: _replayConnection
+            stub.ReturnConnection = lambda conn: None
+            stub.DropConnections = lambda: None
+            stub._CloseConnection = lambda conn: None
+            return
+
+        # pooled connections are reused, hook each one once
+        def _connection():
+            _conn = _getConnection()
+            if getattr(_conn, '_vcliCassette', None) is None:
+                _conn._vcliCassette = True
+                _request = _conn.request
+                _getResponse = _conn.getresponse
+
+                def _recordRequest(method, url, body=None, headers={}):
+                    _conn._vcliRequest = body
+                    return _request(method, url, body, headers)
+
+                def _recordResponse(*args, **kwargs):
+                    return _cassette.recordResponse('soap', _conn._vcliRequest, _getResponse(*args, **kwargs))
+
+                _conn.request = _recordRequest
+                _conn.getresponse = _recordResponse
+            return _conn
+
+        stub.GetConnection = _connection
+
+    def _cassetteSession(self, session):
+        _cassette = self._cassette
+        if _cassette is None:
+            return
+
+        if not _cassette.replay:
+            def _record(response, *args, **kwargs):
+                _cassette.record('vapi', response.request.body, response.status_code, response.reason, response.headers.items(), response.content)
+
+            session.hooks['response'].append(_record)
+            return
+
+        import requests
+
+        class _ReplayAdapter(requests.adapters.BaseAdapter):
+            def send(self, request, **kwargs):
+                _response = requests.models.Response()
+                _response.request = request
+                _response.url = request.url
+
+                _exchange = _cassette.play('vapi', request.body)
+                if _exchange is None:
+                    _response.status_code = 404
+                    _response.reason = 'No recorded response for {0}'.format(_cassette.getOperation('vapi', request.body))
+                    _response._content = ''
+                    return _response
+
+                _response.status_code = _exchange['status']
+                _response.reason = _exchange['reason']
+                _response.headers = requests.structures.CaseInsensitiveDict(_exchange['headers'])
+                _response.encoding = requests.utils.get_encoding_from_headers(_response.headers)
+                _response._content = _exchange['body'].encode('utf-8')
+                return _response
+
+            def close(self):
+                pass
 
-        #
-        # prompt for password if not detectable
-        #
-        import getpass
-        _prompt = 'VCenter Password:  '
-        if _password is None:
-            _password = getpass.getpass(_prompt)
+        session.mount('https://', _ReplayAdapter())
+        session.mount('http://', _ReplayAdapter())
+
+    #
+    # vcli --record DIR / --replay DIR ...
+    #
+    def _startCassette(self, args):
+        _record = getattr(args, 'record') if hasattr(args, 'record') else None
+        _replay = getattr(args, 'replay') if hasattr(args, 'replay') else None
+        if _record is None and _replay is None:
+            return
+
+        try:
+            self._cassette = Cassette(_replay if _replay is not None else _record, replay=_replay is not None)
+        except (IOError, OSError, ValueError) as _e:
+            self._print('Cannot open {0}:  {1}'.format(_replay if _replay is not None else _record, _e))
+            sys.exit(1)
+
+        # every exchange goes through the cassette, none is saved by a cache or a worker
+        self._sessionCache = None
+        self._vmIndex = None
+        self._inventoryTtl = None
+        self._inventorySync = None
+        self._parallel = None
 
+    #
+    # pyVmomi fetches a property over SOAP each time an attribute such
+    # as vm.summary is read.  Keep what was read for vms, hosts and
+    # datastores until a method is called on the object, a task
+    # completes, or _refresh() is called.
+    #
+    def _cacheStub(self, stub):
+        from pyVmomi import vim
 
         #
-        # Let's log in
+        # a stub can outlive the VCLI that hooked it (the fake vcenter
+        # has one per process), reads go to the cache of the last one
         #
-        _url = 'https://{host}:{port}/api'.format(host=_host, port=_port)
-        _attempt = 0
-        while self._stubConfig is None and _attempt < 3:
-            _attempt += 1
-            try:
+        _hooked = getattr(stub, '_vcliCache', None) is not None
+        stub._vcliCache = self
+        if _hooked:
+            return
+
+        _types = (vim.VirtualMachine, vim.HostSystem, vim.Datastore)
+        _invokeAccessor = stub.InvokeAccessor
+        _invokeMethod = stub.InvokeMethod
+
+        def _accessor(mo, info):
+            if not isinstance(mo, _types):
+                return _invokeAccessor(mo, info)
+
+            _vcli = stub._vcliCache
+            _props = _vcli._propertyCache.setdefault((type(mo), mo._moId), {})
+            if info.name in _props:
+                _vcli._propertyHits += 1
+                return _props[info.name]
+
+            _value = _invokeAccessor(mo, info)
+            _vcli._propertyFetches += 1
+            _props[info.name] = _value
+            return _value
+
+        def _method(mo, info, args):
+            # the accessor itself goes through 'Fetch'
+            if isinstance(mo, _types) and info.wsdlName != 'Fetch':
+                stub._vcliCache._refresh(mo)
+            return _invokeMethod(mo, info, args)
+
+        stub.InvokeAccessor = _accessor
+        stub.InvokeMethod = _method
 
-                _session = requests.Session()
-                _session.verify = False
-                _connector = get_requests_connector(session=_session, url=_url)
-                _stubConfig = StubConfigurationFactory.new_std_configuration(_connector)
+    ## ---------- ---------- ---------- ----------
+    #
+    # vcli --trace-fetches ...
+    #
+    # Every SOAP call is recorded with the object type and property
+    # path it reads, the vcli method that caused it, and its latency.
+    # Lazy attribute reads (vm.config.guestId) show up as Fetch or
+    # RetrieveContents calls, one per object, which is how N+1
+    # patterns are found.
+    #
 
-                # Pass user credentials (user/password) in the security context to authenticate.
-                # login to vAPI endpoint
-                _authContext = create_user_password_security_context(_username, _password)
-                _stubConfig.connector.set_security_context(_authContext)
+    #
+    # retrieval plumbing, round trips are charged to their caller
+    #
+    _fetchPlumbing = set(['_method', '_accessor', '_traced', '_iterRetrieve', '_iterProperties', '_retrieveProperties',
+                          '_iterObjects', '_getObjects', '_iterVmObjects', '_getVmObjects', '_getRequestInventory',
+                          '_iterShards', '_fetch', '_tracer', '_timer', '_counted'])
+
+    def _traceStub(self, stub):
+        import time
+
+        _traceFetches = getattr(self._args, 'trace-fetches') if hasattr(self._args, 'trace-fetches') else None
+        if _traceFetches is None or not _traceFetches:
+            return
+        if self._fetchTrace is None:
+            self._fetchTrace = {}
+        if getattr(stub, '_vcliTrace', None) is not None:
+            return
+        stub._vcliTrace = True
+
+        _invokeMethod = stub.InvokeMethod
+
+        def _traced(mo, info, args):
+            if self._fetchTrace is None:
+                return _invokeMethod(mo, info, args)
+
+            _start = time.time()
+            try:
+                return _invokeMethod(mo, info, args)
+            finally:
+                _elapsed = time.time() - _start
+                for _path in self._getFetchPaths(mo, info, args):
+                    _key = (self._getFetchCaller(), _path)
+                    _entry = self._fetchTrace.setdefault(_key, [0, 0.0])
+                    _entry[0] += 1
+                    _entry[1] += _elapsed
+
+        stub.InvokeMethod = _traced
+
+    #
+    # Type.property paths a SOAP call reads, or Type.Method
+    #
+    def _getFetchPaths(self, mo, info, args):
+        from pyVmomi import VmomiSupport
+
+        _type = VmomiSupport.GetVmodlName(type(mo)).split('.')[-1]
+        if info.wsdlName == 'Fetch' and len(args) > 0:
+            return ['{0}.{1}'.format(_type, args[0])]
+
+        if info.wsdlName in ['RetrieveContents', 'RetrieveProperties', 'RetrievePropertiesEx'] and len(args) > 0:
+            _paths = []
+            for _filterSpec in args[0] or []:
+                for _propSpec in _filterSpec.propSet:
+                    _name = _propSpec.type.split('.')[-1] if isinstance(_propSpec.type, str) else VmomiSupport.GetVmodlName(_propSpec.type).split('.')[-1]
+                    _paths.append('{0}.{1}'.format(_name, ','.join(_propSpec.pathSet or []) or '*'))
+            return _paths if len(_paths) > 0 else ['{0}.{1}'.format(_type, info.wsdlName)]
+
+        return ['{0}.{1}'.format(_type, info.wsdlName)]
+
+    #
+    # First vcli method on the stack that is not retrieval plumbing
+    #
+    def _getFetchCaller(self):
+        _frame = sys._getframe(2)
+        while _frame is not None:
+            _code = _frame.f_code
+            if _frame.f_globals.get('__name__') == __name__ and _code.co_name not in self._fetchPlumbing:
+                return _code.co_name
+            _frame = _frame.f_back
+
+        return '?'
+
+    def _printFetchTrace(self):
+        if self._fetchTrace is None:
+            return
+
+        _total = sum([_entry[0] for _entry in self._fetchTrace.values()])
+        _seconds = sum([_entry[1] for _entry in self._fetchTrace.values()])
+
+        _fmt = '%-24s  %8s  %9s  %s'
+        sys.stderr.write(_fmt % ('# Caller', 'Fetches', 'Seconds', 'Object.Property') + '\n')
+        for _key in sorted(self._fetchTrace, key=lambda _key: -self._fetchTrace[_key][1]):
+            _count, _elapsed = self._fetchTrace[_key]
+            sys.stderr.write(_fmt % (_key[0], '{0:,}'.format(_count), '%.2f' % _elapsed, _key[1]) + '\n')
+        sys.stderr.write('# Total:  {0:,} round trips, {1:.2f}s\n'.format(_total, _seconds))
+
+    ## ---------- ---------- ---------- ----------
+    #
+    # vcli --stats ...
+    #
+    # What a command costs vcenter: SOAP and vAPI calls with their
+    # request and response bytes, and where the time went.  Round trip
+    # time outside login and task waits is counted as retrieval, the
+    # rest of the run as local processing.
+    #
+    #
+    # start:  when argument parsing started, counted as config
+    #
+    def _startStats(self, start):
+        import time
+
+        _stats = getattr(self._args, 'stats') if hasattr(self._args, 'stats') else None
+        _statsJson = getattr(self._args, 'stats-json') if hasattr(self._args, 'stats-json') else None
+        _profile = getattr(self._args, 'profile') if hasattr(self._args, 'profile') else None
+        if (_stats is None or not _stats) and (_statsJson is None or not _statsJson) and _profile is None:
+            self._stats = None
+            return
+
+        self._stats = {
+            'start': time.time(),
+            'soap_calls': 0, 'soap_request_bytes': 0, 'soap_response_bytes': 0,
+            'vapi_calls': 0, 'vapi_request_bytes': 0, 'vapi_response_bytes': 0,
+            'config_s': self._configTime + time.time() - start,
+            'login_s': 0.0, 'retrieval_s': 0.0, 'task_wait_s': 0.0, 'output_s': 0.0,
+        }
+        self._statsPhase = None
+
+        # the constructor runs once, the daemon runs many commands
+        self._configTime = 0.0
+
+        #
+        # time the output, only while counting
+        #
+        for _name in ['_printRow', '_printCsv']:
+            setattr(self, _name, self._timed(getattr(self, _name)))
+
+    def _timed(self, method):
+        import time
+
+        _method = method
+
+        def _timer(*args, **kwargs):
+            if self._statsPhase is not None or self._stats is None:
+                return _method(*args, **kwargs)
+
+            _start = time.time()
+            self._statsPhase = 'output'
+            try:
+                return _method(*args, **kwargs)
+            finally:
+                self._addStatsTime('output', _start)
+
+        return _timer
+
+    #
+    # end of a login or task wait phase
+    #
+    def _addStatsTime(self, phase, start):
+        import time
+
+        self._statsPhase = None
+        if self._stats is not None:
+            self._stats[phase + '_s'] += time.time() - start
+
+    def _statsStub(self, stub):
+        import time
+
+        if getattr(stub, '_vcliStats', None) is not None:
+            return
+        stub._vcliStats = True
+
+        _invokeMethod = stub.InvokeMethod
+        _serializeRequest = stub.SerializeRequest
+        _getConnection = getattr(stub, 'GetConnection', None)
+
+        def _counted(mo, info, args):
+            if self._stats is None:
+                return _invokeMethod(mo, info, args)
+
+            self._stats['soap_calls'] += 1
+            _start = time.time()
+            try:
+                return _invokeMethod(mo, info, args)
+            finally:
+                if self._stats is not None and self._statsPhase is None:
+                    self._addStatsTime('retrieval', _start)
+
+        def _serialize(mo, info, args):
+            _request = _serializeRequest(mo, info, args)
+            if self._stats is not None:
+                self._stats['soap_request_bytes'] += len(_request)
+            return _request
+
+        #
+        # pooled connections are reused, hook each one once
+        #
+        def _connection():
+            _conn = _getConnection()
+            if getattr(_conn, '_vcliStats', None) is None:
+                _conn._vcliStats = True
+                _getResponse = _conn.getresponse
+
+                def _response(*args, **kwargs):
+                    _resp = _getResponse(*args, **kwargs)
+                    _read = _resp.read
+
+                    def _countedRead(*args):
+                        _data = _read(*args)
+                        if self._stats is not None:
+                            self._stats['soap_response_bytes'] += len(_data)
+                        return _data
+
+                    _resp.read = _countedRead
+                    return _resp
+
+                _conn.getresponse = _response
+            return _conn
+
+        stub.InvokeMethod = _counted
+        stub.SerializeRequest = _serialize
+        if _getConnection is not None:
+            stub.GetConnection = _connection
+
+    def _statsSession(self, session):
+        def _response(response, *args, **kwargs):
+            if self._stats is None:
+                return
+            self._stats['vapi_calls'] += 1
+            self._stats['vapi_request_bytes'] += len(response.request.body or '')
+            self._stats['vapi_response_bytes'] += len(response.content or '')
+            if self._statsPhase is None:
+                self._stats['retrieval_s'] += response.elapsed.total_seconds()
+
+        session.hooks['response'].append(_response)
+
+    def _printStats(self):
+        import json
+        import time
+        import resource
+
+        if self._stats is None:
+            return
+
+        _stats = dict(self._stats)
+        _total = time.time() - _stats.pop('start') + _stats['config_s']
+        _stats['total_s'] = _total
+        _stats['processing_s'] = max(0.0, _total - sum([_stats[_phase] for _phase in ['config_s', 'login_s', 'retrieval_s', 'task_wait_s', 'output_s']]))
+        # KB on linux, parallel retrieval workers are children.  Not in
+        # the daemon, where it is the peak of all the commands run so far
+        if not self._serving:
+            _stats['peak_rss_kb'] = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+        _statsJson = getattr(self._args, 'stats-json') if hasattr(self._args, 'stats-json') else None
+        if _statsJson is not None and _statsJson:
+            sys.stderr.write(json.dumps(_stats, sort_keys=True) + '\n')
+            return
+
+        _lines = [
+            ('SOAP calls', '{0:,}'.format(_stats['soap_calls']), '{0:,} B sent, {1:,} B received'.format(_stats['soap_request_bytes'], _stats['soap_response_bytes'])),
+            ('vAPI calls', '{0:,}'.format(_stats['vapi_calls']), '{0:,} B sent, {1:,} B received'.format(_stats['vapi_request_bytes'], _stats['vapi_response_bytes'])),
+            ('Config', '%.3f s' % _stats['config_s'], ''),
+            ('Login', '%.3f s' % _stats['login_s'], ''),
+            ('Retrieval', '%.3f s' % _stats['retrieval_s'], ''),
+            ('Task wait', '%.3f s' % _stats['task_wait_s'], ''),
+            ('Processing', '%.3f s' % _stats['processing_s'], ''),
+            ('Output', '%.3f s' % _stats['output_s'], ''),
+            ('Total', '%.3f s' % _stats['total_s'], ''),
+        ]
+        if 'peak_rss_kb' in _stats:
+            _lines.append(('Peak RSS', '{0:.1f} MB'.format(_stats['peak_rss_kb'] / 1024.0), ''))
+        else:
+            _lines.append(('Peak RSS', 'n/a', 'the vcli daemon only has its lifetime peak'))
+        for _label, _value, _detail in _lines:
+            sys.stderr.write('# {0:<12} {1:>12}  {2}\n'.format(_label + ':', _value, _detail).rstrip() + '\n')
+
+    #
+    # Forget the properties read for obj, or for every object
+    #
+    def _refresh(self, obj=None):
+        if obj is None:
+            self._propertyCache = {}
+        else:
+            self._propertyCache.pop((type(obj), obj._moId), None)
+
+    #
+    # Read one property path of obj from vcenter, bypassing the cache,
+    # e.g. _fetch(vm, 'runtime.powerState')
+    #
+    def _fetch(self, obj, path):
+        for _eachProp in self._retrieveProperties([(type(obj), [path])], objects=[obj]):
+            for _pset in _eachProp.propSet:
+                if _pset.name == path:
+                    return _pset.val
+
+        return None
+
+    def _loginInventoryService(self):
+        if self._stubConfig is not None:
+            self._print('Already logged in', 1)
+            return self._stubConfig
+
+        import time
+        import requests
+        from vmware.vapi.lib.connect import get_requests_connector
+        from vmware.vapi.security.session import create_session_security_context
+        from vmware.vapi.security.user_password import create_user_password_security_context
+        from vmware.vapi.stdlib.client.factories import StubConfigurationFactory
+        from com.vmware.cis_client import Session
+
+        #
+        # Disable urllib warning
+        #
+        requests.packages.urllib3.disable_warnings()
+
+        #
+        # get login info
+        #
+        _host = self._host
+        _port = self._port
+
+        _username = self._username
+        _url = 'https://{host}:{port}/api'.format(host=_host, port=_port)
+
+        _start = time.time()
+        self._statsPhase = 'login'
+
+        #
+        # vcli --replay, the recorded session stands in for the login
+        #
+        if self._cassette is not None and self._cassette.replay:
+            if self._cassette.session.get('sessionId') is None:
+                self._print('No inventory service session recorded in {0}'.format(self._cassette.path))
+                sys.exit(1)
+            _session = requests.Session()
+            self._cassetteSession(_session)
+            self._statsSession(_session)
+            _connector = get_requests_connector(session=_session, url=_url)
+            _stubConfig = StubConfigurationFactory.new_std_configuration(_connector)
+            _stubConfig.connector.set_security_context(create_session_security_context(str(self._cassette.session['sessionId'])))
+            self._stubConfig = _stubConfig
+            self._addStatsTime('login', _start)
+            return self._stubConfig
+
+        #
+        # reuse cached session, if still valid
+        #
+        _sessionId = self._loadSession('sessionId')
+        if _sessionId is not None:
+            try:
+                _session = requests.Session()
+                _session.verify = False
+                self._statsSession(_session)
+                _connector = get_requests_connector(session=_session, url=_url)
+                _stubConfig = StubConfigurationFactory.new_std_configuration(_connector)
+                _stubConfig.connector.set_security_context(create_session_security_context(_sessionId))
+                Session(_stubConfig).get()
+                self._print('Reusing cached inventory service session', 1)
+                self._stubConfig = _stubConfig
+                self._addStatsTime('login', _start)
+                return self._stubConfig
+            except:
+                pass
+            self._print('Cached inventory service session expired', 1)
+
+        _password = self._secret if self._secret is not None else self._decrypt(self._password) if self._password is not None else None
+
+
+        #
+        # prompt for password if not detectable
+        #
+        _prompt = 'VCenter Password:  '
+        if _password is None:
+            _password = self._askPassword(_prompt)
+
+
+        #
+        # Let's log in
+        #
+        _attempt = 0
+        while self._stubConfig is None and _attempt < 3:
+            _attempt += 1
+            try:
+
+                _session = requests.Session()
+                _session.verify = False
+                self._cassetteSession(_session)
+                self._statsSession(_session)
+                _connector = get_requests_connector(session=_session, url=_url)
+                _stubConfig = StubConfigurationFactory.new_std_configuration(_connector)
+
+                # Pass user credentials (user/password) in the security context to authenticate.
+                # login to vAPI endpoint
+                _authContext = create_user_password_security_context(_username, _password)
+                _stubConfig.connector.set_security_context(_authContext)
 
                 # Create the stub for the session service and login by creating a session.
                 _sessionService = Session(_stubConfig)
@@ -1930,10 +2847,14 @@ class VCLI(object):
                 _stubConfig.connector.set_security_context(_sessionContext)
 
                 self._stubConfig = _stubConfig
+                self._saveSession(sessionId=str(_sessionId))
+                if self._cassette is not None:
+                    self._cassette.scrub(str(_sessionId), Cassette.sessionId)
+                    self._cassette.save(sessionId=Cassette.sessionId)
 
             except:
                 self._print('Login failed')
-                _password = getpass.getpass(_prompt)
+                _password = self._askPassword(_prompt)
 
 
         if self._stubConfig is None:
@@ -1944,28 +2865,35 @@ class VCLI(object):
         # login successful
         #
         self._username = _username
+        self._secret = _password
+        self._addStatsTime('login', _start)
 
         return self._stubConfig
 
     def _logout(self):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        pass
 
-    def _getListVmRow(self, vm):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+    #
+    # build a list vm row from the properties retrieved by _getObjects(),
+    # without going back to vcenter
+    #
+    def _getListVmRow(self, vm, hosts=None):
+        from pyVmomi import vim
 
         _vm = vm
+        _hosts = hosts if hosts is not None else {}
 
         #
         # retrieve data row
         #
-        _cpu = _vm.summary.config.numCpu
-        _mem = int(_vm.summary.config.memorySizeMB) / 1024 if _vm.summary.config.memorySizeMB is not None else None
-        _vmCon = 'Yes' if _vm.summary.runtime.consolidationNeeded else 'No'
-        _guestId = _vm.summary.config.guestId.replace('Guest', '') if _vm.summary.config.guestId is not None else 'Unknown'
+        _cpu = _vm.get('summary.config.numCpu')
+        _mem = int(_vm['summary.config.memorySizeMB']) / 1024 if _vm.get('summary.config.memorySizeMB') is not None else None
+        _vmCon = 'Yes' if _vm.get('runtime.consolidationNeeded') else 'No'
+        _guestId = _vm['config.guestId'].replace('Guest', '') if _vm.get('config.guestId') is not None else 'Unknown'
 
-        if _vm.rootSnapshot:
+        if _vm.get('rootSnapshot') and _vm.get('snapshot') is not None:
             _vmSnap = 1
-            _ss = _vm.snapshot.rootSnapshotList[0]
+            _ss = _vm['snapshot'].rootSnapshotList[0]
             while len(_ss.childSnapshotList) > 0:
                 _vmSnap += 1
                 _ss = _ss.childSnapshotList[0]
@@ -1974,43 +2902,44 @@ class VCLI(object):
 
         # calculate total disk usage
         _vmDisk = 0
-        for _hw in _vm.config.hardware.device:
+        for _hw in _vm.get('config.hardware.device', []):
             if isinstance(_hw, vim.vm.device.VirtualDisk):
                 _vmDisk += _hw.capacityInKB / 1024 / 1024
 
-        _vmAnnotation = _vm.summary.config.annotation.replace(u'\u2019', u'\'').encode('ascii', 'ignore') if _vm.summary.config.annotation is not None else None
+        _vmAnnotation = _vm['config.annotation'].replace(u'\u2019', u'\'').encode('ascii', 'ignore') if _vm.get('config.annotation') is not None else None
 
-        #
-        # these property takes more time
-        #
         _long = getattr(self._args, 'long') if hasattr(self._args, 'long') else None
         if _long is not None and _long:
-            # Time Cost: Low
-            _vmVersion = _vm.config.version
-            _toolsVersion = _vm.guest.toolsVersion
+            _vmVersion = _vm.get('config.version')
+            _toolsVersion = _vm.get('guest.toolsVersion')
 
-            _vmHost = _vm.summary.runtime.host.summary.config.name.split('.')[0]
-            _vmCluster = _vm.runtime.host.parent.name
+            _vmHost = None
+            _vmCluster = None
+            if _vm.get('runtime.host') is not None and _vm['runtime.host']._moId in _hosts:
+                _vmHost, _vmCluster = _hosts[_vm['runtime.host']._moId]
+                _vmHost = _vmHost.split('.')[0] if _vmHost is not None else None
 
-            _row = (_vm.summary.config.name,
-                    _vm.summary.runtime.powerState.replace('powered', ''),
+            _row = (_vm['name'],
+                    _vm['runtime.powerState'].replace('powered', ''),
                     _cpu, _mem, _vmDisk,
                     _vmSnap, _vmCon,
                     _vmVersion, _toolsVersion, _guestId,
                     _vmHost, _vmCluster,
                     _vmAnnotation)
         else:
-            _row = (_vm.summary.config.name,
-                    _vm.summary.runtime.powerState.replace('powered', ''),
+            _row = (_vm['name'],
+                    _vm['runtime.powerState'].replace('powered', ''),
                     _cpu, _mem, _vmDisk,
                     _vmSnap, _vmCon,
                     _vmAnnotation)
 
         return _row
 
-    def _toList(self, names):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
+    #
+    # names, comma or space separated, or read from files, lowercased
+    # unless lower is False (-r and -g patterns, see _getNameMatcher())
+    #
+    def _toList(self, names, lower=True):
         if names is None:
             return None
 
@@ -2041,10 +2970,8 @@ class VCLI(object):
         #
         # change to lowercase
         #
-        _names0 = []
-        for _name in _names:
-            _names0.append(_name.lower())
-        _names = _names0
+        if lower:
+            _names = [_name.lower() for _name in _names]
 
         #
         # return None if empty
@@ -2054,11 +2981,23 @@ class VCLI(object):
 
         return _names
 
-    def _getObjects(self, otype, names=None, match=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+    def _getObjects(self, otype, names=None, match=None, properties=None, roots=None, objects=None):
+        _objects = {}
+        for _name, _object in self._iterObjects(otype, names, match=match, properties=properties, roots=roots, objects=objects):
+            _objects[_name] = _object
+
+        return _objects
+
+    #
+    # Same as _getObjects(), but yield (name, object) pairs as each page
+    # of the retrieval arrives.  Closing the generator early cancels the
+    # remaining pages.
+    #
+    def _iterObjects(self, otype, names=None, match=None, properties=None, roots=None, objects=None):
+        from pyVmomi import vim
 
         _otype = otype
-        _names = [names.lower()] if isinstance(names, str) else names
+        _names = [names] if isinstance(names, str) else names
         _match = getattr(self._args, 'match') if hasattr(self._args, 'match') and match is not None else match
 
 
@@ -2075,6 +3014,8 @@ class VCLI(object):
         #
         if _otype in ['cluster', 'ClusterComputeResource']:
             _specType = vim.ClusterComputeResource
+        elif _otype in ['compute', 'ComputeResource']:
+            _specType = vim.ComputeResource
         elif _otype in ['datacenter', 'Datacenter']:
             _specType = vim.Datacenter
         elif _otype in ['datastore', 'Datastore']:
@@ -2095,8 +3036,7 @@ class VCLI(object):
             _specType = vim.VirtualMachine
         else:
             self._print('Unsupported object type')
-            return None
-        _viewType = [_specType]
+            return
 
         #
         # define properties to collect
@@ -2116,64 +3056,1156 @@ class VCLI(object):
             _properties.append('config.version')
             _properties.append('guest.toolsVersion')
             _properties.append('guest.ipAddress')
+            _properties.append('runtime.host')
 
-            # objects
+        #
+        # additional properties requested by the caller
+        #
+        if properties is not None:
+            for _property in properties:
+                if _property not in _properties:
+                    _properties.append(_property)
 
-        _si = self._loginVcenter()
-        _content = _si.RetrieveContent()
+        _specs = [(_specType, _properties)]
+        if _otype in ['network', 'Network']:
+            # dv portgroups also carry their key and vlan
+            _specs.append((vim.dvs.DistributedVirtualPortgroup, ['key', 'config.defaultPortConfig']))
 
-        # Build a view and get basic properties for all Virtual Machines
-        _containerView = _content.viewManager.CreateContainerView(_content.rootFolder, _viewType, recursive=True)
-
-        _tSpec = vim.PropertyCollector.TraversalSpec(name='tSpecName', path='view', skip=False, type=vim.view.ContainerView)
-        _pSpec = vim.PropertyCollector.PropertySpec(all=False, pathSet=_properties, type=_specType)
-        _oSpec = vim.PropertyCollector.ObjectSpec(obj=_containerView, selectSet=[_tSpec], skip=False)
-        _pfSpec = vim.PropertyCollector.FilterSpec(objectSet=[_oSpec], propSet=[_pSpec], reportMissingObjectsInResults=False)
-        _retOptions = vim.PropertyCollector.RetrieveOptions()
-        _totalProps = []
-        _retProps = _content.propertyCollector.RetrievePropertiesEx(specSet=[_pfSpec], options=_retOptions)
-        _totalProps += _retProps.objects
-        while _retProps.token:
-            _retProps = _content.propertyCollector.ContinueRetrievePropertiesEx(token=_retProps.token)
-            _totalProps += _retProps.objects
-        _containerView.Destroy()
-
-        # Turn the output in _retProps into a usable dictionary of values
-        _objects = {}
-        for _eachProp in _totalProps:
-            # match name
-            if _match is not None and _match:
-                if _names is not None and _eachProp.obj.name.lower() not in _names and _eachProp.obj._moId not in _names:
-                    continue
+        # Turn each retrieved object into a compact record of values
+        _recordClass = InventoryRecord.recordClass(_specType.__name__.split('.')[-1], sum([_pathSet for _type, _pathSet in _specs], []))
 
-            # partial/substring search
-            if (_match is None or not _match) and _names is not None:
-                _skip = True
-                for _name in _names:
-                    if _name.lower() in _eachProp.obj.name.lower() or _name.lower() == _eachProp.obj._moId.lower():
-                        _skip = False
-                        break
-                if _skip:
-                    continue
+        # names are compiled once, not compared one by one per object
+        _matcher = self._getNameMatcher(_names, _match) if _names is not None else None
 
-            _object = {'id': _eachProp.obj}
+        for _eachProp in self._iterProperties(_specs, roots=roots, objects=objects):
             _name = None
             for _pset in _eachProp.propSet:
-                _object[_pset.name] = _pset.val
                 if _pset.name == 'name':
                     _name = _pset.val
+                    break
+            if _name is None:
+                continue
+
+            if _matcher is not None and not _matcher(_name, _eachProp.obj._moId):
+                continue
+
+            yield _name, self._toRecord(_recordClass, _eachProp)
+
+    #
+    # Compile the requested names into one matcher(name, moId):
+    #
+    #   -m      exact name, set lookup
+    #   -g      glob patterns, one alternation regex
+    #   -r      regular expressions, one alternation regex
+    #   default substring, one regex built from a trie of the names
+    #
+    # Names and patterns are case insensitive, a moid always matches
+    # exactly.  Patterns are compiled as typed, lowercasing them would
+    # turn \D into \d.
+    #
+    def _getNameMatcher(self, names, match=None):
+        import fnmatch
+
+        _names = [_name.lower() for _name in names]
+        _exact = set(_names)
+        _glob = getattr(self._args, 'glob') if hasattr(self._args, 'glob') else None
+        _regex = getattr(self._args, 'regex') if hasattr(self._args, 'regex') else None
+        _flags = re.IGNORECASE | re.UNICODE
+
+        if _regex is not None and _regex:
+            _pattern = re.compile('|'.join(['(?:{0})'.format(_name) for _name in names]), _flags)
+            return lambda name, moId: _pattern.search(name) is not None or moId.lower() in _exact
+
+        if _glob is not None and _glob:
+            _pattern = re.compile('|'.join(['(?:{0})'.format(fnmatch.translate(_name)) for _name in names]), _flags)
+            return lambda name, moId: _pattern.match(name) is not None or moId.lower() in _exact
+
+        if match is not None and match:
+            return lambda name, moId: name.lower() in _exact or moId.lower() in _exact
+
+        _pattern = re.compile(self._getTriePattern(_names), _flags)
+        return lambda name, moId: _pattern.search(name) is not None or moId.lower() in _exact
+
+    #
+    # Regex matching any of the words, with common prefixes shared so
+    # that a match attempt costs the length of a word, not the number
+    # of words
+    #
+    def _getTriePattern(self, words):
+        _trie = {}
+        for _word in words:
+            _node = _trie
+            for _char in _word:
+                _node = _node.setdefault(_char, {})
+            _node[''] = None
+
+        return self._getTrieNodePattern(_trie)
+
+    def _getTrieNodePattern(self, node):
+        _branches = [re.escape(_char) + self._getTrieNodePattern(node[_char]) for _char in sorted(node) if _char != '']
+        if len(_branches) == 0:
+            return ''
+
+        _pattern = _branches[0] if len(_branches) == 1 else '(?:{0})'.format('|'.join(_branches))
+
+        # a word ends here, the rest is optional
+        if '' in node:
+            _pattern = '(?:{0})?'.format(_pattern)
+
+        return _pattern
+
+    def _toRecord(self, recordClass, objectContent):
+        _record = recordClass()
+        _record['id'] = objectContent.obj
+        for _pset in objectContent.propSet:
+            # a reused retrieval may hold more properties than asked for
+            if _pset.name in recordClass._paths:
+                _record[_pset.name] = _pset.val
+
+        return _record
+
+    #
+    # Retrieve properties for every object of the given types with one
+    # property collector call (plus its continuation pages).
+    #
+    #   specs:    [(specType, [property, ...]), ...]
+    #   roots:    containers to search, default = rootFolder
+    #   objects:  fetch only these managed objects, no container search
+    #
+    def _retrieveProperties(self, specs, roots=None, objects=None):
+        return list(self._iterProperties(specs, roots=roots, objects=objects))
+
+    #
+    # Yield the ObjectContent of each object.  Full retrievals are kept
+    # for the rest of the command, a later call for the same types and
+    # roots with the same or fewer properties is answered from memory.
+    #
+    def _iterProperties(self, specs, roots=None, objects=None):
+        if objects is None:
+            _memo = self._getRequestInventory(specs, roots)
+            if _memo is not None:
+                for _eachProp in _memo:
+                    yield _eachProp
+                return
+
+        _objects = [] if objects is None and self._memoize else None
+        for _eachProp in self._iterRetrieve(specs, roots=roots, objects=objects):
+            if _objects is not None:
+                _objects.append(_eachProp)
+            yield _eachProp
+
+        # complete retrieval, keep it
+        if _objects is not None:
+            self._setRequestInventory(specs, roots, _objects)
+
+    #
+    # Yield the ObjectContent of each object one page at a time,
+    # pages hold up to page_size objects.  If the caller stops early,
+    # the pages not yet fetched are cancelled on the server.
+    #
+    def _iterRetrieve(self, specs, roots=None, objects=None):
+        from pyVmomi import vim
+
+        #
+        # full retrievals may be answered by the inventory cache
+        #
+        _cacheFile = self._getInventoryFile(specs, roots) if objects is None else None
+        if _cacheFile is not None:
+            _cached = self._loadInventory(_cacheFile, specs)
+            if _cached is not None:
+                for _eachProp in _cached:
+                    yield _eachProp
+                return
+        _dump = [] if _cacheFile is not None else None
+
+        _si = self._loginVcenter()
+        _content = _si.RetrieveContent()
+        _pageSize = int(self._pageSize) if self._pageSize is not None else 1000
+
+        #
+        # with parallel, vm and host retrievals are split by cluster
+        #
+        _shards = self._getShards(specs, roots) if objects is None and not self._inventorySync else None
+        if _shards is not None:
+            for _eachProp in self._iterShards(specs, _shards, _dump):
+                yield _eachProp
+            if _dump is not None:
+                self._saveInventory(_cacheFile, specs, roots, _dump)
+            return
+
+        _pfSpec, _containerViews = self._getFilterSpec(_content, specs, roots=roots, objects=objects)
+        if _pfSpec is None:
+            return
+
+        #
+        # with inventory_sync, the cache is filled from a property
+        # collector filter that later syncs only the changes
+        #
+        if _dump is not None and self._inventorySync:
+            for _eachProp in self._iterInventorySync(_content, _pfSpec, _containerViews, specs, roots, _cacheFile):
+                yield _eachProp
+            return
+
+        _retOptions = vim.PropertyCollector.RetrieveOptions(maxObjects=_pageSize)
+
+        # an object may be in more than one container
+        _seen = set() if len(_pfSpec.objectSet) > 1 else None
+
+        _token = None
+        try:
+            _retProps = _content.propertyCollector.RetrievePropertiesEx(specSet=[_pfSpec], options=_retOptions)
+            _page = 1
+            while _retProps is not None:
+                _token = _retProps.token
+                self._print('Page {0}:  {1} objects'.format(_page, len(_retProps.objects)), 2)
+                for _eachProp in _retProps.objects:
+                    if _seen is not None:
+                        if _eachProp.obj._moId in _seen:
+                            continue
+                        _seen.add(_eachProp.obj._moId)
+                    if _dump is not None:
+                        _dump.append(self._dumpObject(_eachProp))
+                    yield _eachProp
+
+                # release the page before the next one arrives
+                _retProps = None
+                if not _token:
+                    break
+                _retProps = _content.propertyCollector.ContinueRetrievePropertiesEx(token=_token)
+                _token = None
+                _page += 1
+            _token = None
+
+            # complete retrieval, keep it
+            if _dump is not None:
+                self._saveInventory(_cacheFile, specs, roots, _dump)
+        finally:
+            if _token:
+                self._print('Cancelling remaining pages', 2)
+                try:
+                    _content.propertyCollector.CancelRetrievePropertiesEx(token=_token)
+                except:
+                    pass
+            for _containerView in _containerViews:
+                _containerView.Destroy()
+
+    ## ---------- ---------- ---------- ----------
+    # Request inventory
+    #
+    # Helpers look up the same objects many times within one command
+    # (the VMs before and after each clone, the portgroups for each
+    # NIC, ...).  Complete retrievals are kept in memory until the
+    # command ends; write tasks mark the objects they changed, which
+    # are fetched again, by themselves, on the next lookup.
+    #
+    def _getRequestInventoryKey(self, specs, roots=None):
+        from pyVmomi import VmomiSupport
+
+        return (tuple([VmomiSupport.GetVmodlName(_specType) for _specType, _properties in specs]),
+                tuple(sorted([_root._moId for _root in roots])) if roots is not None else None)
+
+    def _getRequestInventory(self, specs, roots=None):
+        from pyVmomi import VmomiSupport
+
+        if self._requestInventory is None:
+            return None
+
+        _key = self._getRequestInventoryKey(specs, roots)
+        _entry = self._requestInventory.get(_key)
+        if _entry is None:
+            return None
+
+        for _type, (_specType, _properties) in zip(_key[0], specs):
+            if not set(_properties) <= _entry['properties'][_type]:
+                return None
+
+        if len(_entry['dirty']) > 0:
+            #
+            # a changed object may have moved in or out of the roots
+            #
+            if roots is not None:
+                del self._requestInventory[_key]
+                return None
+
+            self._print('Fetching {0} changed objects'.format(len(_entry['dirty'])), 2)
+            _stub = self._loginVcenter()._stub
+            _objects = [VmomiSupport.GetVmodlType(_type)(_moId, _stub) for _type, _moId in _entry['dirty']]
+            for _type, _moId in _entry['dirty']:
+                _entry['objects'].pop(_moId, None)
+            try:
+                for _eachProp in self._iterRetrieve(_entry['specs'], objects=_objects):
+                    if len(_eachProp.propSet) > 0:
+                        _entry['objects'][_eachProp.obj._moId] = _eachProp
+            except Exception:
+                # e.g. the object was deleted, start over
+                del self._requestInventory[_key]
+                return None
+            _entry['dirty'] = set()
+
+        self._print('Reusing {0} objects retrieved earlier'.format(len(_entry['objects'])), 2)
+        return _entry['objects'].values()
+
+    def _setRequestInventory(self, specs, roots, objects):
+        import collections
+
+        if self._requestInventory is None:
+            self._requestInventory = {}
+
+        _key = self._getRequestInventoryKey(specs, roots)
+        _objects = collections.OrderedDict()
+        for _eachProp in objects:
+            _objects[_eachProp.obj._moId] = _eachProp
+
+        self._requestInventory[_key] = {
+            'specs': specs,
+            'properties': dict([(_type, set(_properties)) for _type, (_specType, _properties) in zip(_key[0], specs)]),
+            'objects': _objects,
+            'dirty': set(),
+        }
+
+    #
+    # objects:  changed managed objects
+    #
+    def _invalidateRequestInventory(self, objects):
+        from pyVmomi import VmomiSupport
+
+        if self._requestInventory is None:
+            return
+
+        _moIds = set([_object._moId for _object in objects])
+        for _key in self._requestInventory:
+            _entry = self._requestInventory[_key]
+            _types = [VmomiSupport.GetVmodlType(_type) for _type in _key[0]]
+
+            # kept objects that are, or refer to, the changed objects
+            for _moId in _entry['objects']:
+                _eachProp = _entry['objects'][_moId]
+                if _moId in _moIds or any([self._refersTo(self._dumpValue(_pset.val), _moIds) for _pset in _eachProp.propSet]):
+                    _entry['dirty'].add((VmomiSupport.GetVmodlName(type(_eachProp.obj)), _moId))
+
+            # new objects of a kept type (e.g. clones)
+            for _object in objects:
+                if any([isinstance(_object, _type) for _type in _types]):
+                    _entry['dirty'].add((VmomiSupport.GetVmodlName(type(_object)), _object._moId))
+
+    ## ---------- ---------- ---------- ----------
+    # Inventory cache
+    #
+    # Complete property collector retrievals are kept in
+    # ~/.vcli/inventory.<host>-<port>/<types>.<digest>, one pickle per
+    # (object types, properties, container roots).  Values are stored as
+    # plain python values, managed objects as (type, moid), so the cache
+    # can be read without a vcenter connection.
+    #
+    # The cache is read by the list and info actions when inventory_ttl
+    # is set in .vcli.conf, or with the list --cached/--refresh options.
+    # Other actions change what they retrieve, and always retrieve it
+    # from vcenter.
+    #
+    def _useInventoryCache(self):
+        _cached = getattr(self._args, 'cached') if hasattr(self._args, 'cached') else None
+        _refresh = getattr(self._args, 'refresh') if hasattr(self._args, 'refresh') else None
+        if _cached or _refresh:
+            return True
+
+        _action = getattr(self._args, 'action') if hasattr(self._args, 'action') else None
+        return self._inventoryTtl is not None and _action in ['list', 'ls', 'information', 'info']
+
+    def _getInventoryDir(self):
+        _dir = self._getCacheDir()
+        if _dir is None:
+            return None
+
+        _key = '{host}-{port}'.format(host=self._host, port=self._port)
+        _key = re.sub('[^0-9A-Za-z@._-]', '_', _key)
+        _dir = '{dir}/inventory.{key}'.format(dir=_dir, key=_key)
+        if not os.path.isdir(_dir):
             try:
-                if _name is not None:
-                    _objects[_name] = _object
+                os.makedirs(_dir, 0700)
+            except OSError:
+                return None
+
+        return _dir
+
+    def _getInventoryFile(self, specs, roots=None):
+        from pyVmomi import VmomiSupport
+        import hashlib
+
+        if not self._useInventoryCache():
+            return None
+
+        _dir = self._getInventoryDir()
+        if _dir is None:
+            return None
+
+        _types = [VmomiSupport.GetVmodlName(_specType) for _specType, _properties in specs]
+        _key = repr(([(_type, sorted(_properties)) for _type, (_specType, _properties) in zip(_types, specs)],
+                     sorted([_root._moId for _root in roots]) if roots is not None else None))
+
+        return '{dir}/{types}.{digest}'.format(dir=_dir, types='+'.join([_type.split('.')[-1] for _type in _types]), digest=hashlib.md5(_key).hexdigest())
+
+    #
+    # pyVmomi value -> plain python value
+    #
+    def _dumpValue(self, value):
+        from pyVmomi import VmomiSupport
+        import datetime
+
+        _value = value
+        if isinstance(_value, VmomiSupport.ManagedObject):
+            return ('mo', VmomiSupport.GetVmodlName(type(_value)), _value._moId)
+        if isinstance(_value, VmomiSupport.DataObject):
+            _fields = {}
+            for _prop in _value._GetPropertyList():
+                _fields[_prop.name] = self._dumpValue(getattr(_value, _prop.name))
+            return ('do', VmomiSupport.GetVmodlName(type(_value)), _fields)
+        if isinstance(_value, list):
+            return ('list', VmomiSupport.GetVmodlName(type(_value)) if type(_value) is not list else None, [self._dumpValue(_item) for _item in _value])
+        if _value is None or type(_value) in [bool, int, long, float, str, unicode, datetime.datetime]:
+            return _value
+
+        # enums and the vmodl primitive types (long, short, ...)
+        for _base in [bool, int, long, float, unicode, str]:
+            if isinstance(_value, _base):
+                return ('prim', VmomiSupport.GetVmodlName(type(_value)), _base(_value))
+
+        return None
+
+    #
+    # plain python value -> pyVmomi value
+    #
+    def _loadValue(self, value, stub=None):
+        from pyVmomi import VmomiSupport
+
+        _value = value
+        if not isinstance(_value, tuple):
+            return _value
+
+        if _value[0] == 'mo':
+            return VmomiSupport.GetVmodlType(_value[1])(_value[2], stub)
+        if _value[0] == 'do':
+            _fields = dict([(_name, self._loadValue(_field, stub)) for _name, _field in _value[2].items()])
+            return VmomiSupport.GetVmodlType(_value[1])(**_fields)
+        if _value[0] == 'list':
+            _items = [self._loadValue(_item, stub) for _item in _value[2]]
+            try:
+                return VmomiSupport.GetVmodlType(_value[1])(_items) if _value[1] is not None else _items
             except:
-                pass
+                return _items
+        if _value[0] == 'prim':
+            try:
+                return VmomiSupport.GetVmodlType(_value[1])(_value[2])
+            except:
+                return _value[2]
 
+        return None
 
-        return _objects
+    def _dumpObject(self, objectContent):
+        _obj = objectContent.obj
+        return (self._dumpValue(_obj), [(_pset.name, self._dumpValue(_pset.val)) for _pset in objectContent.propSet])
 
-    def _getNetworkObjects(self, network=None, vlanId=None, pgkey=None, match=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+    def _loadObject(self, dump, stub=None):
+        from pyVmomi import vim, vmodl
+
+        _obj, _propSet = dump
+        _propSet = [vmodl.DynamicProperty(name=_name, val=self._loadValue(_val, stub)) for _name, _val in _propSet]
+        return vim.PropertyCollector.ObjectContent(obj=self._loadValue(_obj, stub), propSet=_propSet)
+
+    def _readInventory(self, file):
+        import cPickle
+
+        _file = file
+        try:
+            _mtime = os.path.getmtime(_file)
+        except OSError:
+            return None
+
+        # unchanged since this process last read or wrote it
+        if _file in VCLI._inventoryMemo and VCLI._inventoryMemo[_file][0] == _mtime:
+            return VCLI._inventoryMemo[_file][1]
+
+        try:
+            _hndl = open(_file, 'rb')
+            _inventory = cPickle.load(_hndl)
+            _hndl.close()
+        except:
+            return None
+        if not isinstance(_inventory, dict):
+            return None
+
+        VCLI._inventoryMemo[_file] = (_mtime, _inventory)
+        return _inventory
+
+    def _writeInventory(self, file, inventory):
+        import cPickle
+
+        _file = file
+        _tmp = '{0}.{1}'.format(_file, os.getpid())
+        try:
+            _fd = os.open(_tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0600)
+            _hndl = os.fdopen(_fd, 'wb')
+            cPickle.dump(inventory, _hndl, 2)
+            _hndl.close()
+            os.rename(_tmp, _file)
+            VCLI._inventoryMemo[_file] = (os.path.getmtime(_file), inventory)
+        except (IOError, OSError, cPickle.PicklingError):
+            self._print('Unable to save inventory cache {0}'.format(_file), 1)
+            return None
+
+        return _file
+
+    def _saveInventory(self, file, specs, roots, dump, sync=None):
+        from pyVmomi import VmomiSupport
+        import time
+
+        _inventory = {
+            'time': time.time(),
+            'types': [VmomiSupport.GetVmodlName(_specType) for _specType, _properties in specs],
+            'scoped': roots is not None,
+            'objects': dump,
+            'dirty': [],
+            'sync': sync,
+        }
+        return self._writeInventory(file, _inventory)
+
+    #
+    # Return the cached ObjectContent list, or None to retrieve from vcenter
+    #
+    def _loadInventory(self, file, specs):
+        from pyVmomi import VmomiSupport
+        import time
+
+        _file = file
+        _cached = getattr(self._args, 'cached') if hasattr(self._args, 'cached') else None
+        _refresh = getattr(self._args, 'refresh') if hasattr(self._args, 'refresh') else None
+        if _refresh:
+            return None
+
+        _inventory = self._readInventory(_file) if os.path.isfile(_file) else None
+        if _inventory is None:
+            if _cached:
+                self._print('No cached inventory for this listing, run it once without --cached')
+                sys.exit(1)
+            return None
+
+        _age = time.time() - _inventory['time']
+        if not _cached and _age > float(self._inventoryTtl):
+            self._print('Cached inventory expired ({0:.0f}s old)'.format(_age), 1)
+            _inventory = self._syncInventory(_file, _inventory, specs)
+            if _inventory is None:
+                return None
+            _age = 0
+
+        #
+        # refresh the objects changed by vcli since the cache was written
+        #
+        _stub = self._si._stub if self._si is not None else None
+        if len(_inventory['dirty']) > 0 and not _cached:
+            if _inventory['scoped']:
+                return None
+
+            _stub = self._loginVcenter()._stub
+            _dirty = [VmomiSupport.GetVmodlType(_type)(_moId, _stub) for _type, _moId in _inventory['dirty']]
+            _objects = dict([(_obj[2], (_obj, _propSet)) for _obj, _propSet in _inventory['objects']])
+            for _moId in [_moId for _type, _moId in _inventory['dirty']]:
+                _objects.pop(_moId, None)
+            for _eachProp in self._retrieveProperties(specs, objects=_dirty):
+                if len(_eachProp.propSet) > 0:
+                    _objects[_eachProp.obj._moId] = self._dumpObject(_eachProp)
+            self._print('Refreshed {0} changed objects in the cached inventory'.format(len(_dirty)), 1)
+
+            _inventory['objects'] = _objects.values()
+            _inventory['dirty'] = []
+            self._writeInventory(_file, _inventory)
+
+        self._print('Using cached inventory ({0:.0f}s old)'.format(_age), 1)
+        return [self._loadObject(_dump, _stub) for _dump in _inventory['objects']]
+
+    #
+    # True if the dumped value refers to any of the moids
+    #
+    def _refersTo(self, value, moIds):
+        _value = value
+        if not isinstance(_value, tuple):
+            return False
+        if _value[0] == 'mo':
+            return _value[2] in moIds
+        if _value[0] == 'do':
+            return any([self._refersTo(_field, moIds) for _field in _value[2].values()])
+        if _value[0] == 'list':
+            return any([self._refersTo(_item, moIds) for _item in _value[2]])
+        return False
+
+    #
+    # Mark the given managed objects, and the cached objects that refer
+    # to them, as changed.  They are fetched again on the next cache read.
+    #
+    def _invalidate(self, objects):
+        from pyVmomi import VmomiSupport
+
+        _objects = [_object for _object in objects if isinstance(_object, VmomiSupport.ManagedObject)]
+        if len(_objects) == 0:
+            return
+
+        self._invalidateRequestInventory(_objects)
+
+        if self._inventoryTtl is None:
+            return
+
+        _dir = self._getInventoryDir()
+        if _dir is None:
+            return
+
+        _moIds = set([_object._moId for _object in _objects])
+        for _name in os.listdir(_dir):
+            _file = '{0}/{1}'.format(_dir, _name)
+            _inventory = self._readInventory(_file)
+            if _inventory is None:
+                continue
+
+            _dirty = set([(_type, _moId) for _type, _moId in _inventory['dirty']])
+            _size = len(_dirty)
+
+            # cached objects that are, or refer to, the changed objects
+            for _obj, _propSet in _inventory['objects']:
+                if _obj[2] in _moIds or any([self._refersTo(_val, _moIds) for _pname, _val in _propSet]):
+                    _dirty.add((_obj[1], _obj[2]))
+
+            # new objects of a cached type (e.g. clones)
+            _types = [VmomiSupport.GetVmodlType(_type) for _type in _inventory['types']]
+            for _object in _objects:
+                if any([isinstance(_object, _type) for _type in _types]):
+                    _dirty.add((VmomiSupport.GetVmodlName(type(_object)), _object._moId))
+
+            if len(_dirty) != _size:
+                self._print('Invalidating {0} objects in {1}'.format(len(_dirty) - _size, _file), 2)
+                _inventory['dirty'] = list(_dirty)
+                self._writeInventory(_file, _inventory)
+
+    #
+    # Resolve --datacenter, --folder, --cluster and --host, each within
+    # the previous one, to the managed entities to use as container roots.
+    #
+    # Returns None when none is given (search from rootFolder), or the
+    # list of matching entities (empty if nothing matched).
+    #
+    def _getContainerRoots(self):
+        from pyVmomi import vim
+
+        _scopes = [('datacenter', vim.Datacenter), ('folder', vim.Folder), ('cluster', vim.ComputeResource), ('host', vim.HostSystem)]
+
+        _roots = None
+        for _arg, _specType in _scopes:
+            _name = getattr(self._args, _arg) if hasattr(self._args, _arg) else None
+            if _name is None or _name == '':
+                continue
+
+            _entities = []
+            for _eachProp in self._iterProperties([(_specType, ['name'])], roots=_roots):
+                for _pset in _eachProp.propSet:
+                    if _pset.name == 'name' and (_name.lower() in _pset.val.lower() or _name == _eachProp.obj._moId):
+                        _entities.append(_eachProp.obj)
+            self._print('{0} {1}:  {2}'.format(_arg, _name, [_entity._moId for _entity in _entities]), 2)
+
+            _roots = _entities
+            if len(_roots) == 0:
+                break
+
+        return _roots
+
+    #
+    # Filter spec for specs over roots (container views) or objects.
+    # Returns (filterSpec, containerViews), filterSpec is None when
+    # there is nothing to search.
+    #
+    def _getFilterSpec(self, content, specs, roots=None, objects=None):
+        from pyVmomi import vim
+
+        _content = content
+        _pSpecs = [vim.PropertyCollector.PropertySpec(all=False, pathSet=_properties, type=_specType) for _specType, _properties in specs]
+
+        if objects is not None:
+            #
+            # targeted fetch, objects that no longer exist are
+            # reported without properties instead of failing the call
+            #
+            if len(objects) == 0:
+                return None, []
+            _containerViews = []
+            _oSpecs = [vim.PropertyCollector.ObjectSpec(obj=_object, skip=False) for _object in objects]
+            _pfSpec = vim.PropertyCollector.FilterSpec(objectSet=_oSpecs, propSet=_pSpecs, reportMissingObjectsInResults=True)
+        else:
+            #
+            # nothing matched the requested containers
+            #
+            _roots = roots if roots is not None else [_content.rootFolder]
+            if len(_roots) == 0:
+                return None, []
+
+            # Build a view per container and get the requested properties for all objects
+            _viewType = [_specType for _specType, _properties in specs]
+            _containerViews = [_content.viewManager.CreateContainerView(_root, _viewType, recursive=True) for _root in _roots]
+
+            _tSpec = vim.PropertyCollector.TraversalSpec(name='tSpecName', path='view', skip=False, type=vim.view.ContainerView)
+            _oSpecs = [vim.PropertyCollector.ObjectSpec(obj=_containerView, selectSet=[_tSpec], skip=False) for _containerView in _containerViews]
+            _pfSpec = vim.PropertyCollector.FilterSpec(objectSet=_oSpecs, propSet=_pSpecs, reportMissingObjectsInResults=False)
+
+        return _pfSpec, _containerViews
+
+    #
+    # First retrieval of a synced inventory: create a dedicated property
+    # collector and filter, yield the initial objects and keep the
+    # collector, its container views and the update version with the
+    # cached inventory.
+    #
+    def _iterInventorySync(self, content, pfSpec, containerViews, specs, roots, file):
+        from pyVmomi import vim, vmodl
+
+        _content = content
+        _file = file
+        _pageSize = int(self._pageSize) if self._pageSize is not None else 1000
+
+        # drop the collector of the inventory being replaced
+        _old = self._readInventory(_file) if os.path.isfile(_file) else None
+        if _old is not None and _old.get('sync') is not None:
+            self._destroyInventorySync(_old['sync'])
+
+        _collector = _content.propertyCollector.CreatePropertyCollector()
+        _collector.CreateFilter(spec=pfSpec, partialUpdates=False)
+        _options = vim.PropertyCollector.WaitOptions(maxWaitSeconds=0, maxObjectUpdates=_pageSize)
+
+        _dump = []
+        _version = ''
+        _done = False
+        try:
+            _page = 1
+            while True:
+                _update = _collector.WaitForUpdatesEx(version=_version, options=_options)
+                if _update is None:
+                    break
+                for _filterUpdate in _update.filterSet:
+                    self._print('Page {0}:  {1} objects'.format(_page, len(_filterUpdate.objectSet)), 2)
+                    for _objectUpdate in _filterUpdate.objectSet:
+                        _propSet = [vmodl.DynamicProperty(name=_change.name, val=_change.val) for _change in _objectUpdate.changeSet if _change.op == 'assign']
+                        _eachProp = vim.PropertyCollector.ObjectContent(obj=_objectUpdate.obj, propSet=_propSet)
+                        _dump.append(self._dumpObject(_eachProp))
+                        yield _eachProp
+                _version = _update.version
+                _page += 1
+                if not _update.truncated:
+                    break
+            _done = True
+
+            _sync = {
+                'collector': _collector._moId,
+                'views': [_containerView._moId for _containerView in containerViews],
+                'version': _version,
+            }
+            self._saveInventory(_file, specs, roots, _dump, sync=_sync)
+        finally:
+            if not _done:
+                _collector.DestroyPropertyCollector()
+                for _containerView in containerViews:
+                    _containerView.Destroy()
+
+    #
+    # Apply the changes since the cached version to the inventory.
+    # Returns the updated inventory, or None when a full retrieval is
+    # needed (no sync state, session or collector gone, ...).
+    #
+    def _syncInventory(self, file, inventory, specs):
+        from pyVmomi import vim
+        import time
+
+        _file = file
+        _inventory = inventory
+        _sync = _inventory.get('sync')
+        if not self._inventorySync or _sync is None:
+            return None
+
+        _stub = self._loginVcenter()._stub
+        _collector = vim.PropertyCollector(_sync['collector'], _stub)
+        _options = vim.PropertyCollector.WaitOptions(maxWaitSeconds=0)
+        _properties = set()
+        for _specType, _pathSet in specs:
+            _properties.update(_pathSet)
+        _properties.add('name')
+
+        _objects = dict([(_obj[2], (_obj, dict(_propSet))) for _obj, _propSet in _inventory['objects']])
+        _version = _sync['version']
+        _refetch = {}
+        _changes = 0
+        try:
+            while True:
+                _update = _collector.WaitForUpdatesEx(version=_version, options=_options)
+                if _update is None:
+                    break
+                for _filterUpdate in _update.filterSet:
+                    for _objectUpdate in _filterUpdate.objectSet:
+                        _changes += 1
+                        _moId = _objectUpdate.obj._moId
+                        if _objectUpdate.kind == 'leave':
+                            _objects.pop(_moId, None)
+                            continue
+
+                        if _objectUpdate.kind == 'enter' or _moId not in _objects:
+                            _props = {}
+                        else:
+                            _props = _objects[_moId][1]
+                        for _change in _objectUpdate.changeSet:
+                            if _change.name not in _properties:
+                                # nested or array element change, fetch the object again
+                                _refetch[_moId] = _objectUpdate.obj
+                            elif _change.op == 'assign':
+                                _props[_change.name] = self._dumpValue(_change.val)
+                            elif _change.op in ['remove', 'indirectRemove']:
+                                _props.pop(_change.name, None)
+                            else:
+                                _refetch[_moId] = _objectUpdate.obj
+                        _objects[_moId] = (self._dumpValue(_objectUpdate.obj), _props)
+                _version = _update.version
+                if not _update.truncated:
+                    break
+
+            for _eachProp in self._retrieveProperties(specs, objects=_refetch.values()):
+                _obj, _propSet = self._dumpObject(_eachProp)
+                if len(_propSet) > 0:
+                    _objects[_eachProp.obj._moId] = (_obj, dict(_propSet))
+                else:
+                    _objects.pop(_eachProp.obj._moId, None)
+        except:
+            self._print('Inventory sync failed, retrieving the inventory again', 1)
+            return None
+
+        self._print('Synced {0} object changes into the cached inventory'.format(_changes), 1)
+        _inventory['time'] = time.time()
+        _sync['version'] = _version
+        if _changes > 0 or len(_refetch) > 0:
+            _inventory['objects'] = [(_obj, _props.items()) for _obj, _props in _objects.values()]
+            self._writeInventory(_file, _inventory)
+
+        return _inventory
+
+    def _destroyInventorySync(self, sync):
+        from pyVmomi import vim
+
+        if self._si is None:
+            return
+        try:
+            vim.PropertyCollector(sync['collector'], self._si._stub).DestroyPropertyCollector()
+            for _view in sync['views']:
+                vim.view.ContainerView(_view, self._si._stub).Destroy()
+        except:
+            pass
+
+    ## ---------- ---------- ---------- ----------
+    # Parallel retrieval
+    #
+    # With parallel: N in .vcli.conf, vm and host retrievals are split
+    # into one shard per cluster (compute resource) and the shards are
+    # retrieved by a pool of N processes, so the SOAP parsing runs on N
+    # cores.  Each worker joins the vcenter session with a clone ticket
+    # and returns its objects as plain values (see _dumpObject()).
+    #
+    def _getShards(self, specs, roots=None):
+        from pyVmomi import vim
+
+        if not self._parallel or int(self._parallel) < 2:
+            return None
+
+        # vm and hosts are all found under the compute resources
+        for _specType, _properties in specs:
+            if not issubclass(_specType, (vim.VirtualMachine, vim.HostSystem)):
+                return None
+        if roots is not None and len([_root for _root in roots if isinstance(_root, vim.HostSystem)]) > 0:
+            return None
+
+        _shards = [_eachProp.obj for _eachProp in self._iterProperties([(vim.ComputeResource, ['name'])], roots=roots)]
+        if len(_shards) < 2:
+            return None
+
+        return _shards
+
+    def _iterShards(self, specs, shards, dump=None):
+        from pyVmomi import VmomiSupport
+        import multiprocessing
+
+        _si = self._loginVcenter()
+        _sessionManager = _si.content.sessionManager
+        _pageSize = int(self._pageSize) if self._pageSize is not None else 1000
+        _specs = [(VmomiSupport.GetVmodlName(_specType), _properties) for _specType, _properties in specs]
+
+        # one single use clone ticket per shard
+        _jobs = []
+        for _shard in shards:
+            _jobs.append((self._host, self._port, self._backend, _si._stub.version, _sessionManager.AcquireCloneTicket(), _specs, _shard._moId, _pageSize))
+
+        _processes = min(int(self._parallel), len(_jobs))
+        self._print('Retrieving {0} shards with {1} processes'.format(len(_jobs), _processes), 1)
+        _pool = multiprocessing.Pool(processes=_processes)
+
+        _seen = set()
+        try:
+            for _shardDump in _pool.imap_unordered(retrieveShard, _jobs):
+                for _objectDump in _shardDump:
+                    if _objectDump[0][2] in _seen:
+                        continue
+                    _seen.add(_objectDump[0][2])
+                    if dump is not None:
+                        dump.append(_objectDump)
+                    yield self._loadObject(_objectDump, _si._stub)
+        finally:
+            _pool.terminate()
+
+    #
+    # worker side: join the session and retrieve one shard
+    #
+    def _retrieveShard(self, job):
+        from pyVmomi import vim, VmomiSupport
+
+        self._host, self._port, self._backend, _version, _ticket, _specs, _root, _pageSize = job
+
+        _stub = self._newStub(_version)
+        _si = vim.ServiceInstance('ServiceInstance', _stub)
+        _si.content.sessionManager.CloneSession(cloneTicket=_ticket)
+        self._si = _si
+        self._pageSize = _pageSize
+        self._memoize = False
+
+        _specs = [(VmomiSupport.GetVmodlType(_specType), _properties) for _specType, _properties in _specs]
+        _roots = [vim.ComputeResource(_root, _stub)]
+        try:
+            return [self._dumpObject(_eachProp) for _eachProp in self._iterProperties(_specs, roots=_roots)]
+        finally:
+            _si.content.sessionManager.Logout()
+
+    ## ---------- ---------- ---------- ----------
+    # Local vm index
+    #
+    # ~/.vcli/vmindex.<host>-<port> holds one line per vm, sorted by
+    # lowercase name:
+    #
+    #   name<TAB>moid<TAB>uuid
+    #
+    # Lookups binary search the memory mapped file, so they cost the
+    # same whatever the size of the inventory.
+    #
+    def _getVmIndexFile(self):
+        if not self._vmIndex:
+            return None
+
+        _dir = self._getCacheDir()
+        if _dir is None:
+            return None
+
+        _key = '{host}-{port}'.format(host=self._host, port=self._port)
+        _key = re.sub('[^0-9A-Za-z@._-]', '_', _key)
+
+        return '{dir}/vmindex.{key}'.format(dir=_dir, key=_key)
+
+    def _buildVmIndex(self, file):
+        from pyVmomi import vim
+
+        _file = file
+        self._print('Building vm index {0}'.format(_file), 1)
+
+        _lines = []
+        for _eachProp in self._iterProperties([(vim.VirtualMachine, ['name', 'config.uuid'])]):
+            _props = dict([(_pset.name, _pset.val) for _pset in _eachProp.propSet])
+            if _props.get('name') is None:
+                continue
+            _name = re.sub('[\t\n]', ' ', _props['name'].lower()).encode('utf-8')
+            _lines.append('{0}\t{1}\t{2}\n'.format(_name, _eachProp.obj._moId, _props.get('config.uuid') or ''))
+        _lines.sort()
+
+        #
+        # write a new file and swap it in, readers never see a partial index
+        #
+        _tmp = '{0}.{1}'.format(_file, os.getpid())
+        try:
+            _fd = os.open(_tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0600)
+            _hndl = os.fdopen(_fd, 'w')
+            _hndl.writelines(_lines)
+            _hndl.close()
+            os.rename(_tmp, _file)
+        except (IOError, OSError):
+            self._print('Unable to save vm index {0}'.format(_file), 1)
+            return None
+
+        return _file
+
+    #
+    # Return {name: [moid, ...]} for the names found in the index
+    #
+    def _readVmIndex(self, file, names):
+        import mmap
+
+        _file = file
+        _found = {}
+        try:
+            _hndl = open(_file, 'rb')
+        except IOError:
+            return _found
+        if os.fstat(_hndl.fileno()).st_size == 0:
+            _hndl.close()
+            return _found
 
+        _mm = mmap.mmap(_hndl.fileno(), 0, access=mmap.ACCESS_READ)
+        for _name in names:
+            _key = _name.lower()
+
+            # first line whose name is >= key
+            _lo = 0
+            _hi = len(_mm)
+            while _lo < _hi:
+                _mid = (_lo + _hi) / 2
+                _start = _mm.rfind('\n', 0, _mid) + 1
+                _end = _mm.find('\n', _start)
+                if _mm[_start:_mm.find('\t', _start)] < _key:
+                    _lo = _end + 1
+                else:
+                    _hi = _start
+
+            # a name may be used by more than one vm
+            while _lo < len(_mm):
+                _end = _mm.find('\n', _lo)
+                _fields = _mm[_lo:_end].split('\t')
+                if _fields[0] != _key:
+                    break
+                _found.setdefault(_name, []).append(_fields[1])
+                _lo = _end + 1
+        _mm.close()
+        _hndl.close()
+
+        return _found
+
+    #
+    # Return the vm managed objects for the given exact names,
+    # or None to fall back to a full retrieval.
+    #
+    # Hits are checked with one fetch of 'name' on the indexed vm; on
+    # a miss or a stale entry the index is rebuilt once.
+    #
+    def _lookupVmIndex(self, names):
+        from pyVmomi import vim
+
+        _names = names
+        _file = self._getVmIndexFile()
+        if _file is None:
+            return None
+
+        _stub = self._loginVcenter()._stub
+        _built = False
+        if not os.path.isfile(_file):
+            if self._buildVmIndex(_file) is None:
+                return None
+            _built = True
+
+        while True:
+            _found = self._readVmIndex(_file, _names)
+
+            _vms = []
+            for _name in _names:
+                for _moId in _found.get(_name, []):
+                    _vms.append(vim.VirtualMachine(_moId, _stub))
+                # moids are accepted in place of names
+                if _name not in _found and re.match('^vm-[0-9]+$', _name):
+                    _vms.append(vim.VirtualMachine(_name, _stub))
+
+            _valid = []
+            for _eachProp in self._retrieveProperties([(vim.VirtualMachine, ['name'])], objects=_vms):
+                for _pset in _eachProp.propSet:
+                    if _pset.name == 'name' and (_pset.val.lower() in _names or _eachProp.obj._moId in _names):
+                        _valid.append(_eachProp.obj)
+
+            _missing = [_name for _name in _names if _name not in _found and not re.match('^vm-[0-9]+$', _name)]
+            if _built or (len(_missing) == 0 and len(_valid) == len(_vms)):
+                self._print('vm index:  {0}'.format([_vm._moId for _vm in _valid]), 2)
+                return _valid
+
+            self._print('vm index is stale', 1)
+            if self._buildVmIndex(_file) is None:
+                return None
+            _built = True
+
+    #
+    # Map every vm to its name and guest id, using a single retrieval
+    #
+    #   {vm moId: {'name': ..., 'config.guestId': ...}}
+    #
+    def _getVmNameMap(self):
+        from pyVmomi import vim
+
+        _map = {}
+        for _eachProp in self._iterProperties([(vim.VirtualMachine, ['name', 'config.guestId'])]):
+            _map[_eachProp.obj._moId] = dict([(_pset.name, _pset.val) for _pset in _eachProp.propSet])
+
+        return _map
+
+    #
+    # Map every host to its short name and cluster name, using a single
+    # retrieval over hosts and compute resources.
+    #
+    #   {host moId: (host name, cluster name)}
+    #
+    def _getHostClusterMap(self):
+        from pyVmomi import vim
+
+        _specs = [(vim.HostSystem, ['name', 'parent']), (vim.ComputeResource, ['name'])]
+
+        _hosts = {}
+        _computes = {}
+        for _eachProp in self._retrieveProperties(_specs):
+            _props = dict([(_pset.name, _pset.val) for _pset in _eachProp.propSet])
+            if isinstance(_eachProp.obj, vim.HostSystem):
+                _hosts[_eachProp.obj._moId] = _props
+            else:
+                _computes[_eachProp.obj._moId] = _props.get('name')
+
+        _map = {}
+        for _moId in _hosts:
+            _parent = _hosts[_moId].get('parent')
+            _map[_moId] = (_hosts[_moId].get('name'), _computes.get(_parent._moId) if _parent is not None else None)
+
+        return _map
+
+    #
+    # Index every dv portgroup by key, using a single retrieval over
+    # portgroups and switches.  Built once per command.
+    #
+    #   {portgroup key: (portgroup name, vlan id, switch uuid)}
+    #
+    def _getPortgroupIndex(self):
+        from pyVmomi import vim
+
+        if self._portgroupIndex is not None:
+            return self._portgroupIndex
+
+        _specs = [(vim.dvs.DistributedVirtualPortgroup, ['name', 'key', 'config.defaultPortConfig', 'config.distributedVirtualSwitch']),
+                  (vim.DistributedVirtualSwitch, ['uuid'])]
+
+        _portgroups = []
+        _switches = {}
+        for _eachProp in self._retrieveProperties(_specs):
+            _props = dict([(_pset.name, _pset.val) for _pset in _eachProp.propSet])
+            if isinstance(_eachProp.obj, vim.dvs.DistributedVirtualPortgroup):
+                _portgroups.append(_props)
+            else:
+                _switches[_eachProp.obj._moId] = _props.get('uuid')
+
+        _index = {}
+        for _props in _portgroups:
+            _portConfig = _props.get('config.defaultPortConfig')
+            _vlan = getattr(_portConfig, 'vlan', None) if _portConfig is not None else None
+            _switch = _props.get('config.distributedVirtualSwitch')
+            _index[_props.get('key')] = (_props.get('name'),
+                                         getattr(_vlan, 'vlanId', None) if _vlan is not None else None,
+                                         _switches.get(_switch._moId) if _switch is not None else None)
+
+        self._portgroupIndex = _index
+        return _index
+
+    def _getNetworkObjects(self, network=None, vlanId=None, pgkey=None, match=None):
         _network = getattr(self._args, 'network') if hasattr(self._args, 'network') else network
         _vlanId = getattr(self._args, 'vlan-id') if hasattr(self._args, 'vlan-id') else vlanId
         _pgkey = getattr(self._args, 'pgkey') if hasattr(self._args, 'pgkey') else pgkey
@@ -2183,21 +4215,21 @@ class VCLI(object):
             _vlanId = int(_network)
             _network = None
 
-        _objNetworks = self._getObjects('network', _network, match=_match)
+        _objNetworks = self._getObjects('network', _network, match=_match, properties=['vm', 'host'])
         if _vlanId is not None or _pgkey is not None:
             _nws = {}
             for _key in _objNetworks:
-                _dvs = _objNetworks[_key]['id']
-                if _vlanId is not None and _dvs.config.defaultPortConfig.vlan.vlanId == _vlanId:
+                _portConfig = _objNetworks[_key].get('config.defaultPortConfig')
+                if _vlanId is not None and _portConfig is not None and _portConfig.vlan.vlanId == _vlanId:
                     _nws[_key] = _objNetworks[_key]
-                if _pgkey is not None and _dvs.key == _pgkey:
+                if _pgkey is not None and _objNetworks[_key].get('key') == _pgkey:
                     _nws[_key] = _objNetworks[_key]
             _objNetworks = _nws
 
         return _objNetworks
 
     def _getVmDiskObject(self, vm, diskId):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _vm = vm
         _diskId = diskId
@@ -2226,7 +4258,7 @@ class VCLI(object):
         return _vmDisk
 
     def _getVmNicObject(self, vm, network):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _vm = vm
         _network = network
@@ -2240,13 +4272,15 @@ class VCLI(object):
             self._print('[len(_objNetworks)]  {0}'.format(len(_objNetworks)))
             if len(_objNetworks) == 1:
                 for _key in _objNetworks:
-                    _dvs = _objNetworks[_key]['id']
-                    _vlanId = _dvs.config.defaultPortConfig.vlan.vlanId
+                    _portConfig = _objNetworks[_key].get('config.defaultPortConfig')
+                    _vlanId = _portConfig.vlan.vlanId if _portConfig is not None else None
                     self._print('[_vlanId]  {0}'.format(_vlanId))
 
         if _label is None and _vlanId is None:
             return None
 
+        # portgroup key -> (name, vlan id, switch uuid)
+        _portgroups = self._getPortgroupIndex() if _vlanId is not None else {}
 
         _vmNic = None
         for _dev in _vm.config.hardware.device:
@@ -2258,40 +4292,57 @@ class VCLI(object):
                 break
 
             # find dvs
-            _objNetworks = self._getNetworkObjects(pgkey=_dev.backing.port.portgroupKey)
-            for _key in _objNetworks:
-                _dvs = _objNetworks[_key]['id']
-                if _vlanId is not None and _dvs.config.defaultPortConfig.vlan.vlanId == _vlanId:
-                    _vmNic = _dev
-                    break
-            if _vmNic is not None:
+            if not hasattr(_dev.backing, 'port'):
+                continue
+            _portgroup = _portgroups.get(_dev.backing.port.portgroupKey)
+            if _portgroup is None:
+                continue
+            if _portgroup[1] == _vlanId:
+                _vmNic = _dev
                 break
 
-            if _vlanId is not None:
-                # find dvs
-                _objNetworks = self._getNetworkObjects(pgkey=_dev.backing.port.portgroupKey)
-                for _key in _objNetworks:
-                    _dvs = _objNetworks[_key]['id']
-                    self._printObject(_dvs.config.defaultPortConfig.vlan)
+            self._print('[_vlanId]  {0}'.format(_portgroup[1]))
+
+
+
+        return _vmNic
+
+    def _getVmObjects(self, names=None, match=None, properties=None):
+        _objVms = {}
+        for _key, _vm in self._iterVmObjects(names, match=match, properties=properties):
+            _objVms[_key] = _vm
+
+        return _objVms
 
+    #
+    # Yield the (name, vm) pairs that pass the list filters, page by page
+    #
+    def _iterVmObjects(self, names=None, match=None, properties=None):
+        from pyVmomi import vim
 
+        # patterns are compiled as typed, \D is not \d
+        _names = self._toList(names, lower=False)
+        _match = match
 
-        return _vmNic
+        #
+        # --datacenter, --folder, --cluster & --host scope the retrieval
+        #
+        _roots = self._getContainerRoots()
 
-    def _getVmObjects(self, names=None, match=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        #
+        # exact names are looked up in the local vm index, if enabled
+        #
+        _objects = None
+        if _match is not None and _match and _names is not None and _roots is None:
+            _objects = self._lookupVmIndex([_name.lower() for _name in _names])
 
-        _names = self._toList(names)
-        _match = match
-        _objVms = self._getObjects('vm', _names, match=_match)
+        _objVms = self._iterObjects('vm', _names, match=_match, properties=properties, roots=_roots, objects=_objects)
 
         # apply filters
         _consolidate = getattr(self._args, 'consolidate') if hasattr(self._args, 'consolidate') else None
         _power = getattr(self._args, 'power') if hasattr(self._args, 'power') else None
         _snapshot = getattr(self._args, 'snapshot') if hasattr(self._args, 'snapshot') else None
         _template = getattr(self._args, 'template') if hasattr(self._args, 'template') else None
-        _host = getattr(self._args, 'host') if hasattr(self._args, 'host') else None
-        _cluster = getattr(self._args, 'cluster') if hasattr(self._args, 'cluster') else None
         _vmx = getattr(self._args, 'hw-version') if hasattr(self._args, 'hw-version') else None
         if _vmx is not None:
             _vmx = 'vmx-{:02d}'.format(_vmx)
@@ -2303,50 +4354,37 @@ class VCLI(object):
         if _template is None:
             _template = False
 
-        _vms = {}
-        for _key in _objVms:
+        for _key, _vm in _objVms:
             _os = getattr(self._args, 'os') if hasattr(self._args, 'os') else None
-            if 'config.guestId' not in _objVms[_key]:
+            if 'config.guestId' not in _vm:
                 continue
 
-            if _os is not None and _os == 'linux' and 'win' in _objVms[_key]['config.guestId']:
+            if _os is not None and _os == 'linux' and 'win' in _vm['config.guestId']:
                 continue
-            if _os is not None and _os == 'windows' and 'win' not in _objVms[_key]['config.guestId']:
+            if _os is not None and _os == 'windows' and 'win' not in _vm['config.guestId']:
                 continue
-            if _template is not None and _objVms[_key]['config.template'] != _template:
+            if _template is not None and _vm['config.template'] != _template:
                 continue
 
-            if _vmx is not None and _vmx != _objVms[_key]['config.version']:
+            if _vmx is not None and _vmx != _vm['config.version']:
                 continue
 
-            if _snapshot is not None and _snapshot and not _objVms[_key]['rootSnapshot']:
+            if _snapshot is not None and _snapshot and not _vm['rootSnapshot']:
                 continue
-            if _snapshot is not None and not _snapshot and _objVms[_key]['rootSnapshot']:
+            if _snapshot is not None and not _snapshot and _vm['rootSnapshot']:
                 continue
 
-            if _consolidate is not None and _objVms[_key]['runtime.consolidationNeeded'] != _consolidate:
-                continue
-            if _power is not None and _power and _objVms[_key]['runtime.powerState'] == vim.VirtualMachinePowerState.poweredOff:
+            if _consolidate is not None and _vm['runtime.consolidationNeeded'] != _consolidate:
                 continue
-            if _power is not None and not _power and _objVms[_key]['runtime.powerState'] == vim.VirtualMachinePowerState.poweredOn:
+            if _power is not None and _power and _vm['runtime.powerState'] == vim.VirtualMachinePowerState.poweredOff:
                 continue
-
-            if _cluster is not None and _cluster.lower() not in _objVms[_key]['id'].runtime.host.parent.name.lower():
-                continue
-
-            try:
-                if _host is not None and _host.lower() not in _objVms[_key]['id'].runtime.host.name.lower():
-                    continue
-            except:
+            if _power is not None and not _power and _vm['runtime.powerState'] == vim.VirtualMachinePowerState.poweredOn:
                 continue
 
-            _vms[_key] = _objVms[_key]
-        _objVms = _vms
-
-        return _objVms
+            yield _key, _vm
 
     def _waitOnTask(self, task, title=None, wait=42):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _task = task
         _title = title
@@ -2359,11 +4397,16 @@ class VCLI(object):
             self._print(_title)
         self._print('Waiting {0} seconds for task to complete'.format(_wait), 1)
         import time
-        for _i in range(_wait):
-            self._print('[_task.info.state]  {0}'.format(_task.info.state), 3)
-            if _task.info.state in [vim.TaskInfo.State.success, vim.TaskInfo.State.error]:
-                break
-            time.sleep(1)
+        _start = time.time()
+        self._statsPhase = 'task_wait'
+        try:
+            for _i in range(_wait):
+                self._print('[_task.info.state]  {0}'.format(_task.info.state), 3)
+                if _task.info.state in [vim.TaskInfo.State.success, vim.TaskInfo.State.error]:
+                    break
+                time.sleep(1)
+        finally:
+            self._addStatsTime('task_wait', _start)
 
         #
         # check task result
@@ -2380,6 +4423,13 @@ class VCLI(object):
         else:
             self._print('  Task state:  {0}'.format(_state))
 
+        #
+        # the cached inventory no longer reflects the objects the task changed
+        #
+        self._refresh()
+        if _state != vim.TaskInfo.State.error:
+            self._invalidate([_task.info.entity, _task.info.result])
+
         return _state
 
     ## ---------- ---------- ---------- ----------
@@ -2389,8 +4439,6 @@ class VCLI(object):
     # vcli.py info ...
     #
     def _info(self, names):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _names = names
         _objVms = self._getVmObjects(_names, match=True)
         for _key in _objVms:
@@ -2398,8 +4446,6 @@ class VCLI(object):
             self._displayVmInfo(_vm)
 
     def _displayVmInfo(self, vm):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _vm = vm
 
         #
@@ -2447,7 +4493,7 @@ class VCLI(object):
         self._print('# Total:  {0}'.format(_total))
 
     def _displayVmotionEvents(self, vm):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _byEntity = vim.event.EventFilterSpec.ByEntity(entity=vm, recursion='self')
         _ids = ['VmRelocatedEvent', 'DrsVmMigratedEvent', 'VmMigratedEvent']
@@ -2455,7 +4501,7 @@ class VCLI(object):
 
         # Optionally filter by users
 
-        _eventManager = self._si.content.eventManager
+        _eventManager = self._loginVcenter().content.eventManager
         _events = _eventManager.QueryEvent(_filterSpec)
 
         if len(_events) == 0:
@@ -2489,8 +4535,6 @@ class VCLI(object):
     # vcli.py list ...
     #
     def _list(self, obj, names=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _names = names
         _object = obj
         if _object in ['category', 'cat']:
@@ -2528,14 +4572,56 @@ class VCLI(object):
     #  vcli.py list ...
     #
     def _listCluster(self, names=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _names = names
 
         _hdr = ('# Cluster', 'Skts', 'Cores', 'CPUs', 'Used', 'Usage', 'Memory', 'Used', 'Usage', 'Hosts')
         _fmt = self._printRow(_hdr)
 
-        _objClusters = self._getObjects('cluster', _names)
+        _objClusters = self._getObjects('cluster', _names, properties=['host'])
+
+        # named clusters, only their hosts and VMs are retrieved
+        _roots = [_objClusters[_key]['id'] for _key in _objClusters] if _names is not None and len(_names) > 0 else None
+
+        #
+        # one retrieval over hosts, hardware summary and parent cluster,
+        # instead of reading cluster.host one host at a time
+        #
+        _hostSpecs = [(vim.HostSystem, ['name', 'parent', 'summary.hardware.numCpuPkgs', 'summary.hardware.numCpuCores',
+                                        'summary.hardware.numCpuThreads', 'summary.hardware.memorySize'])]
+
+        # hosts in cluster.host order
+        _clusterHosts = dict([(_objClusters[_key]['id']._moId, [_host._moId for _host in _objClusters[_key].get('host') or []]) for _key in _objClusters])
+        _hostTotals = {}
+        for _eachProp in self._iterProperties(_hostSpecs, roots=_roots):
+            _props = dict([(_pset.name, _pset.val) for _pset in _eachProp.propSet])
+            _parent = _props.get('parent')
+            if _parent is None or _parent._moId not in _clusterHosts:
+                continue
+            _hostTotals[_eachProp.obj._moId] = [_props, 0, 0]
+
+        #
+        # one retrieval over VMs, cpu/memory of the powered on ones
+        # added to their host, instead of reading host.vm and each
+        # vm.summary lazily
+        #
+        _vmSpecs = [(vim.VirtualMachine, ['runtime.host', 'runtime.powerState', 'summary.config.numCpu', 'summary.config.memorySizeMB'])]
+
+        for _eachProp in self._iterProperties(_vmSpecs, roots=_roots):
+            _props = dict([(_pset.name, _pset.val) for _pset in _eachProp.propSet])
+            _host = _props.get('runtime.host')
+            if _host is None or _host._moId not in _hostTotals:
+                continue
+            if _props.get('runtime.powerState') != vim.VirtualMachinePowerState.poweredOn:
+                continue
+
+            _mem = _props.get('summary.config.memorySizeMB')
+            if _mem is not None:
+                _mem = int(_mem) / 1024
+            _hostTotals[_host._moId][1] += _props.get('summary.config.numCpu')
+            _hostTotals[_host._moId][2] += _mem
+
         for _key in _objClusters:
             _cluster = _objClusters[_key]['id']
 
@@ -2550,40 +4636,28 @@ class VCLI(object):
             _memAssigned = 0
 
             _hosts = []
-            for _host in _cluster.host:
-                #
-                # get VM cpu/memory allocation
-                #
-                _vmCpus = 0
-                _vmMems = 0
-                for _vm in _host.vm:
-                    if _vm.summary.runtime.powerState == vim.VirtualMachinePowerState.poweredOn:
-                        _cpu = _vm.summary.config.numCpu
-                        _mem = _vm.summary.config.memorySizeMB
-                        if _mem is not None:
-                            _mem = int(_mem) / 1024
-                        _vmCpus += _cpu
-                        _vmMems += _mem
+            for _moId in [_moId for _moId in _clusterHosts[_cluster._moId] if _moId in _hostTotals]:
+                _props, _vmCpus, _vmMems = _hostTotals[_moId]
 
                 _cpuAssigned += _vmCpus
                 _memAssigned += _vmMems
-                _cores += _host.summary.hardware.numCpuCores
-                _sockets += _host.summary.hardware.numCpuPkgs
-                _cpus += _host.summary.hardware.numCpuThreads
+                _cores += _props.get('summary.hardware.numCpuCores')
+                _sockets += _props.get('summary.hardware.numCpuPkgs')
+                _cpus += _props.get('summary.hardware.numCpuThreads')
 
-                _memMb += _host.summary.hardware.memorySize / 1024 / 1024 / 1024
-                _hosts.append(_host.name.split('.')[0].upper())
+                _memMb += _props.get('summary.hardware.memorySize') / 1024 / 1024 / 1024
+                _hosts.append(_props.get('name').split('.')[0].upper())
 
             _cpuUsage = str(round(100 * _cpuAssigned / _cpus, 0)) + '%'
             _memUsage = str(round(100 * _memAssigned / _memMb, 0)) + '%'
 
-            _row = (_cluster.name, _sockets, _cores, _cpus, _cpuAssigned, _cpuUsage, _memMb, _memAssigned, _memUsage, '{count:2}  {hosts}'.format(count=len(_hosts), hosts=_hosts))
+            _row = (_objClusters[_key]['name'], _sockets, _cores, _cpus, _cpuAssigned, _cpuUsage, _memMb, _memAssigned, _memUsage, '{count:2}  {hosts}'.format(count=len(_hosts), hosts=_hosts))
             self._printRow(_row, _fmt)
 
         self._print('# Total:  {0}'.format(len(_objClusters)))
 
     def _listCategory(self, name=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from com.vmware.cis.tagging_client import (Category, Tag)
 
         _long = getattr(self._args, 'long') if hasattr(self._args, 'long') else None
         _atype = getattr(self._args, 'associable-type') if hasattr(self._args, 'associable-type') else None
@@ -2638,8 +4712,6 @@ class VCLI(object):
         self._print('# Total:  {0}'.format(_cnt))
 
     def _listDatacenter(self, names=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _names = names
 
         _hdr = ('# Datacenter', '')
@@ -2652,39 +4724,36 @@ class VCLI(object):
         self._print('# Total:  {0}'.format(len(_objDcs)))
 
     def _listDatastore(self, names=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _names = names
 
         _long = getattr(self._args, 'long') if hasattr(self._args, 'long') else None
 
         _hdr = ('# Datastore', 'Size', 'Free', 'Usage', 'VM')
         _fmt = self._printRow(_hdr)
-        _objDss = self._getObjects('datastore', _names)
+        _objDss = self._getObjects('datastore', _names, properties=['summary.capacity', 'summary.freeSpace', 'vm'])
+        _vmNames = self._getVmNameMap() if _long is not None and _long else {}
         for _key in _objDss:
-            _datastore = _objDss[_key]['id']
+            _datastore = _objDss[_key]
 
             #
             # get all VM using this datastyore
             #
-            _capacity = _datastore.summary.capacity / 1024 / 1024 / 1024
-            _freeSpace = _datastore.summary.freeSpace / 1024 / 1024 / 1024
-            _usage = 100 - int(100 * _datastore.summary.freeSpace / _datastore.summary.capacity)
+            _capacity = _datastore['summary.capacity'] / 1024 / 1024 / 1024
+            _freeSpace = _datastore['summary.freeSpace'] / 1024 / 1024 / 1024
+            _usage = 100 - int(100 * _datastore['summary.freeSpace'] / _datastore['summary.capacity']) if _datastore['summary.capacity'] else None
             if _long is not None and _long:
                 _vms = []
-                for _vm in _datastore.vm:
-                    _vms.append(_vm.name)
+                for _vm in _datastore.get('vm', []):
+                    _vms.append(_vmNames.get(_vm._moId, {}).get('name'))
                 _vms = '{0}  {1}'.format(len(_vms), _vms)
             else:
-                _vms = len(_datastore.vm)
+                _vms = len(_datastore.get('vm', []))
 
-            _row = (_datastore.name, _capacity, _freeSpace, _usage, _vms)
+            _row = (_datastore['name'], _capacity, _freeSpace, _usage, _vms)
             self._printRow(_row, _fmt)
         self._print('# Total:  {0}'.format(len(_objDss)))
 
     def _listHost(self, names=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _names = names
 
         _long = getattr(self._args, 'long') if hasattr(self._args, 'long') else None
@@ -2697,57 +4766,52 @@ class VCLI(object):
         _fmt = self._printRow(_hdr)
 
         #
-        # filter the hosts by namd and cluster
+        # filter the hosts by name, --cluster scopes the retrieval
         #
-        _objHosts = self._getObjects('host', _names)
-        _hosts = {}
-        _cluster = getattr(self._args, 'cluster') if hasattr(self._args, 'cluster') else None
-        for _key in _objHosts:
-            _host = _objHosts[_key]['id']
-            if _cluster is not None and _cluster.lower() not in _host.parent.name.lower():
-                continue
-            _hosts[_key] = _objHosts[_key]
+        _properties = ['vm', 'summary.hardware', 'summary.config.product', 'runtime.inMaintenanceMode', 'config.powerSystemInfo.currentPolicy.shortName']
+        _hosts = self._getObjects('host', _names, properties=_properties, roots=self._getContainerRoots())
+        _clusters = self._getHostClusterMap()
+        _vmNames = self._getVmNameMap() if _long is not None and _long else {}
 
         #
         # display found hosts
         #
         for _key in _hosts:
-            _host = _hosts[_key]['id']
+            _host = _hosts[_key]
+            _hardware = _host['summary.hardware']
 
             # get host info
-            _name = _host.name.split('.')[0].upper()
-            _cluster = _host.parent.name
-            _sockets = _host.summary.hardware.numCpuPkgs
-            _cpus = _host.summary.hardware.numCpuCores
-            _vcpus = _host.summary.hardware.numCpuThreads
+            _name = _host['name'].split('.')[0].upper()
+            _cluster = _clusters.get(_host['id']._moId, (None, None))[1]
+            _sockets = _hardware.numCpuPkgs
+            _cpus = _hardware.numCpuCores
+            _vcpus = _hardware.numCpuThreads
             _cores = _cpus / _sockets
-            _mem = _host.summary.hardware.memorySize / 1024 / 1024 / 1024
+            _mem = _hardware.memorySize / 1024 / 1024 / 1024
 
             if _long is not None and _long:
                 _vms = []
-                for _vm in _host.vm:
-                    _vms.append(_vm.name)
+                for _vm in _host.get('vm', []):
+                    _vms.append(_vmNames.get(_vm._moId, {}).get('name'))
                 _vms = '{count}  {vms}'.format(count=len(_vms), vms=_vms)
             else:
-                _vms = len(_host.vm)
+                _vms = len(_host.get('vm', []))
 
             if _long is None or not _long:
                 _row = (_name, _sockets, _cores, _cpus, _vcpus, _mem, _cluster, _vms)
             else:
-                _model = '{0} {1}'.format(_host.summary.hardware.vendor, _host.summary.hardware.model)
-                _cpuType = _host.summary.hardware.cpuModel
-                _powerPolicy = _host.config.powerSystemInfo.currentPolicy.shortName
-                _maintenance = _host.runtime.inMaintenanceMode
-                _version = _host.summary.config.product.version
-                _build = _host.summary.config.product.build
+                _model = '{0} {1}'.format(_hardware.vendor, _hardware.model)
+                _cpuType = _hardware.cpuModel
+                _powerPolicy = _host.get('config.powerSystemInfo.currentPolicy.shortName')
+                _maintenance = _host.get('runtime.inMaintenanceMode')
+                _version = _host['summary.config.product'].version if _host.get('summary.config.product') is not None else None
+                _build = _host['summary.config.product'].build if _host.get('summary.config.product') is not None else None
                 _row = (_name, _sockets, _cores, _cpus, _vcpus, _mem, _maintenance, _powerPolicy, _version, _build, _model, _cpuType, _cluster, _vms)
             self._printRow(_row, _fmt)
 
         self._print('# Total:  {0}'.format(len(_hosts)))
 
     def _listNetwork(self, names=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _names = names
 
         _os = getattr(self._args, 'os') if hasattr(self._args, 'os') else None
@@ -2758,9 +4822,13 @@ class VCLI(object):
             _hdr = _hdr + ('VM', 'Hosts')
         _fmt = self._printRow(_hdr)
         _objNetworks = self._getNetworkObjects(_names)
+        _vmNames = self._getVmNameMap() if _long is not None and _long else {}
+        _hostNames = self._getHostClusterMap() if _long is not None and _long else {}
         for _key in _objNetworks:
-            _dvs = _objNetworks[_key]['id']
-            _row = (_dvs.name, _dvs.config.defaultPortConfig.vlan.vlanId, len(_dvs.vm), len(_dvs.host))
+            _dvs = _objNetworks[_key]
+            _portConfig = _dvs.get('config.defaultPortConfig')
+            _vlanId = _portConfig.vlan.vlanId if _portConfig is not None else None
+            _row = (_dvs['name'], _vlanId, len(_dvs.get('vm', [])), len(_dvs.get('host', [])))
             if _long is None or not _long:
                 self._printRow(_row, _fmt)
                 continue
@@ -2770,26 +4838,26 @@ class VCLI(object):
             #
             # clusters
             _vms = []
-            for _vm in _dvs.vm:
-                if _os is not None and _os == 'linux' and 'win' in _vm.config.guestId:
+            for _vm in _dvs.get('vm', []):
+                _guestId = _vmNames.get(_vm._moId, {}).get('config.guestId') or ''
+                if _os is not None and _os == 'linux' and 'win' in _guestId:
                     continue
-                if _os is not None and _os == 'windows' and 'win' not in _vm.config.guestId:
+                if _os is not None and _os == 'windows' and 'win' not in _guestId:
                     continue
-                _vms.append(_vm.name)
+                _vms.append(_vmNames.get(_vm._moId, {}).get('name'))
             _row = _row + (_vms,)
 
             # hosts
             _hosts = []
-            for _host in _dvs.host:
-                _hosts.append(_host.name.split('.')[0])
+            for _host in _dvs.get('host', []):
+                _hostName = _hostNames.get(_host._moId, (None, None))[0]
+                _hosts.append(_hostName.split('.')[0] if _hostName is not None else _host._moId)
             _row = _row + (_hosts,)
 
             self._printRow(_row, _fmt)
         self._print('# Total:  {0}'.format(len(_objNetworks)))
 
     def _listResourcePool(self, names=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _names = names
 
         _long = getattr(self._args, 'long') if hasattr(self._args, 'long') else None
@@ -2824,7 +4892,7 @@ class VCLI(object):
             self._printRow(_row, _fmt)
 
     def _listTag(self, name=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from com.vmware.cis.tagging_client import (Category, Tag, TagAssociation)
 
         _long = getattr(self._args, 'long') if hasattr(self._args, 'long') else None
         _category = getattr(self._args, 'category') if hasattr(self._args, 'category') else None
@@ -2896,14 +4964,10 @@ class VCLI(object):
         self._print('# Total:  {0}'.format(_cnt))
 
     def _listTemplate(self, names=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         self._args.template = True
         self._listVirtualMachine(names)
 
     def _listVirtualMachine(self, names=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _names = names
 
         _template = getattr(self._args, 'template') if hasattr(self._args, 'template') else None
@@ -2918,10 +4982,16 @@ class VCLI(object):
 
         _i = 0
         _max = getattr(self._args, 'max') if hasattr(self._args, 'max') else None
-        _objVms = self._getVmObjects(_names, match=None)
-        for _key in _objVms:
-            _vm = _objVms[_key]['id']
-            _row = self._getListVmRow(_vm)
+        #
+        # everything the rows need comes back in one retrieval,
+        # rows are printed as each page arrives
+        #
+        _hosts = self._getHostClusterMap() if _long is not None and _long else None
+
+        # one pass over the VMs
+        _objVms = self._iterVmObjects(_names, match=None, properties=['snapshot', 'config.hardware.device'])
+        for _key, _vm in _objVms:
+            _row = self._getListVmRow(_vm, _hosts)
             if _row is None:
                 continue
 
@@ -2930,13 +5000,13 @@ class VCLI(object):
             _i += 1
             if _max is not None and _i >= _max:
                 break
+        # stop the retrieval, if --max was reached
+        _objVms.close()
 
         self._print('# Total:  {0}'.format(_i))
 
 
     def _listVmResource(self, resource, names=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _resource = resource
         _names = names
 
@@ -2961,7 +5031,7 @@ class VCLI(object):
         self._print('# Total VMs:  {0}'.format(_total))
 
     def _listVmDisk(self, vm, header=True, showName=False, disk=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _vm = vm
         _header = header
@@ -3022,7 +5092,7 @@ class VCLI(object):
         return _total
 
     def _listVmNic(self, vm, header=True, showName=False, nic=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _vm = vm
         _header = header
@@ -3048,12 +5118,11 @@ class VCLI(object):
             if _nic < 10:
                 _nicId = 'Network adapter {0}'.format(_nic)
             else:
-                _dvsObjects = self._getObjects('dvs')
-                for _key in _dvsObjects:
-                    _dvs = _dvsObjects[_key]['id']
-                    _vlanId = _dvs.config.defaultPortConfig.vlan.vlanId
+                _portgroups = self._getPortgroupIndex()
+                for _key in _portgroups:
+                    _vlanId = _portgroups[_key][1]
                     if isinstance(_vlanId, int) and _vlanId == nic:
-                        _pgKey = _dvs.key
+                        _pgKey = _key
                         break
 
         _ipv6 = getattr(self._args, 'ipv6') if hasattr(self._args, 'ipv6') else None
@@ -3081,13 +5150,9 @@ class VCLI(object):
                 _network = _net.network
 
             if _network is None and hasattr(_hw.backing, 'port'):
-                _dvsObjects = self._getObjects('dvs')
-                for _key in _dvsObjects:
-                    _dvs = _dvsObjects[_key]['id']
-                    if _dvs.key == _hw.backing.port.portgroupKey:
-                        _network = _dvs.name
-                        _vlanId = _dvs.config.defaultPortConfig.vlan.vlanId
-                        break
+                _portgroup = self._getPortgroupIndex().get(_hw.backing.port.portgroupKey)
+                if _portgroup is not None:
+                    _network, _vlanId = _portgroup[0], _portgroup[1]
 
             _row = (_hw.deviceInfo.label.replace('Network adapter', ''),
                     type(_hw).__name__.split('.')[3].replace('Virtual', ''),
@@ -3100,8 +5165,6 @@ class VCLI(object):
         return _total
 
     def _listVmSnapshot(self, vm, header=True, showName=False):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _vm = vm
         _header = header
         _showName = showName
@@ -3140,7 +5203,8 @@ class VCLI(object):
     #  vcli.py list vm-tag ...
     #
     def _listVmTag(self, names=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from com.vmware.cis.tagging_client import (Category, Tag, TagAssociation)
+        from com.vmware.vapi.std_client import DynamicID
 
         _names = names
 
@@ -3208,7 +5272,7 @@ class VCLI(object):
     #    vcli.py change --cpu,--memory ...
     #
     def _modifyCompute(self, vm, action, cpu=None, memory=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _vm = vm
         _action = action
@@ -3272,8 +5336,6 @@ class VCLI(object):
     ## ---------- ---------- ---------- ----------
     #  vcli.py add ...
     def _add(self, names):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _names = names
 
         # Compute resource
@@ -3312,7 +5374,7 @@ class VCLI(object):
             self._addVmTag(_tag, _names)
 
     def _addVmDisk(self, vm):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _vm = vm
         _diskSize = getattr(self._args, 'storage-size') if hasattr(self._args, 'storage-size') else 0
@@ -3379,7 +5441,7 @@ class VCLI(object):
         return _state
 
     def _addVmNic(self, vm):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _vm = vm
         _network = getattr(self._args, 'network') if hasattr(self._args, 'network') else None
@@ -3399,11 +5461,16 @@ class VCLI(object):
 
 
         for _key in _objNetworks:
-            _dvs = _objNetworks[_key]['id']
+            _pgKey = _objNetworks[_key].get('key')
+
+        _portgroup = self._getPortgroupIndex().get(_pgKey)
+        if _portgroup is None:
+            self._print('Network {0} is not a distributed portgroup.'.format(_network))
+            return None
 
         _dvsConnection = vim.dvs.PortConnection()
-        _dvsConnection.portgroupKey = _dvs.key
-        _dvsConnection.switchUuid = _dvs.config.distributedVirtualSwitch.uuid
+        _dvsConnection.portgroupKey = _pgKey
+        _dvsConnection.switchUuid = _portgroup[2]
 
         _nicSpec = vim.vm.device.VirtualDeviceSpec()
         _nicSpec.operation = vim.vm.device.VirtualDeviceSpec.Operation.add
@@ -3430,7 +5497,7 @@ class VCLI(object):
         _configSpec = vim.vm.ConfigSpec()
         _configSpec.deviceChange = _devChanges
 
-        _title = 'Adding {0} network to {1}'.format(_dvs.name, _vm.name)
+        _title = 'Adding {0} network to {1}'.format(_portgroup[0], _vm.name)
         _task = _vm.Reconfigure(_configSpec)
         _state = self._waitOnTask(_task, title=_title)
 
@@ -3440,7 +5507,7 @@ class VCLI(object):
     #  vcli.py add -S ...
     #
     def _addVmStorage(self, vm):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _vm = vm
         _size = getattr(self._args, 'storage-size') if hasattr(self._args, 'storage-size') else 0
@@ -3491,7 +5558,8 @@ class VCLI(object):
     # vcli.py add -T  ...
     #
     def _addVmTag(self, tags, names=None, category=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from com.vmware.cis.tagging_client import (Category, Tag, TagAssociation)
+        from com.vmware.vapi.std_client import DynamicID
 
         _tags = self._toList(tags)
         _names = self._toList(names)
@@ -3573,8 +5641,6 @@ class VCLI(object):
     #  vcli.py backup ...
     #
     def _backup(self, names):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _names = names
         self._clone(_names)
 
@@ -3582,7 +5648,7 @@ class VCLI(object):
     #  vcli.py change ...
     #
     def _change(self, names):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _newName = getattr(self._args, 'new-name') if hasattr(self._args, 'new-name') else None
         _append = getattr(self._args, 'append') if hasattr(self._args, 'append') else None
@@ -3695,7 +5761,7 @@ class VCLI(object):
     #  vcli.py clone ...
     #
     def _cloneVm(self, objSrcVm, name):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _objSrcVm = objSrcVm
         _name = name
@@ -3776,7 +5842,8 @@ class VCLI(object):
         return _state
 
     def _getVmTag(self, vm):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from com.vmware.cis.tagging_client import (Category, Tag, TagAssociation)
+        from com.vmware.vapi.std_client import DynamicID
 
         _vm = vm
 
@@ -3801,7 +5868,7 @@ class VCLI(object):
     ## ---------- ---------- ---------- ----------
     #  vcli.py clone -h
     def _clone(self, names, source=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _names = names
         _source = getattr(self._args, 'source') if hasattr(self._args, 'source') else source
@@ -3902,7 +5969,7 @@ class VCLI(object):
     #  vcli.py delete ...
     #
     def _destroy(self, names):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _names = names
         _objVms = self._getVmObjects(_names, match=True)
@@ -3921,7 +5988,7 @@ class VCLI(object):
     ## ---------- ---------- ---------- ----------
     #  vcli.py migrate -h
     def _migrate(self, names):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _names = names
 
@@ -3996,12 +6063,13 @@ class VCLI(object):
                 _task = _vm.Relocate(spec=_relSpec)
                 _state = self._waitOnTask(_task, title=_title, wait=_wait)
 
+        # the destination host and datastore now list the migrated vm
+        self._invalidate([_objHost, _objDatastore])
+
     ## ---------- ---------- ---------- ----------
     #  vcli.py remove ...
     #
     def _remove(self, names):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _names = names
 
         # Compute resource
@@ -4042,7 +6110,7 @@ class VCLI(object):
     #  vcli.py remove -N ...
     #
     def _removeDevice(self, vm, dtype, devId):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _vm = vm
         _dtype = dtype
@@ -4077,7 +6145,8 @@ class VCLI(object):
     #  vcli.py remove -T ...
     #
     def _removeVmTag(self, tags, names=None, category=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from com.vmware.cis.tagging_client import (Category, Tag, TagAssociation)
+        from com.vmware.vapi.std_client import DynamicID
 
         _category = getattr(self._args, 'category') if hasattr(self._args, 'category') and category is None else category
 
@@ -4138,7 +6207,7 @@ class VCLI(object):
     #  vcli.py power ...
     #
     def _power(self, action, names):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _action = action
         _names = names
@@ -4170,7 +6239,7 @@ class VCLI(object):
     #  vcli.py shutdown ...
     #
     def _shutdown(self, names, reboot=None):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+        from pyVmomi import vim
 
         _names = names
         _wait = getattr(self._args, 'wait') if hasattr(self._args, 'wait') else 120
@@ -4198,15 +6267,21 @@ class VCLI(object):
                 self._print('Error Tools Unavailable -- Cannot issue shutdown request to {0}.'.format(_vm.name))
                 continue
 
+            #
+            # poll the power state alone, not the whole summary
+            #
             _i = 0
-            while _vm.summary.runtime.powerState == vim.VirtualMachinePowerState.poweredOn and _i < _wait:
+            _powerState = self._fetch(_vm, 'runtime.powerState')
+            while _powerState == vim.VirtualMachinePowerState.poweredOn and _i < _wait:
                 time.sleep(1)
                 _i += 1
-            if _vm.summary.runtime.powerState == vim.VirtualMachinePowerState.poweredOn:
+                _powerState = self._fetch(_vm, 'runtime.powerState')
+            self._refresh(_vm)
+            if _powerState == vim.VirtualMachinePowerState.poweredOn:
                 self._print('  Unable to shutdown VM.')
                 continue
 
-            if _vm.summary.runtime.powerState == vim.VirtualMachinePowerState.poweredOff:
+            if _powerState == vim.VirtualMachinePowerState.poweredOff:
                 self._print('  VM shutdown successful')
 
             if _hotadd is not None and _hotadd:
@@ -4246,8 +6321,6 @@ class VCLI(object):
     #  vcli.py snapshot ...
     #
     def _snapshot(self, names, action='add'):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-
         _names = names
         _action = action
 
@@ -4324,82 +6397,191 @@ class VCLI(object):
     ## ---------- ---------- ---------- ----------
     # vcli.py ...
     #
-    def main(self):
-        self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
-        self._print('main()', 3)
+    ## ---------- ---------- ---------- ----------
+    # vcli.py daemon
+    #
+    # Commands are read one at a time from ~/.vcli/daemon.sock, as a
+    # JSON line {"argv": [...], "cwd": "..."}.  The command output is
+    # streamed back, followed by "\0" and the exit code.  The client
+    # side is in the vcli wrapper.
+    #
+    def _getDaemonSocket(self):
+        _dir = self._getCacheDir()
+        if _dir is None:
+            return None
+
+        return '{dir}/daemon.sock'.format(dir=_dir)
+
+    def _daemon(self):
+        import json
+        import socket
+
+        _stop = getattr(self._args, 'stop') if hasattr(self._args, 'stop') else None
+        _sockFile = self._getDaemonSocket()
+        if _sockFile is None:
+            self._print('Cannot create the ~/.vcli directory')
+            sys.exit(1)
+
+        #
+        # is a daemon already listening?
+        #
+        _running = False
+        if os.path.exists(_sockFile):
+            try:
+                _conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                _conn.connect(_sockFile)
+                _running = True
+            except socket.error:
+                os.unlink(_sockFile)
+
+        if _stop is not None and _stop:
+            if not _running:
+                self._print('vcli daemon is not running')
+                sys.exit(1)
+            _conn.sendall(json.dumps({'stop': True}) + '\n')
+            _conn.recv(1)
+            _conn.close()
+            self._print('vcli daemon stopped')
+            return
+
+        if _running:
+            _conn.close()
+            self._print('vcli daemon is already running on {0}'.format(_sockFile))
+            sys.exit(1)
 
+        #
+        # log in now, prompting here if needed, and keep the inventory
+        # current through property collector updates
+        #
+        self._loginVcenter()
+        self._loginInventoryService()
+        if self._inventoryTtl is None:
+            self._inventoryTtl = 0
+        if self._inventorySync is None:
+            self._inventorySync = True
+
+        _umask = os.umask(0077)
+        _server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        _server.bind(_sockFile)
+        os.umask(_umask)
+        os.chmod(_sockFile, 0600)
+        _server.listen(5)
+        self._print('vcli daemon listening on {0}'.format(_sockFile))
+
+        _args = self._args
         try:
-            _args = self._parseArguments()
-            self._args = _args
+            while True:
+                _conn, _addr = _server.accept()
+                try:
+                    _request = json.loads(_conn.makefile('r').readline())
+                except ValueError:
+                    _conn.close()
+                    continue
+
+                if _request.get('stop'):
+                    _conn.close()
+                    break
 
-            self._si = self._loginVcenter()
-            self._stubConfig = self._loginInventoryService()
+                self._serve(_conn, _request)
+                self._args = _args
+        finally:
+            _server.close()
+            os.unlink(_sockFile)
 
-            # VCLI application
-            _action = _args.action
+    #
+    # run one forwarded command with its output sent to the client
+    #
+    def _serve(self, conn, request):
+        import time
 
-            #
-            # Informational actions
-            #
-            if _action in ['information', 'info']:
-                self._info(_args.names)
-            elif _action in ['list', 'ls']:
-                self._list(_args.object, _args.names)
+        _conn = conn
+        _request = request
+        _output = _conn.makefile('w', 0)
+        _stdout = sys.stdout
+        _stderr = sys.stderr
+        _cwd = os.getcwd()
+        _start = time.time()
+
+        _code = 0
+        sys.stdout = _output
+        sys.stderr = _output
+        self._serving = True
+        try:
+            os.chdir(_request.get('cwd', _cwd).encode('utf-8'))
+            self._resetRequest()
+            self._run([_arg.encode('utf-8') for _arg in _request.get('argv', [])])
+        except SystemExit, _e:
+            _code = _e.code if isinstance(_e.code, int) else (0 if _e.code is None else 1)
+        except KeyboardInterrupt:
+            _code = 9
+        except Exception:
+            import traceback
+            traceback.print_exc()
+            _code = 1
+        finally:
+            self._serving = False
+            sys.stdout = _stdout
+            sys.stderr = _stderr
+            os.chdir(_cwd)
 
-            #
-            # Common actions
-            #
-            elif _action in ['add']:
-                self._add(_args.names)
-            elif _action in ['backup']:
-                self._backup(_args.names)
-            elif _action in ['change']:
-                self._change(_args.names)
-            elif _action in ['clone']:
-                self._clone(_args.names)
-            elif _action in ['destroy']:
-                self._destroy(_args.names)
-            elif _action in ['migrate']:
-                self._migrate(_args.names)
-            elif _action in ['remove']:
-                self._remove(_args.names)
+        try:
+            _output.write('\0{0}\n'.format(_code))
+            _output.close()
+            _conn.close()
+        except IOError:
+            pass
+        self._print('{0}  exit {1}  {2:.0f} ms'.format(' '.join(_request.get('argv', [])), _code, (time.time() - _start) * 1000), 1)
 
-            #
-            # Power State actions
-            #
-            elif _action in ['reboot', 'shutdown']:
-                _reboot = True if _action == 'reboot' else False
-                self._shutdown(_args.names, _reboot)
-            elif _action in ['reset', 'resume', 'start', 'stop', 'suspend']:
-                self._power(_action, _args.names)
+    #
+    # clear what the previous command left behind, keep the sessions
+    #
+    def _resetRequest(self):
+        import time
 
-            #
-            # Snapshot actions
-            #
-            elif _action in ['consolidate']:
-                _action = 'consolidate'
-                self._snapshot(_args.names, _action)
-            elif _action in ['rm-snapshot', 'merge']:
-                _action = 'remove'
-                self._snapshot(_args.names, _action)
-            elif _action in ['revert']:
-                _action = 'revert'
-                self._snapshot(_args.names, _action)
-            elif _action in ['snapshot']:
-                _action = 'add'
-                self._snapshot(_args.names, _action)
+        # tracing and timing wrappers installed by _enableTracing() and _startStats()
+        for _name in self.__dict__.keys():
+            if getattr(self.__dict__[_name], '__name__', None) in ['_tracer', '_timer']:
+                del self.__dict__[_name]
+
+        self._args = None
+        self._csvWriter = None
+        self._ts = self._getTimestamp()
+        self._requestInventory = None
+        self._memoize = False
+        self._portgroupIndex = None
+        self._propertyCache = {}
+        self._propertyHits = 0
+        self._propertyFetches = 0
+        self._fetchTrace = None
+        self._stats = None
 
-            #
-            # Administrative actions
-            # Password encryption/decryption
-            #
-            elif _action in ['encrypt', 'enc']:
-                _cipher = self._encrypt(_args.password)
-                self._print('Encrypted ciphertext: {0}'.format(_cipher))
-            elif _action in ['decrypt', 'dec']:
-                _password = self._decrypt(_args.password)
-                self._print('Decrypted password: {0}'.format(_password))
+        #
+        # sessions may expire while the daemon waits, check them
+        # at most every minute; _login*() log in again if needed
+        #
+        if time.time() - self._sessionChecked < 60:
+            return
+        self._sessionChecked = time.time()
+
+        if self._si is not None:
+            try:
+                if self._si.content.sessionManager.currentSession is None:
+                    self._si = None
+            except:
+                self._si = None
+
+        if self._stubConfig is not None:
+            from com.vmware.cis_client import Session
+            try:
+                Session(self._stubConfig).get()
+            except:
+                self._stubConfig = None
+
+    def main(self):
+        self._print('main()', 3)
 
+        try:
+            self._run()
         except KeyboardInterrupt:
             print 'Aborting'
             sys.exit(9)
@@ -4407,3 +6589,438 @@ class VCLI(object):
             sys.exit(8)
 
         sys.exit(0)
+
+    #
+    # Parse argv and run the action, by main() and by the daemon for
+    # each forwarded command
+    #
+    def _run(self, argv=None):
+        import time
+
+        _start = time.time()
+        _args = self._parseArguments(argv)
+        self._args = _args
+
+        _verbose = getattr(_args, 'verbose') if hasattr(_args, 'verbose') else None
+        if _verbose is not None and _verbose >= self._traceLevel:
+            self._enableTracing()
+        self._startStats(_start)
+        self._startCassette(_args)
+
+        #
+        # Logins are brokered lazily, the vcenter (SOAP) and the
+        # inventory service (vAPI) sessions are opened by
+        # _loginVcenter() and _loginInventoryService() the first
+        # time an action actually needs them.
+        #
+
+        #
+        # vcli --profile FILE ..., view with python -m pstats FILE
+        #
+        _profile = getattr(_args, 'profile') if hasattr(_args, 'profile') else None
+        try:
+            if _profile is not None:
+                import cProfile
+                _profiler = cProfile.Profile()
+                try:
+                    _profiler.runcall(self._dispatch, _args)
+                finally:
+                    _profiler.dump_stats(_profile)
+                    sys.stderr.write('# Profile written to {0}\n'.format(_profile))
+            else:
+                self._dispatch(_args)
+
+        #
+        # the commands that fail are costed too
+        #
+        finally:
+            if self._propertyHits + self._propertyFetches > 0:
+                self._print('Property reads:  {0} fetched, {1} served from memory'.format(self._propertyFetches, self._propertyHits), 1)
+
+            self._printFetchTrace()
+            self._printStats()
+
+    #
+    # Run the action
+    #
+    def _dispatch(self, args):
+        _args = args
+
+        # VCLI application
+        _action = _args.action
+
+        #
+        # add looks the vms up again for tags, and the networks for each
+        # vm; clone looks the vms up after each clone, and for the tags
+        # copied to it
+        #
+        self._memoize = _action in ['add', 'backup', 'clone']
+
+        #
+        # Informational actions
+        #
+        if _action in ['information', 'info']:
+            self._info(_args.names)
+        elif _action in ['list', 'ls']:
+            self._list(_args.object, _args.names)
+
+        #
+        # Common actions
+        #
+        elif _action in ['add']:
+            self._add(_args.names)
+        elif _action in ['backup']:
+            self._backup(_args.names)
+        elif _action in ['change']:
+            self._change(_args.names)
+        elif _action in ['clone']:
+            self._clone(_args.names)
+        elif _action in ['destroy']:
+            self._destroy(_args.names)
+        elif _action in ['migrate']:
+            self._migrate(_args.names)
+        elif _action in ['remove']:
+            self._remove(_args.names)
+
+        #
+        # Power State actions
+        #
+        elif _action in ['reboot', 'shutdown']:
+            _reboot = True if _action == 'reboot' else False
+            self._shutdown(_args.names, _reboot)
+        elif _action in ['reset', 'resume', 'start', 'stop', 'suspend']:
+            self._power(_action, _args.names)
+
+        #
+        # Snapshot actions
+        #
+        elif _action in ['consolidate']:
+            _action = 'consolidate'
+            self._snapshot(_args.names, _action)
+        elif _action in ['rm-snapshot', 'merge']:
+            _action = 'remove'
+            self._snapshot(_args.names, _action)
+        elif _action in ['revert']:
+            _action = 'revert'
+            self._snapshot(_args.names, _action)
+        elif _action in ['snapshot']:
+            _action = 'add'
+            self._snapshot(_args.names, _action)
+
+        #
+        # Administrative actions
+        # Password encryption/decryption
+        #
+        elif _action in ['encrypt', 'enc']:
+            _cipher = self._encrypt(_args.password)
+            self._print('Encrypted ciphertext: {0}'.format(_cipher))
+        elif _action in ['decrypt', 'dec']:
+            _password = self._decrypt(_args.password)
+            self._print('Decrypted password: {0}'.format(_password))
+
+        #
+        # vcli daemon
+        #
+        elif _action in ['daemon']:
+            self._daemon()
+
+
+#
+# multiprocessing worker for VCLI._iterShards(), a module level
+# function so that it can be pickled
+#
+def retrieveShard(job):
+    _vcli = VCLI.__new__(VCLI)
+    return _vcli._retrieveShard(job)
+
+
+class InventoryRecord(object):
+    '''
+    One object returned by VCLI._getObjects().
+
+    Properties live in __slots__ instead of a per object dict, and are
+    read with their property path, as the dict used to be:
+
+        record['name'], record.get('config.guestId'), 'rootSnapshot' in record
+
+    record['id'] is the managed object.  Unset properties are missing.
+    '''
+    __slots__ = ()
+
+    #
+    # property path -> slot name, per record class
+    #
+    _paths = {}
+
+    #
+    # record classes by (type name, property paths)
+    #
+    _classes = {}
+
+    @classmethod
+    def recordClass(cls, typeName, paths):
+        _key = (typeName, tuple(paths))
+        if _key not in cls._classes:
+            _paths = {'id': 'id'}
+            for _path in paths:
+                _paths[_path] = 'p_' + re.sub('[^0-9A-Za-z]', '_', _path)
+            _dict = {'__slots__': tuple(set(_paths.values())), '_paths': _paths}
+            cls._classes[_key] = type('{0}Record'.format(typeName), (cls,), _dict)
+
+        return cls._classes[_key]
+
+    def __getitem__(self, path):
+        try:
+            return getattr(self, self._paths[path])
+        except (KeyError, AttributeError):
+            raise KeyError(path)
+
+    def __setitem__(self, path, value):
+        setattr(self, self._paths[path], value)
+
+    def __contains__(self, path):
+        return path in self._paths and hasattr(self, self._paths[path])
+
+    def get(self, path, default=None):
+        try:
+            return self[path]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return [_path for _path in self._paths if hasattr(self, self._paths[_path])]
+
+
+class Cassette(object):
+    '''
+    HTTP exchanges recorded by vcli --record DIR and served back by
+    vcli --replay DIR, without a vcenter.
+
+        DIR/soap.jsonl    pyVmomi requests and responses
+        DIR/vapi.jsonl    inventory service (vAPI) requests and responses
+        DIR/session.json  vcenter API version, placeholders for the session
+                          cookie and the vAPI session id
+
+    One exchange per line, bodies are kept as text so a trace can be
+    scrubbed before it is shared.  The live session cookie and vAPI
+    session id are never written, Set-Cookie headers are dropped and
+    the session id is replaced by its placeholder.  A request is answered by the first
+    unused exchange with the same body, else by the next unused one of
+    the same operation (e.g. RetrievePropertiesEx), else, when the same
+    request is sent again, by its last exchange.
+    '''
+
+    _channels = ['soap', 'vapi']
+
+    #
+    # session.json values, replay sends them but vcenter is not there
+    # to check them
+    #
+    cookie = 'vmware_soap_session="recorded"'
+    sessionId = 'recorded'
+
+    def __init__(self, path, replay=False):
+        import json
+
+        self.path = path
+        self.replay = replay
+        self.session = {}
+
+        self._scrubs = []
+        self._files = {}
+        self._exchanges = {}
+        self._byRequest = {}
+        self._byOperation = {}
+        self._lastByRequest = {}
+        self._used = set()
+
+        if replay:
+            _file = os.path.join(path, 'session.json')
+            if os.path.isfile(_file):
+                self.session = json.load(open(_file, 'r'))
+            for _channel in self._channels:
+                self._load(_channel)
+        else:
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            for _channel in self._channels:
+                self._files[_channel] = open(os.path.join(path, '{0}.jsonl'.format(_channel)), 'w')
+
+    def _load(self, channel):
+        import collections
+        import json
+
+        self._exchanges[channel] = []
+        _file = os.path.join(self.path, '{0}.jsonl'.format(channel))
+        if not os.path.isfile(_file):
+            return
+
+        for _line in open(_file, 'r'):
+            if _line.strip() == '':
+                continue
+            _exchange = json.loads(_line)
+            _index = len(self._exchanges[channel])
+            self._exchanges[channel].append(_exchange)
+            self._byRequest.setdefault((channel, _exchange.get('request')), collections.deque()).append(_index)
+            self._byOperation.setdefault((channel, _exchange.get('operation')), collections.deque()).append(_index)
+            self._lastByRequest[(channel, _exchange.get('request'))] = _index
+
+    #
+    # SOAP method, or vAPI service.operation, of a request body
+    #
+    def getOperation(self, channel, request):
+        import json
+
+        if request is None:
+            return None
+        if channel == 'soap':
+            _match = re.search(r'<(?:\w+:)?Body[^>]*>\s*<(?:\w+:)?(\w+)', request)
+            return _match.group(1) if _match is not None else None
+
+        try:
+            _params = json.loads(request).get('params', {})
+        except (ValueError, AttributeError):
+            return None
+        return '{0}.{1}'.format(_params.get('serviceId'), _params.get('operationId'))
+
+    #
+    # Replace a live secret by placeholder, in the exchanges already
+    # recorded and in the next ones
+    #
+    def scrub(self, secret, placeholder):
+        import json
+
+        if self.replay or secret is None or secret == '':
+            return
+        self._scrubs.append((secret, placeholder))
+
+        # as it appears in a JSON line
+        _secret = json.dumps(secret)[1:-1]
+        _placeholder = json.dumps(placeholder)[1:-1]
+        for _channel in self._channels:
+            _name = os.path.join(self.path, '{0}.jsonl'.format(_channel))
+            self._files[_channel].close()
+            _text = open(_name, 'r').read()
+            _file = open(_name, 'w')
+            _file.write(_text.replace(_secret, _placeholder))
+            _file.close()
+            self._files[_channel] = open(_name, 'a')
+
+    def _scrub(self, text):
+        _text = text
+        for _secret, _placeholder in self._scrubs:
+            if _text is not None:
+                _text = _text.replace(_secret, _placeholder)
+        return _text
+
+    def save(self, **fields):
+        import json
+
+        self.session.update(fields)
+        _file = open(os.path.join(self.path, 'session.json'), 'w')
+        json.dump(self.session, _file, indent=2, sort_keys=True)
+        _file.close()
+
+    def record(self, channel, request, status, reason, headers, body):
+        import json
+
+        _request = self._scrub(request)
+        _exchange = {
+            'operation': self.getOperation(channel, _request),
+            'request': _request,
+            'status': status,
+            'reason': reason,
+            'headers': [[_name, self._scrub(_value)] for _name, _value in headers
+                        if _name.lower() not in ['content-encoding', 'content-length', 'transfer-encoding', 'set-cookie', 'set-cookie2']],
+            'body': self._scrub(body),
+        }
+        self._files[channel].write(json.dumps(_exchange) + '\n')
+        self._files[channel].flush()
+
+    #
+    # the recorded exchange answering request, None if there is none
+    #
+    def play(self, channel, request):
+        _request = request.decode('utf-8') if isinstance(request, str) else request
+        for _queues, _key in [(self._byRequest, _request), (self._byOperation, self.getOperation(channel, request))]:
+            _queue = _queues.get((channel, _key))
+            while _queue is not None and len(_queue) > 0:
+                _index = _queue.popleft()
+                if (channel, _index) not in self._used:
+                    self._used.add((channel, _index))
+                    return self._exchanges[channel][_index]
+
+        #
+        # e.g. RetrieveServiceContent, sent once more by a stub
+        # that never logged in
+        #
+        _index = self._lastByRequest.get((channel, _request))
+        return self._exchanges[channel][_index] if _index is not None else None
+
+    #
+    # read a live response, record it, and return it as a cassette
+    # response for the caller to read
+    #
+    def recordResponse(self, channel, request, response):
+        import zlib
+
+        _body = response.read()
+        _encoding = (response.getheader('Content-Encoding') or 'identity').lower()
+        if _encoding == 'gzip':
+            _body = zlib.decompress(_body, 16 + zlib.MAX_WBITS)
+        elif _encoding == 'deflate':
+            _body = zlib.decompress(_body)
+
+        _headers = response.getheaders()
+        self.record(channel, request, response.status, response.reason, _headers, _body)
+
+        return CassetteResponse(response.status, response.reason, _headers, _body)
+
+
+class CassetteResponse(object):
+    '''
+    httplib response of a cassette exchange, read by pyVmomi.
+    '''
+
+    def __init__(self, status, reason, headers, body):
+        import StringIO
+
+        self.status = status
+        self.reason = reason
+        self._headers = dict([(_name.lower(), _value) for _name, _value in headers if _name.lower() not in ['content-encoding', 'content-length', 'transfer-encoding']])
+        self._body = StringIO.StringIO(body.encode('utf-8') if isinstance(body, unicode) else body)
+
+    def getheader(self, name, default=None):
+        return self._headers.get(name.lower(), default)
+
+    def getheaders(self):
+        return self._headers.items()
+
+    def read(self, amt=None):
+        return self._body.read() if amt is None else self._body.read(amt)
+
+    def close(self):
+        pass
+
+
+class CassetteConnection(object):
+    '''
+    httplib connection of vcli --replay, answers from the cassette.
+    '''
+
+    def __init__(self, cassette):
+        self._cassette = cassette
+        self._request = None
+
+    def request(self, method, url, body=None, headers=None):
+        self._request = body
+
+    def getresponse(self):
+        _exchange = self._cassette.play('soap', self._request)
+        if _exchange is None:
+            _operation = self._cassette.getOperation('soap', self._request)
+            return CassetteResponse(404, 'No recorded response for {0}'.format(_operation), [], '')
+        return CassetteResponse(_exchange['status'], _exchange['reason'], _exchange['headers'], _exchange['body'])
+
+    def close(self):
+        pass
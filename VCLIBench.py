@@ -0,0 +1,485 @@
+#!/usr/bin/env python
+'''
+    VMware Command Line Interface (vcli) benchmarks
+
+    File name: VCLIBench.py
+    Author: Dung Nguyen
+    Date created: 12/28/2019
+    Python Version: 2.7
+
+    Usage:
+        python VCLIBench.py startup [-n COUNT]
+        python VCLIBench.py trace [-n ROWS]
+        python VCLIBench.py memory [-n VMS]
+        python VCLIBench.py suite [-s SIZES] [-c CASE] [-o FILE] [-b BASELINE] [-t PERCENT]
+'''
+
+import os
+import sys
+import time
+import subprocess
+
+
+#
+# light stand-ins for pyVmomi ObjectContent / DynamicProperty, so the
+# memory benchmark runs without pyVmomi or a vcenter
+#
+class _FakeObject(object):
+    def __init__(self, moId):
+        self._moId = moId
+
+
+class _FakeProperty(object):
+    def __init__(self, name, val):
+        self.name = name
+        self.val = val
+
+
+class _FakeObjectContent(object):
+    def __init__(self, obj, propSet):
+        self.obj = obj
+        self.propSet = propSet
+
+
+class VCLIBench(object):
+    '''
+    VCLI benchmark module.
+    '''
+
+    #
+    # the argparse object
+    #
+    _args = None
+
+    #
+    # modules VCLI.py used to import at load time
+    #
+    _eagerModules = [
+        'requests',
+        'pyVim.connect',
+        'pyVmomi',
+        'vmware.vapi.lib.connect',
+        'vmware.vapi.security.session',
+        'vmware.vapi.security.user_password',
+        'vmware.vapi.stdlib.client.factories',
+        'com.vmware.cis.tagging_client',
+        'com.vmware.cis_client',
+        'com.vmware.vapi.std_client',
+    ]
+
+    #
+    # vcli read paths of the suite benchmark
+    #
+    _suiteCases = [
+        'list vm',
+        'list vm -l',
+        'list host -l',
+        'list cluster',
+        'list network -l',
+        'list nic',
+        'list tag -l',
+        'list vm-tag',
+        'info server000001',
+    ]
+
+    #
+    # suite metrics checked against the baseline, round trips are
+    # exact, the others are allowed the threshold
+    #
+    _suiteMetrics = ['round_trips', 'vapi_calls', 'bytes_received', 'wall_s', 'peak_rss_kb']
+    _suiteExact = ['round_trips', 'vapi_calls']
+
+    ## ---------- ---------- ---------- ----------
+    #  private methods
+    #
+
+    def _print(self, line=None):
+        _line = line if line is not None else ''
+        print _line
+
+    #
+    # run python code in a fresh interpreter COUNT times,
+    # return the best and median wall time in ms
+    #
+    def _timeInterpreter(self, code, count, stderr=None):
+        _dir = os.path.dirname(os.path.abspath(__file__))
+        _times = []
+        for _i in range(count):
+            _start = time.time()
+            _rc = subprocess.call([sys.executable, '-c', code], cwd=_dir, stderr=stderr)
+            _times.append((time.time() - _start) * 1000)
+            if _rc != 0:
+                return None
+        _times.sort()
+        return (_times[0], _times[len(_times) / 2])
+
+    ## ---------- ---------- ---------- ----------
+    # VCLIBench.py startup
+    #
+    # Load time of VCLI.py now, against the load time it had when
+    # every VMware module was imported at module top level.
+    #
+    def _startup(self):
+        _count = self._args.count
+
+        _available = []
+        _devnull = open(os.devnull, 'w')
+        for _module in self._eagerModules:
+            if self._timeInterpreter('import {0}'.format(_module), 1, stderr=_devnull) is not None:
+                _available.append(_module)
+            else:
+                self._print('# Not installed:  {0}'.format(_module))
+
+        _cases = [
+            ('python', 'pass'),
+            ('import VCLI (lazy)', 'import VCLI'),
+            ('import VCLI (eager)', '; '.join(['import {0}'.format(_module) for _module in _available] + ['import VCLI'])),
+        ]
+
+        _fmt = '%-24s  %8s  %8s'
+        self._print(_fmt % ('# Case', 'Best_ms', 'Median_ms'))
+        _results = {}
+        for _label, _code in _cases:
+            _result = self._timeInterpreter(_code, _count)
+            if _result is None:
+                self._print(_fmt % (_label, 'error', 'error'))
+                continue
+            _results[_label] = _result
+            self._print(_fmt % (_label, '%.1f' % _result[0], '%.1f' % _result[1]))
+
+        if 'import VCLI (lazy)' in _results and 'import VCLI (eager)' in _results:
+            _saving = _results['import VCLI (eager)'][1] - _results['import VCLI (lazy)'][1]
+            self._print('# Saving per invocation:  {0:.1f} ms'.format(_saving))
+
+    ## ---------- ---------- ---------- ----------
+    # VCLIBench.py trace
+    #
+    # Per row cost of VCLI._printRow() with the legacy per-method
+    # trace preamble, with tracing off and with tracing on (-vvv).
+    #
+    def _newVcli(self, verbose=0):
+        import argparse
+        from VCLI import VCLI
+
+        # skip the constructor, it needs a .vcli.conf file
+        _vcli = VCLI.__new__(VCLI)
+        _vcli._args = argparse.Namespace(verbose=verbose, quiet=False, csv=None)
+        if verbose >= _vcli._traceLevel:
+            _vcli._enableTracing()
+        return _vcli
+
+    def _newLegacyVcli(self):
+        import re
+        from VCLI import VCLI
+
+        #
+        # VCLI with the trace preamble every method used to run
+        #
+        class _LegacyVCLI(VCLI):
+            def _printRow(self, row=None, fmt=None, verbosity=0):
+                self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+                return VCLI._printRow(self, row, fmt, verbosity)
+
+            def _printCsv(self, row):
+                self._print('{func}({args})'.format(func=sys._getframe(0).f_code.co_name, args=re.sub('^, ', '', ', '.join(['''{0}="{1}"'''.format(_arg, _value) if _arg != 'self' else '' for _arg, _value in zip(locals().keys(), locals().values())]))), 3)
+                return VCLI._printCsv(self, row)
+
+        _vcli = self._newVcli()
+        _vcli.__class__ = _LegacyVCLI
+        return _vcli
+
+    def _timeRows(self, vcli, rows):
+        _hdr = ('# VM', 'Pwr', 'CPU', 'Mem', 'Disks', 'Snap', 'Con', 'Description')
+        _row = ('server1', 'On', 1, 2, 40, 'No', 'No', 'Test server 1')
+
+        _stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            _fmt = vcli._printRow(_hdr)
+            _start = time.time()
+            for _i in xrange(rows):
+                vcli._printRow(_row, _fmt)
+            _elapsed = time.time() - _start
+        finally:
+            sys.stdout = _stdout
+
+        return _elapsed
+
+    def _trace(self):
+        _rows = self._args.rows
+
+        _cases = [
+            ('legacy preamble', self._newLegacyVcli()),
+            ('tracing off', self._newVcli()),
+            ('tracing on (-vvv)', self._newVcli(verbose=3)),
+        ]
+
+        _fmt = '%-20s  %10s  %10s'
+        self._print(_fmt % ('# Case', 'Total_s', 'Row_us'))
+        for _label, _vcli in _cases:
+            _elapsed = self._timeRows(_vcli, _rows)
+            self._print(_fmt % (_label, '%.3f' % _elapsed, '%.2f' % (_elapsed * 1000000 / _rows)))
+
+    ## ---------- ---------- ---------- ----------
+    # VCLIBench.py memory
+    #
+    # Peak RSS per 10k VMs for the list vm property set, with the
+    # legacy conversion (every page kept, one dict per VM) against
+    # the streamed InventoryRecord conversion.  Each case runs in its
+    # own interpreter.
+    #
+    _vmPaths = ['name', 'rootSnapshot', 'config.template', 'config.guestId', 'config.annotation',
+                'runtime.powerState', 'runtime.consolidationNeeded', 'summary.config.memorySizeMB',
+                'summary.config.numCpu', 'config.version', 'guest.toolsVersion', 'guest.ipAddress', 'runtime.host']
+
+    def _fakePages(self, count, pageSize=1000):
+        _host = _FakeObject('host-1')
+        for _start in xrange(0, count, pageSize):
+            _page = []
+            for _i in xrange(_start, min(count, _start + pageSize)):
+                _values = ['server{0:06d}'.format(_i), None, False, 'rhel7_64Guest', 'Test server {0}'.format(_i),
+                           'poweredOn', False, 4096, 2, 'vmx-13', '10346', '10.0.{0}.{1}'.format(_i / 256 % 256, _i % 256), _host]
+                _propSet = [_FakeProperty(_path, _value) for _path, _value in zip(self._vmPaths, _values)]
+                _page.append(_FakeObjectContent(_FakeObject('vm-{0}'.format(_i)), _propSet))
+            yield _page
+
+    def _memoryChild(self, mode, count):
+        import resource
+        from VCLI import VCLI, InventoryRecord
+
+        _base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        _objects = {}
+        if mode == 'dict':
+            _totalProps = []
+            for _page in self._fakePages(count):
+                _totalProps += _page
+            for _eachProp in _totalProps:
+                _object = {'id': _eachProp.obj}
+                for _pset in _eachProp.propSet:
+                    _object[_pset.name] = _pset.val
+                _objects[_object['name']] = _object
+        else:
+            _vcli = VCLI.__new__(VCLI)
+            _recordClass = InventoryRecord.recordClass('VirtualMachine', self._vmPaths)
+            for _page in self._fakePages(count):
+                for _eachProp in _page:
+                    _record = _vcli._toRecord(_recordClass, _eachProp)
+                    _objects[_record['name']] = _record
+        _peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        # KB on linux
+        print _peak - _base
+
+    def _memory(self):
+        _count = self._args.vms
+
+        _fmt = '%-24s  %10s  %12s'
+        self._print(_fmt % ('# Case', 'Peak_MB', 'MB_per_10k'))
+        for _label, _mode in [('dict (legacy)', 'dict'), ('InventoryRecord', 'record')]:
+            _code = 'from VCLIBench import VCLIBench; VCLIBench()._memoryChild({0!r}, {1})'.format(_mode, _count)
+            _dir = os.path.dirname(os.path.abspath(__file__))
+            try:
+                _kb = int(subprocess.check_output([sys.executable, '-c', _code], cwd=_dir).split()[-1])
+            except (subprocess.CalledProcessError, ValueError, IndexError):
+                self._print(_fmt % (_label, 'error', 'error'))
+                continue
+            self._print(_fmt % (_label, '%.1f' % (_kb / 1024.0), '%.1f' % (_kb / 1024.0 * 10000 / _count)))
+
+    ## ---------- ---------- ---------- ----------
+    # VCLIBench.py suite
+    #
+    # Wall time, round trips, bytes and peak RSS of the main read paths
+    # against the fake vcenter (VCLIFake.py, responses sent through
+    # SOAP XML), one interpreter per case and inventory size.  Results
+    # are written as JSON, and checked against a previous results file:
+    # any extra round trip, another metric past the threshold, a case
+    # that failed or a baseline case that was not run is a regression
+    # and the exit code is 1.
+    #
+    def _suiteSizes(self, vms):
+        _hosts = max(8, vms / 50)
+        return {
+            'vms': vms,
+            'hosts': _hosts,
+            'clusters': max(2, _hosts / 16),
+            'datastores': max(4, _hosts / 4),
+        }
+
+    def _suiteChild(self, command, vms):
+        import json
+        import resource
+        import VCLIFake
+
+        _sizes = self._suiteSizes(vms)
+        _sizes['wire'] = True
+        _backend = VCLIFake.install(_sizes)
+
+        _start = time.time()
+        _code = VCLIFake.command(command.split())
+        _elapsed = time.time() - _start
+        _peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        print json.dumps({
+            'exit': _code or 0,
+            'wall_s': round(_elapsed, 3),
+            'round_trips': _backend.roundTrips,
+            'vapi_calls': _backend.vapiCalls,
+            'bytes_sent': _backend.bytesSent,
+            'bytes_received': _backend.bytesReceived,
+            # KB on linux, the fake inventory included
+            'peak_rss_kb': _peak,
+        }, sort_keys=True)
+
+    def _suiteRun(self, command, vms):
+        import json
+
+        _dir = os.path.dirname(os.path.abspath(__file__))
+        _code = 'from VCLIBench import VCLIBench; VCLIBench()._suiteChild({0!r}, {1})'.format(command, vms)
+        _best = None
+        for _i in range(self._args.repeat):
+            try:
+                _result = json.loads(subprocess.check_output([sys.executable, '-c', _code], cwd=_dir).splitlines()[-1])
+            except subprocess.CalledProcessError as _e:
+                _result = {'exit': _e.returncode}
+            except (ValueError, IndexError):
+                _result = {'exit': 1}
+
+            # a failed run is kept, without metrics, so it is compared
+            if _result['exit'] != 0:
+                _best = _result
+                break
+            if _best is None or _result['wall_s'] < _best['wall_s']:
+                _best = _result
+        _best.update({'case': command, 'vms': vms})
+        return _best
+
+    #
+    # cases and sizes limit the baseline cases that must be in results
+    #
+    def _suiteCompare(self, results, baseline, threshold, cases, sizes):
+        _fmt = '%-20s  %6s  %-14s  %14s  %14s  %8s'
+        _previous = dict([((_result['case'], _result['vms']), _result) for _result in baseline.get('results', [])])
+        _current = set([(_result['case'], _result['vms']) for _result in results])
+
+        _regressions = 0
+        self._print()
+        self._print(_fmt % ('# Case', 'VMs', 'Metric', 'Baseline', 'Now', 'Change'))
+        for _case, _vms in sorted(_previous):
+            if (_case, _vms) in _current or _vms not in sizes:
+                continue
+            if self._args.case is not None and _case not in cases:
+                continue
+            _regressions += 1
+            self._print(_fmt % (_case, _vms, 'exit', _previous[(_case, _vms)].get('exit', 0), 'missing', ''))
+
+        for _result in results:
+            _base = _previous.get((_result['case'], _result['vms']))
+            if _result['exit'] != 0:
+                _regressions += 1
+                self._print(_fmt % (_result['case'], _result['vms'], 'exit', _base.get('exit', 0) if _base is not None else '',
+                                    _result['exit'], 'failed'))
+                continue
+            if _base is None:
+                continue
+            for _metric in self._suiteMetrics:
+                if _metric not in _base:
+                    continue
+                _old = _base[_metric]
+                _new = _result[_metric]
+                if _metric in self._suiteExact:
+                    _regressed = _new > _old
+                else:
+                    _regressed = _new > _old * (1 + threshold / 100.0)
+                if not _regressed:
+                    continue
+                _regressions += 1
+                _change = '%+.1f%%' % ((_new - _old) * 100.0 / _old) if _old else 'new'
+                self._print(_fmt % (_result['case'], _result['vms'], _metric, '{0:,}'.format(_old), '{0:,}'.format(_new), _change))
+
+        self._print('# Regressions:  {0}'.format(_regressions))
+        return _regressions
+
+    def _suite(self):
+        import json
+        import platform
+
+        _sizes = [int(_size) for _size in self._args.sizes.split(',')]
+        _cases = [_case for _case in self._suiteCases if self._args.case is None or _case in self._args.case]
+
+        _baseline = None
+        if self._args.baseline is not None:
+            try:
+                _baseline = json.load(open(self._args.baseline, 'r'))
+            except (IOError, ValueError) as _e:
+                self._print('Cannot read {0}:  {1}'.format(self._args.baseline, _e))
+                sys.exit(1)
+
+        _fmt = '%-20s  %6s  %9s  %7s  %6s  %12s  %10s'
+        self._print(_fmt % ('# Case', 'VMs', 'Wall_s', 'Trips', 'vAPI', 'Bytes_in', 'Peak_MB'))
+        _results = []
+        for _vms in _sizes:
+            for _case in _cases:
+                _result = self._suiteRun(_case, _vms)
+                _results.append(_result)
+                if _result['exit'] != 0:
+                    self._print(_fmt % (_case, _vms, 'exit {0}'.format(_result['exit']), '', '', '', ''))
+                    continue
+                self._print(_fmt % (_case, _vms, '%.3f' % _result['wall_s'], _result['round_trips'], _result['vapi_calls'],
+                                    '{0:,}'.format(_result['bytes_received']), '%.1f' % (_result['peak_rss_kb'] / 1024.0)))
+
+        if self._args.output is not None:
+            _file = open(self._args.output, 'w')
+            json.dump({'python': platform.python_version(), 'repeat': self._args.repeat, 'results': _results}, _file, indent=2, sort_keys=True)
+            _file.close()
+
+        if _baseline is not None and self._suiteCompare(_results, _baseline, self._args.threshold, _cases, _sizes) > 0:
+            sys.exit(1)
+
+    #
+    # Define the CLI arguments
+    #
+    def _parseArguments(self):
+        import argparse
+
+        _parser = argparse.ArgumentParser(description='vcli benchmarks')
+        _spAction = _parser.add_subparsers(title='Benchmark', dest='action')
+
+        _grpStartup = _spAction.add_parser('startup', help='Interpreter start up and VCLI.py load time')
+        _grpStartup.add_argument('-n', '--count', type=int, default=20, help='Number of runs.  Default=20.')
+
+        _grpTrace = _spAction.add_parser('trace', help='Per row cost of call tracing')
+        _grpTrace.add_argument('-n', '--rows', type=int, default=100000, help='Number of rows.  Default=100000.')
+
+        _grpMemory = _spAction.add_parser('memory', help='Peak RSS of the list vm objects')
+        _grpMemory.add_argument('-n', '--vms', type=int, default=50000, help='Number of VMs.  Default=50000.')
+
+        _grpSuite = _spAction.add_parser('suite', help='Read paths against the fake vcenter, with regression thresholds')
+        _grpSuite.add_argument('-s', '--sizes', default='1000,10000,50000', help='Comma separated numbers of VMs.  Default=1000,10000,50000.')
+        _grpSuite.add_argument('-c', '--case', action='append', choices=self._suiteCases, help='Read path to run, may be repeated.  Default=all.')
+        _grpSuite.add_argument('-n', '--repeat', type=int, default=1, help='Runs per case, the fastest is kept.  Default=1.')
+        _grpSuite.add_argument('-o', '--output', help='Write the results to a JSON file.')
+        _grpSuite.add_argument('-b', '--baseline', help='Results JSON file to compare against.')
+        _grpSuite.add_argument('-t', '--threshold', type=float, default=25.0, help='Percent a metric may grow over the baseline.  Default=25.')
+
+        return _parser.parse_args()
+
+    ## ---------- ---------- ---------- ----------
+    # VCLIBench.py ...
+    #
+    def main(self):
+        self._args = self._parseArguments()
+
+        _action = self._args.action
+        if _action in ['startup']:
+            self._startup()
+        elif _action in ['trace']:
+            self._trace()
+        elif _action in ['memory']:
+            self._memory()
+        elif _action in ['suite']:
+            self._suite()
+
+
+# Start program
+if __name__ == '__main__':
+    VCLIBench().main()
@@ -0,0 +1,1493 @@
+#!/usr/bin/env python
+'''
+    VMware Command Line Interface (vcli) fake vSphere backend
+
+    File name: VCLIFake.py
+    Author: Dung Nguyen
+    Date created: 12/28/2019
+    Python Version: 2.7
+
+    An in-memory vcenter for tests and benchmarks.  pyVmomi is used as
+    is, only its SOAP transport is replaced: FakeStub answers the
+    methods vcli calls (ServiceInstance, SessionManager, ViewManager,
+    PropertyCollector, tasks of VirtualMachine) from a synthetic
+    inventory.  The vAPI session and tagging bindings are replaced by
+    in-memory modules.  Every call is counted as one round trip.
+
+    Select it in .vcli.conf, sizes are optional:
+
+        vcenter:
+            host: fake
+            backend: fake
+        fake:
+            clusters: 4
+            hosts: 32
+            vms: 10000
+            wire: true
+
+    wire: true sends every response through SOAP XML, as a vcenter
+    would, and counts its bytes.
+
+    Or run one vcli command against a fresh inventory and print its
+    round trips:
+
+        python VCLIFake.py [--vms VMS ...] [--wire] list vm
+'''
+
+import sys
+import datetime
+
+
+#
+# default inventory size, see Inventory()
+#
+SIZES = {
+    'clusters': 2,
+    'hosts': 8,
+    'vms': 100,
+    'datastores': 4,
+    'portgroups': 8,
+    'nics': 1,
+    'disks': 2,
+    'snapshots': 0,
+    'tags': 10,
+    'seed': 1,
+}
+
+#
+# the backend installed by install()
+#
+_backend = None
+
+# marker for the property paths FakeBackend._vmPath() leaves to the
+# data objects
+_build = object()
+
+
+#
+# data object defaults per class, see _new()
+#
+_defaults = {}
+
+
+#
+# cls(**fields) without the type check of each field, at 50k VMs the
+# checks cost more than vcli itself.  Lists become typed arrays.
+#
+def _new(cls, **fields):
+    if cls not in _defaults:
+        _arrays = dict([(_info.name, _info.type) for _info in cls._GetPropertyList() if issubclass(_info.type, list)])
+        _defaults[cls] = (dict(cls().__dict__), _arrays)
+    _values, _arrays = _defaults[cls]
+
+    _obj = cls.__new__(cls)
+    _obj.__dict__.update(_values)
+    for _name in _arrays:
+        _obj.__dict__[_name] = _arrays[_name]()
+    for _name in fields:
+        if _name not in _values:
+            raise AttributeError(_name)
+        _obj.__dict__[_name] = _arrays[_name](fields[_name]) if _name in _arrays else fields[_name]
+    return _obj
+
+
+class _Vm(object):
+    '''
+    One virtual machine, kept as plain values.  pyVmomi data objects
+    are built only when a property is retrieved.
+    '''
+    __slots__ = ('moId', 'name', 'guestId', 'powerState', 'numCpu', 'memoryMB', 'host', 'pool', 'datastore',
+                 'portgroups', 'nics', 'disks', 'diskGB', 'snapshots', 'annotation', 'template', 'ipAddress',
+                 'uuid', 'version', 'toolsVersion', 'consolidationNeeded')
+
+
+class _Entity(object):
+    '''
+    Any other managed object, its properties in a dict.
+    '''
+    __slots__ = ('moId', 'kind', 'props')
+
+    def __init__(self, moId, kind, props):
+        self.moId = moId
+        self.kind = kind
+        self.props = props
+
+
+class Inventory(object):
+    '''
+    Synthetic inventory: one datacenter, clusters with hosts and a
+    resource pool each, shared datastores, one distributed switch
+    with portgroups (one VLAN each), VMs spread round robin over the
+    hosts, tag categories and tags attached to VMs.
+    '''
+
+    def __init__(self, **sizes):
+        import random
+
+        _sizes = dict(SIZES)
+        for _key in sizes:
+            if sizes[_key] is not None:
+                _sizes[_key] = int(sizes[_key])
+        self.sizes = _sizes
+        _random = random.Random(_sizes['seed'])
+
+        self.entities = {}
+        self.vms = {}
+        self._nextId = 1000
+
+        #
+        # folders and datacenter
+        #
+        self._add('group-d1', 'Folder', {'name': 'Datacenters', 'parent': None, 'childEntity': ['datacenter-2']})
+        self._add('datacenter-2', 'Datacenter', {'name': 'dc1', 'parent': 'group-d1', 'vmFolder': 'group-v3',
+                                                 'hostFolder': 'group-h4', 'datastoreFolder': 'group-s5', 'networkFolder': 'group-n6'})
+        self._add('group-v3', 'Folder', {'name': 'vm', 'parent': 'datacenter-2', 'childEntity': []})
+        self._add('group-h4', 'Folder', {'name': 'host', 'parent': 'datacenter-2', 'childEntity': []})
+        self._add('group-s5', 'Folder', {'name': 'datastore', 'parent': 'datacenter-2', 'childEntity': []})
+        self._add('group-n6', 'Folder', {'name': 'network', 'parent': 'datacenter-2', 'childEntity': []})
+
+        #
+        # storage and network
+        #
+        self.datastores = []
+        for _i in range(max(1, _sizes['datastores'])):
+            _moId = 'datastore-{0}'.format(self._newId())
+            _capacity = 4 * 1024 ** 4
+            self._add(_moId, 'Datastore', {'name': 'ds{0:03d}'.format(_i + 1), 'parent': 'group-s5', 'vm': [],
+                                           'capacity': _capacity, 'freeSpace': _capacity / (2 + _i % 3)})
+            self.entities['group-s5'].props['childEntity'].append(_moId)
+            self.datastores.append(_moId)
+
+        _dvs = 'dvs-{0}'.format(self._newId())
+        self._add(_dvs, 'DistributedVirtualSwitch', {'name': 'dvs1', 'parent': 'group-n6', 'portgroup': [],
+                                                     'uuid': '50 1a 2b 3c 4d 5e 6f 70-81 92 a3 b4 c5 d6 e7 f8'})
+        self.entities['group-n6'].props['childEntity'].append(_dvs)
+        self.portgroups = []
+        for _i in range(max(1, _sizes['portgroups'])):
+            _moId = 'dvportgroup-{0}'.format(self._newId())
+            _vlanId = 100 + _i
+            self._add(_moId, 'DistributedVirtualPortgroup', {'name': 'vlan{0}'.format(_vlanId), 'parent': 'group-n6', 'key': _moId,
+                                                             'vlanId': _vlanId, 'dvs': _dvs, 'vm': [], 'host': []})
+            self.entities['group-n6'].props['childEntity'].append(_moId)
+            self.entities[_dvs].props['portgroup'].append(_moId)
+            self.portgroups.append(_moId)
+
+        #
+        # compute
+        #
+        self.hosts = []
+        _clusters = []
+        for _i in range(max(1, _sizes['clusters'])):
+            _moId = 'domain-c{0}'.format(self._newId())
+            _pool = 'resgroup-{0}'.format(self._newId())
+            self._add(_moId, 'ClusterComputeResource', {'name': 'cluster{0:02d}'.format(_i + 1), 'parent': 'group-h4', 'host': [],
+                                                        'resourcePool': _pool, 'datastore': list(self.datastores), 'network': list(self.portgroups)})
+            self._add(_pool, 'ResourcePool', {'name': 'Resources', 'parent': _moId, 'owner': _moId, 'vm': [], 'resourcePool': []})
+            self.entities['group-h4'].props['childEntity'].append(_moId)
+            _clusters.append(_moId)
+
+        for _i in range(max(1, _sizes['hosts'])):
+            _cluster = _clusters[_i % len(_clusters)]
+            _moId = 'host-{0}'.format(self._newId())
+            self._add(_moId, 'HostSystem', {'name': 'esx{0:03d}.example.com'.format(_i + 1), 'parent': _cluster, 'vm': [],
+                                            'datastore': list(self.datastores), 'network': list(self.portgroups),
+                                            'maintenance': False})
+            self.entities[_cluster].props['host'].append(_moId)
+            for _pg in self.portgroups:
+                self.entities[_pg].props['host'].append(_moId)
+            self.hosts.append(_moId)
+
+        #
+        # virtual machines
+        #
+        _guests = ['rhel7_64Guest', 'rhel8_64Guest', 'centos7_64Guest', 'ubuntu64Guest', 'windows9Server64Guest']
+        for _i in range(_sizes['vms']):
+            _vm = _Vm()
+            _vm.moId = 'vm-{0}'.format(self._newId())
+            _vm.name = 'server{0:06d}'.format(_i + 1)
+            _vm.guestId = _guests[_random.randint(0, len(_guests) - 1)]
+            _vm.powerState = 'poweredOn' if _random.random() < 0.8 else 'poweredOff'
+            _vm.numCpu = _random.choice([1, 2, 4, 8])
+            _vm.memoryMB = _random.choice([2048, 4096, 8192, 16384])
+            _vm.host = self.hosts[_i % len(self.hosts)]
+            _vm.pool = self.entities[self.entities[_vm.host].props['parent']].props['resourcePool']
+            _vm.datastore = self.datastores[_i % len(self.datastores)]
+            _vm.portgroups = [self.portgroups[(_i + _n) % len(self.portgroups)] for _n in range(_sizes['nics'])]
+            _vm.nics = _sizes['nics']
+            _vm.disks = _sizes['disks']
+            _vm.diskGB = _random.choice([20, 40, 80])
+            _vm.snapshots = _sizes['snapshots']
+            _vm.annotation = 'Test server {0}'.format(_i + 1)
+            _vm.template = False
+            _vm.ipAddress = '10.{0}.{1}.{2}'.format(_i / 65536 % 256, _i / 256 % 256, _i % 256) if _vm.powerState == 'poweredOn' else None
+            _vm.uuid = '4210{0:04x}-{1:04x}-{2:04x}-{3:04x}-{4:012x}'.format(_i / 65536 % 65536, _i % 65536, _sizes['seed'] % 65536, 0, _i)
+            _vm.version = 'vmx-13'
+            _vm.toolsVersion = '10346'
+            _vm.consolidationNeeded = False
+            self._addVm(_vm)
+
+        #
+        # tags, one single cardinality category and one multiple
+        #
+        self.categories = {
+            'urn:vmomi:InventoryServiceCategory:env:GLOBAL': {'name': 'env', 'description': 'Environment', 'cardinality': 'SINGLE', 'associable_types': set(['VirtualMachine'])},
+            'urn:vmomi:InventoryServiceCategory:app:GLOBAL': {'name': 'app', 'description': 'Application', 'cardinality': 'MULTIPLE', 'associable_types': set(['VirtualMachine', 'HostSystem'])},
+        }
+        _env = ['prod', 'dev', 'test']
+        self.tags = {}
+        for _i in range(_sizes['tags']):
+            if _i < len(_env):
+                _category, _name = 'urn:vmomi:InventoryServiceCategory:env:GLOBAL', _env[_i]
+            else:
+                _category, _name = 'urn:vmomi:InventoryServiceCategory:app:GLOBAL', 'app{0:02d}'.format(_i - len(_env) + 1)
+            self.tags['urn:vmomi:InventoryServiceTag:{0}:GLOBAL'.format(_name)] = {'name': _name, 'description': '', 'category_id': _category}
+
+        self.attached = {}
+        _tagIds = sorted(self.tags)
+        if len(_tagIds) > 0:
+            for _moId in sorted(self.vms):
+                _tagId = _tagIds[_random.randint(0, len(_tagIds) - 1)]
+                self.attached.setdefault(_moId, set()).add(_tagId)
+
+    def _newId(self):
+        self._nextId += 1
+        return self._nextId
+
+    def _add(self, moId, kind, props):
+        self.entities[moId] = _Entity(moId, kind, props)
+
+    def _addVm(self, vm):
+        self.vms[vm.moId] = vm
+        self.entities['group-v3'].props['childEntity'].append(vm.moId)
+        self.entities[vm.host].props['vm'].append(vm.moId)
+        self.entities[vm.pool].props['vm'].append(vm.moId)
+        self.entities[vm.datastore].props['vm'].append(vm.moId)
+        for _pg in vm.portgroups:
+            self.entities[_pg].props['vm'].append(vm.moId)
+
+    def removeVm(self, moId):
+        _vm = self.vms.pop(moId)
+        self.entities['group-v3'].props['childEntity'].remove(moId)
+        self.entities[_vm.host].props['vm'].remove(moId)
+        self.entities[_vm.pool].props['vm'].remove(moId)
+        self.entities[_vm.datastore].props['vm'].remove(moId)
+        for _pg in _vm.portgroups:
+            self.entities[_pg].props['vm'].remove(moId)
+        self.attached.pop(moId, None)
+
+    def cloneVm(self, moId, name):
+        _src = self.vms[moId]
+        _vm = _Vm()
+        for _slot in _Vm.__slots__:
+            setattr(_vm, _slot, getattr(_src, _slot))
+        _vm.moId = 'vm-{0}'.format(self._newId())
+        _vm.name = name
+        _vm.portgroups = list(_src.portgroups)
+        _vm.powerState = 'poweredOff'
+        _vm.ipAddress = None
+        _vm.snapshots = 0
+        self._addVm(_vm)
+        return _vm
+
+    def moveVm(self, moId, host=None, pool=None, datastore=None):
+        _vm = self.vms[moId]
+        if host is not None and host != _vm.host:
+            self.entities[_vm.host].props['vm'].remove(moId)
+            self.entities[host].props['vm'].append(moId)
+            _vm.host = host
+        if pool is not None and pool != _vm.pool:
+            self.entities[_vm.pool].props['vm'].remove(moId)
+            self.entities[pool].props['vm'].append(moId)
+            _vm.pool = pool
+        if datastore is not None and datastore != _vm.datastore:
+            self.entities[_vm.datastore].props['vm'].remove(moId)
+            self.entities[datastore].props['vm'].append(moId)
+            _vm.datastore = datastore
+
+
+class FakeBackend(object):
+    '''
+    Answers vcli's SOAP methods and vAPI calls from an Inventory.
+    FakeStub counts the SOAP round trips and bytes, the vAPI
+    services the others.
+    '''
+
+    def __init__(self, inventory, wire=False):
+        from pyVmomi import vim, VmomiSupport
+
+        self.inventory = inventory
+        self.wire = wire
+        self.roundTrips = 0
+        self.vapiCalls = 0
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        self.stub = _newStub(self, VmomiSupport.newestVersions.GetName('vim'))
+
+        self._views = {}
+        self._tasks = {}
+        self._pages = {}
+        self._collectors = {}
+        self._filters = {}
+        self._pathTypes = {}
+        self._sharedObjects = {}
+        self._next = 0
+
+        self._types = {
+            'Folder': vim.Folder,
+            'Datacenter': vim.Datacenter,
+            'ClusterComputeResource': vim.ClusterComputeResource,
+            'ResourcePool': vim.ResourcePool,
+            'HostSystem': vim.HostSystem,
+            'VirtualMachine': vim.VirtualMachine,
+            'Datastore': vim.Datastore,
+            'DistributedVirtualSwitch': vim.dvs.VmwareDistributedVirtualSwitch,
+            'DistributedVirtualPortgroup': vim.dvs.DistributedVirtualPortgroup,
+        }
+
+        # nested types, each lookup through pyVmomi costs as much as the object
+        self._vmTypes = {
+            'GuestSummary': vim.vm.Summary.GuestSummary,
+            'ConfigSummary': vim.vm.Summary.ConfigSummary,
+            'NicInfo': vim.vm.GuestInfo.NicInfo,
+            'IpAddress': vim.net.IpConfigInfo.IpAddress,
+            'FlatVer2BackingInfo': vim.vm.device.VirtualDisk.FlatVer2BackingInfo,
+            'DistributedVirtualPortBackingInfo': vim.vm.device.VirtualEthernetCard.DistributedVirtualPortBackingInfo,
+            'ConnectInfo': vim.vm.device.VirtualDevice.ConnectInfo,
+            'FileInfo': vim.vm.FileInfo,
+            'FlagInfo': vim.vm.FlagInfo,
+            'DefaultPowerOpInfo': vim.vm.DefaultPowerOpInfo,
+            'QuickStats': vim.vm.Summary.QuickStats,
+        }
+
+    def _nextKey(self):
+        self._next += 1
+        return self._next
+
+    ## ---------- ---------- ---------- ----------
+    #  managed objects and their properties
+    #
+    def mo(self, moId):
+        from pyVmomi import vim, vmodl
+
+        if moId is None:
+            return None
+        if moId in self.inventory.vms:
+            return vim.VirtualMachine(moId, self.stub)
+        _entity = self.inventory.entities.get(moId)
+        if _entity is not None:
+            return self._types[_entity.kind](moId, self.stub)
+        if moId.startswith('snapshot-'):
+            return vim.vm.Snapshot(moId, self.stub)
+        raise vmodl.fault.ManagedObjectNotFound(msg='The object has already been deleted or has not been completely created', obj=moId)
+
+    def mos(self, moIds):
+        return [self.mo(_moId) for _moId in moIds]
+
+    def exists(self, mo):
+        _moId = mo._moId
+        if mo.__class__.__name__.split('.')[-1] in ['ServiceInstance', 'SessionManager', 'PropertyCollector', 'ViewManager', 'EventManager']:
+            return True
+        if _moId in self._views or _moId in self._tasks:
+            return True
+        if _moId.startswith('snapshot-'):
+            return self._getSnapshot(_moId) is not None
+        return _moId in self.inventory.vms or _moId in self.inventory.entities
+
+    #
+    # Top level property of a managed object, None when unset
+    #
+    def getProperty(self, mo, name):
+        from pyVmomi import vim, vmodl
+
+        _moId = mo._moId
+        if isinstance(mo, vim.ServiceInstance):
+            return self._serviceContent() if name == 'content' else None
+        if isinstance(mo, vim.SessionManager):
+            if name == 'currentSession':
+                return vim.UserSession(key='fake', userName='fake', fullName='fake', loginTime=datetime.datetime(2019, 12, 28), lastActiveTime=datetime.datetime(2019, 12, 28), locale='en', messageLocale='en')
+            return None
+        if isinstance(mo, vim.view.ContainerView):
+            return self.mos(self._viewObjects(_moId)) if name == 'view' else None
+        if isinstance(mo, vim.Task):
+            return self._tasks[_moId] if name == 'info' else None
+        if isinstance(mo, vim.vm.Snapshot):
+            return self._snapshotProperty(_moId, name)
+        if _moId in self.inventory.vms:
+            return self._vmProperty(self.inventory.vms[_moId], name)
+
+        _entity = self.inventory.entities.get(_moId)
+        if _entity is None:
+            raise vmodl.fault.ManagedObjectNotFound(obj=mo)
+        return getattr(self, '_{0}Property'.format(_entity.kind[0].lower() + _entity.kind[1:]))(_entity, name)
+
+    #
+    # Value of a property path, e.g. summary.config.numCpu
+    #
+    def getPath(self, mo, path):
+        _names = path.split('.')
+
+        # the common vm paths, without building the data objects
+        if mo._moId in self.inventory.vms:
+            _value = self._vmPath(self.inventory.vms[mo._moId], path)
+            if _value is not _build:
+                return _value
+
+        _value = self.getProperty(mo, _names[0])
+        for _name in _names[1:]:
+            if _value is None:
+                return None
+            _value = getattr(_value, _name, None)
+        return _value
+
+    def _folderProperty(self, entity, name):
+        if name in ['childEntity']:
+            return self.mos(entity.props['childEntity'])
+        if name in ['parent']:
+            return self.mo(entity.props['parent'])
+        if name in ['childType']:
+            return ['Folder']
+        return entity.props.get(name)
+
+    def _datacenterProperty(self, entity, name):
+        if name in ['parent', 'vmFolder', 'hostFolder', 'datastoreFolder', 'networkFolder']:
+            return self.mo(entity.props[name])
+        if name in ['datastore']:
+            return self.mos(self.inventory.datastores)
+        if name in ['network']:
+            return self.mos(self.inventory.portgroups)
+        return entity.props.get(name)
+
+    def _clusterComputeResourceProperty(self, entity, name):
+        from pyVmomi import vim
+
+        if name in ['parent', 'resourcePool']:
+            return self.mo(entity.props[name])
+        if name in ['host', 'datastore', 'network']:
+            return self.mos(entity.props[name])
+        if name in ['summary']:
+            _hosts = [self.inventory.entities[_moId] for _moId in entity.props['host']]
+            return vim.ClusterComputeResource.Summary(numHosts=len(_hosts), numEffectiveHosts=len(_hosts),
+                                                      numCpuCores=sum([16 for _host in _hosts]), numCpuThreads=sum([32 for _host in _hosts]),
+                                                      totalCpu=sum([16 * 2400 for _host in _hosts]), totalMemory=sum([256 * 1024 ** 3 for _host in _hosts]),
+                                                      effectiveCpu=sum([16 * 2400 for _host in _hosts]), effectiveMemory=sum([256 * 1024 for _host in _hosts]),
+                                                      overallStatus='green')
+        return entity.props.get(name)
+
+    def _resourcePoolProperty(self, entity, name):
+        from pyVmomi import vim
+
+        if name in ['config']:
+            _cpu = vim.ResourceAllocationInfo(reservation=0, expandableReservation=True, limit=-1, shares=vim.SharesInfo(level='normal', shares=4000))
+            _memory = vim.ResourceAllocationInfo(reservation=0, expandableReservation=True, limit=-1, shares=vim.SharesInfo(level='normal', shares=163840))
+            return vim.ResourceConfigSpec(entity=self.mo(entity.moId), cpuAllocation=_cpu, memoryAllocation=_memory)
+        if name in ['parent', 'owner']:
+            return self.mo(entity.props[name])
+        if name in ['vm', 'resourcePool']:
+            return self.mos(entity.props[name])
+        return entity.props.get(name)
+
+    def _hostSystemProperty(self, entity, name):
+        from pyVmomi import vim
+
+        if name in ['parent']:
+            return self.mo(entity.props[name])
+        if name in ['vm', 'datastore', 'network']:
+            return self.mos(entity.props[name])
+        if name in ['summary']:
+            _vms = [self.inventory.vms[_moId] for _moId in entity.props['vm']]
+            _on = [_vm for _vm in _vms if _vm.powerState == 'poweredOn']
+            return vim.host.Summary(
+                host=self.mo(entity.moId),
+                hardware=vim.host.Summary.HardwareSummary(vendor='Dell Inc.', model='PowerEdge R640', cpuModel='Intel(R) Xeon(R) Gold 6130 CPU @ 2.10GHz',
+                                                          cpuMhz=2100, numCpuPkgs=2, numCpuCores=32, numCpuThreads=64,
+                                                          memorySize=512 * 1024 ** 3, numNics=4, numHBAs=2),
+                config=vim.host.Summary.ConfigSummary(name=entity.props['name'], port=443,
+                                                      product=vim.AboutInfo(name='VMware ESXi', fullName='VMware ESXi 6.7.0 build-14320388', vendor='VMware, Inc.',
+                                                                            version='6.7.0', build='14320388', osType='vmnix-x86', apiType='HostAgent', apiVersion='6.7.3')),
+                quickStats=vim.host.Summary.QuickStats(overallCpuUsage=sum([_vm.numCpu * 300 for _vm in _on]), overallMemoryUsage=sum([_vm.memoryMB / 2 for _vm in _on])),
+                runtime=self._hostSystemProperty(entity, 'runtime'),
+                overallStatus='green')
+        if name in ['runtime']:
+            return vim.host.RuntimeInfo(connectionState='connected', powerState='poweredOn', inMaintenanceMode=entity.props['maintenance'])
+        if name in ['config']:
+            return vim.host.ConfigInfo(host=self.mo(entity.moId),
+                                       product=vim.AboutInfo(name='VMware ESXi', version='6.7.0', build='14320388'),
+                                       powerSystemInfo=vim.host.PowerSystem.Info(currentPolicy=vim.host.PowerSystem.PowerPolicy(key=2, name='Balanced', shortName='dynamic')))
+        return entity.props.get(name)
+
+    def _datastoreProperty(self, entity, name):
+        from pyVmomi import vim
+
+        if name in ['parent']:
+            return self.mo(entity.props[name])
+        if name in ['vm']:
+            return self.mos(entity.props[name])
+        if name in ['host']:
+            return [vim.Datastore.HostMount(key=_host, mountInfo=vim.host.MountInfo(accessible=True, mounted=True, accessMode='readWrite')) for _host in self.mos(self.inventory.hosts)]
+        if name in ['summary']:
+            return vim.Datastore.Summary(datastore=self.mo(entity.moId), name=entity.props['name'], url='ds:///vmfs/volumes/{0}/'.format(entity.moId),
+                                         capacity=entity.props['capacity'], freeSpace=entity.props['freeSpace'], type='VMFS', accessible=True)
+        return entity.props.get(name)
+
+    def _distributedVirtualSwitchProperty(self, entity, name):
+        if name in ['parent']:
+            return self.mo(entity.props[name])
+        if name in ['portgroup']:
+            return self.mos(entity.props[name])
+        return entity.props.get(name)
+
+    def _distributedVirtualPortgroupProperty(self, entity, name):
+        from pyVmomi import vim
+
+        if name in ['parent']:
+            return self.mo(entity.props[name])
+        if name in ['vm', 'host']:
+            return self.mos(entity.props[name])
+        if name in ['config']:
+            _vlan = vim.dvs.VmwareDistributedVirtualSwitch.VlanIdSpec(vlanId=entity.props['vlanId'], inherited=False)
+            return vim.dvs.DistributedVirtualPortgroup.ConfigInfo(key=entity.props['key'], name=entity.props['name'], numPorts=128, type='earlyBinding',
+                                                                  policy=vim.dvs.VmwareDistributedVirtualSwitch.VMwarePortgroupPolicy(),
+                                                                  distributedVirtualSwitch=self.mo(entity.props['dvs']),
+                                                                  defaultPortConfig=vim.dvs.VmwareDistributedVirtualSwitch.VmwarePortConfigPolicy(vlan=_vlan))
+        return entity.props.get(name)
+
+    #
+    # vm property paths vcli lists, marker _build for the others
+    #
+    def _vmPath(self, vm, path):
+        if path == 'name':
+            return vm.name
+        if path == 'config.template':
+            return vm.template
+        if path == 'config.guestId' or path == 'summary.config.guestId':
+            return vm.guestId
+        if path == 'config.annotation' or path == 'summary.config.annotation':
+            return vm.annotation
+        if path == 'config.version':
+            return vm.version
+        if path == 'config.uuid' or path == 'summary.config.uuid':
+            return vm.uuid
+        if path == 'runtime.powerState' or path == 'summary.runtime.powerState':
+            return vm.powerState
+        if path == 'runtime.consolidationNeeded':
+            return vm.consolidationNeeded
+        if path == 'runtime.host':
+            return self.mo(vm.host)
+        if path == 'summary.config.memorySizeMB':
+            return vm.memoryMB
+        if path == 'summary.config.numCpu':
+            return vm.numCpu
+        if path == 'guest.toolsVersion':
+            return vm.toolsVersion
+        if path == 'guest.ipAddress' or path == 'summary.guest.ipAddress':
+            return vm.ipAddress
+        return _build
+
+    def _vmProperty(self, vm, name):
+        from pyVmomi import vim
+
+        if name in ['name']:
+            return vm.name
+        if name in ['parent']:
+            return self.mo('group-v3')
+        if name in ['resourcePool']:
+            return self.mo(vm.pool)
+        if name in ['datastore']:
+            return [self.mo(vm.datastore)]
+        if name in ['network']:
+            return self.mos(vm.portgroups)
+        if name in ['runtime']:
+            return _new(vim.vm.RuntimeInfo, host=self.mo(vm.host), powerState=vm.powerState, connectionState='connected', faultToleranceState='notConfigured', recordReplayState='inactive',
+                        consolidationNeeded=vm.consolidationNeeded, maxCpuUsage=vm.numCpu * 2100, maxMemoryUsage=vm.memoryMB)
+        if name in ['config']:
+            _hardware = _new(vim.vm.VirtualHardware, numCPU=vm.numCpu, numCoresPerSocket=1, memoryMB=vm.memoryMB, device=self._vmDevices(vm))
+            return _new(vim.vm.ConfigInfo, name=vm.name, guestId=vm.guestId, guestFullName=vm.guestId, version=vm.version, uuid=vm.uuid,
+                        instanceUuid=vm.uuid, template=vm.template, annotation=vm.annotation, cpuHotAddEnabled=True, memoryHotAddEnabled=True,
+                        hardware=_hardware, changeVersion='2019-12-28T12:00:00Z', modified=datetime.datetime(2019, 12, 28, 12, 0),
+                        files=self._shared(('files', vm.datastore), lambda: _new(self._vmTypes['FileInfo'], vmPathName='[{0}]'.format(vm.datastore))),
+                        flags=self._shared('flags', lambda: _new(self._vmTypes['FlagInfo'])),
+                        defaultPowerOps=self._shared('defaultPowerOps', lambda: _new(self._vmTypes['DefaultPowerOpInfo'])))
+        if name in ['summary']:
+            _guest = _new(self._vmTypes['GuestSummary'], guestId=vm.guestId, guestFullName=vm.guestId, toolsVersionStatus2='guestToolsCurrent',
+                          ipAddress=vm.ipAddress, hostName=vm.name)
+            _config = _new(self._vmTypes['ConfigSummary'], name=vm.name, template=vm.template, vmPathName='[{0}] {1}/{1}.vmx'.format(vm.datastore, vm.name),
+                           memorySizeMB=vm.memoryMB, numCpu=vm.numCpu, numEthernetCards=vm.nics, numVirtualDisks=vm.disks,
+                           uuid=vm.uuid, annotation=vm.annotation, guestId=vm.guestId, guestFullName=vm.guestId)
+            return _new(vim.vm.Summary, vm=self.mo(vm.moId), runtime=self._vmProperty(vm, 'runtime'), guest=_guest, config=_config, overallStatus='green',
+                        quickStats=self._shared('quickStats', lambda: _new(self._vmTypes['QuickStats'], guestHeartbeatStatus='green')))
+        if name in ['guest']:
+            _nets = []
+            if vm.ipAddress is not None:
+                for _i in range(vm.nics):
+                    _address = vm.ipAddress if _i == 0 else '192.168.{0}.{1}'.format(_i, int(vm.moId.split('-')[1]) % 250)
+                    _ip = _new(self._vmTypes['IpAddress'], ipAddress=_address, prefixLength=24)
+                    _pg = self.inventory.entities[vm.portgroups[_i % len(vm.portgroups)]]
+                    _nets.append(_new(self._vmTypes['NicInfo'], deviceConfigId=4000 + _i, network=_pg.props['name'], connected=True, macAddress=self._mac(vm, _i),
+                                      ipAddress=[_address], ipConfig=_new(vim.net.IpConfigInfo, ipAddress=[_ip])))
+            _running = vm.powerState == 'poweredOn'
+            return _new(vim.vm.GuestInfo, toolsVersion=vm.toolsVersion, toolsRunningStatus='guestToolsRunning' if _running else 'guestToolsNotRunning',
+                        guestId=vm.guestId, ipAddress=vm.ipAddress, hostName=vm.name, net=_nets, guestState='running' if _running else 'notRunning')
+        if name in ['snapshot']:
+            if vm.snapshots == 0:
+                return None
+            return _new(vim.vm.SnapshotInfo, rootSnapshotList=[self._snapshotTree(vm, 1)],
+                        currentSnapshot=vim.vm.Snapshot('snapshot-{0}-{1}'.format(vm.moId, vm.snapshots), self.stub))
+        if name in ['rootSnapshot']:
+            return [vim.vm.Snapshot('snapshot-{0}-1'.format(vm.moId), self.stub)] if vm.snapshots > 0 else []
+        return None
+
+    def _mac(self, vm, index):
+        _n = int(vm.moId.split('-')[1])
+        return '00:50:56:{0:02x}:{1:02x}:{2:02x}'.format(_n / 65536 % 256, _n / 256 % 256, (_n + index) % 256)
+
+    #
+    # pieces that are the same on many vms are built once, vcli only
+    # reads them
+    #
+    def _shared(self, key, build):
+        if key not in self._sharedObjects:
+            self._sharedObjects[key] = build()
+        return self._sharedObjects[key]
+
+    def _vmDevices(self, vm):
+        from pyVmomi import vim
+
+        _types = self._vmTypes
+        _disks = vm.disks
+        _devices = [self._shared(('controller', _disks), lambda: _new(vim.vm.device.ParaVirtualSCSIController, key=1000, busNumber=0, sharedBus='noSharing',
+                                                                       deviceInfo=_new(vim.Description, label='SCSI controller 0', summary='VMware paravirtual SCSI'),
+                                                                       device=[2000 + _i for _i in range(_disks)]))]
+
+        _datastore = self.mo(vm.datastore)
+        for _i in range(vm.disks):
+            _uuid = '6000C29{0:01x}-{1:04x}-{2:04x}-{3:04x}-{4:012x}'.format(_i % 16, _i, 0, 0, int(vm.moId.split('-')[1]) * 16 + _i)
+            _backing = _new(_types['FlatVer2BackingInfo'], fileName='[ds] {0}/{0}_{1}.vmdk'.format(vm.name, _i), diskMode='persistent',
+                            thinProvisioned=True, uuid=_uuid, sharing='sharingNone', datastore=_datastore)
+            _label = 'Hard disk {0}'.format(_i + 1)
+            _summary = '{0} GB'.format(vm.diskGB)
+            _devices.append(_new(vim.vm.device.VirtualDisk, key=2000 + _i, controllerKey=1000, unitNumber=_i, capacityInKB=vm.diskGB * 1024 * 1024,
+                                 deviceInfo=self._shared(('description', _label, _summary), lambda: _new(vim.Description, label=_label, summary=_summary)),
+                                 backing=_backing))
+
+        _connected = vm.powerState == 'poweredOn'
+        _connectable = self._shared(('connectable', _connected), lambda: _new(_types['ConnectInfo'], connected=_connected, startConnected=True,
+                                                                               allowGuestControl=True, status='ok'))
+        for _i in range(vm.nics):
+            _pg = vm.portgroups[_i % len(vm.portgroups)]
+            _label = 'Network adapter {0}'.format(_i + 1)
+            _switchUuid = self.inventory.entities[self.inventory.entities[_pg].props['dvs']].props['uuid']
+            _backing = self._shared(('port', _pg), lambda: _new(_types['DistributedVirtualPortBackingInfo'],
+                                                                port=_new(vim.dvs.PortConnection, portgroupKey=_pg, switchUuid=_switchUuid)))
+            _devices.append(_new(vim.vm.device.VirtualVmxnet3, key=4000 + _i, controllerKey=100, unitNumber=7 + _i, macAddress=self._mac(vm, _i), addressType='assigned',
+                                 deviceInfo=self._shared(('description', _label, _pg), lambda: _new(vim.Description, label=_label, summary=_pg)),
+                                 connectable=_connectable, backing=_backing))
+        return _devices
+
+    #
+    # snapshots form a chain, snapshot-<vm moid>-<n>
+    #
+    def _getSnapshot(self, moId):
+        _parts = moId.split('-')
+        if len(_parts) != 4:
+            return None
+        _vm = self.inventory.vms.get('-'.join(_parts[1:3]))
+        if _vm is None or not _parts[3].isdigit() or int(_parts[3]) > _vm.snapshots or int(_parts[3]) < 1:
+            return None
+        return _vm, int(_parts[3])
+
+    def _snapshotTree(self, vm, index):
+        from pyVmomi import vim
+
+        return _new(vim.vm.SnapshotTree, snapshot=vim.vm.Snapshot('snapshot-{0}-{1}'.format(vm.moId, index), self.stub), vm=self.mo(vm.moId),
+                                   name='snap{0}'.format(index), description='Snapshot {0}'.format(index), id=index,
+                                   createTime=datetime.datetime(2019, 12, 28, 12, 0, index % 60), state=vm.powerState, quiesced=False,
+                                   childSnapshotList=[self._snapshotTree(vm, index + 1)] if index < vm.snapshots else [])
+
+    def _snapshotProperty(self, moId, name):
+        _found = self._getSnapshot(moId)
+        if _found is None:
+            return None
+        _vm, _index = _found
+        if name in ['vm']:
+            return self.mo(_vm.moId)
+        if name in ['childSnapshot']:
+            return [self.mo('snapshot-{0}-{1}'.format(_vm.moId, _index + 1))] if _index < _vm.snapshots else []
+        if name in ['config']:
+            return self._vmProperty(_vm, 'config')
+        return None
+
+    ## ---------- ---------- ---------- ----------
+    #  ServiceInstance, views, property collector
+    #
+    def _serviceContent(self):
+        from pyVmomi import vim
+
+        return vim.ServiceInstanceContent(
+            rootFolder=self.mo('group-d1'),
+            propertyCollector=vim.PropertyCollector('propertyCollector', self.stub),
+            viewManager=vim.view.ViewManager('ViewManager', self.stub),
+            sessionManager=vim.SessionManager('SessionManager', self.stub),
+            eventManager=vim.event.EventManager('EventManager', self.stub),
+            about=vim.AboutInfo(name='VMware vCenter Server', fullName='VMware vCenter Server 6.7.0 build-fake', vendor='VMware, Inc.',
+                                version='6.7.0', build='0', osType='linux-x64', apiType='VirtualCenter', apiVersion='6.7.3',
+                                instanceUuid='00000000-0000-0000-0000-000000000000'))
+
+    #
+    # contents of a container, as a ContainerView sees them
+    #
+    def _children(self, moId):
+        if moId in self.inventory.vms:
+            return []
+        _entity = self.inventory.entities[moId]
+        if _entity.kind == 'Folder':
+            return _entity.props['childEntity']
+        if _entity.kind == 'Datacenter':
+            return [_entity.props['vmFolder'], _entity.props['hostFolder'], _entity.props['datastoreFolder'], _entity.props['networkFolder']]
+        if _entity.kind == 'ClusterComputeResource':
+            return _entity.props['host'] + [_entity.props['resourcePool']]
+        if _entity.kind == 'ResourcePool':
+            return _entity.props['resourcePool'] + _entity.props['vm']
+        if _entity.kind == 'HostSystem':
+            return _entity.props['vm']
+        return []
+
+    def _viewObjects(self, viewId):
+        _container, _types, _recursive = self._views[viewId]
+
+        _found = []
+        _seen = set([_container])
+        _stack = list(reversed(self._children(_container)))
+        while len(_stack) > 0:
+            _moId = _stack.pop()
+            if _moId in _seen:
+                continue
+            _seen.add(_moId)
+            _mo = self.mo(_moId)
+            if len(_types) == 0 or isinstance(_mo, tuple(_types)):
+                _found.append(_moId)
+            if _recursive:
+                _stack.extend(reversed(self._children(_moId)))
+
+        return _found
+
+    #
+    # objects selected by a FilterSpec, in order
+    #
+    def _selectObjects(self, filterSpec):
+        from pyVmomi import vmodl
+
+        _named = {}
+        for _objectSpec in filterSpec.objectSet:
+            for _selectSpec in _objectSpec.selectSet or []:
+                if _selectSpec.name:
+                    _named[_selectSpec.name] = _selectSpec
+
+        _objects = []
+        _seen = set()
+
+        def _walk(mo, skip, selectSet, depth):
+            if not skip and mo._moId not in _seen:
+                _seen.add(mo._moId)
+                _objects.append(mo)
+            if depth > 32:
+                return
+            for _selectSpec in selectSet or []:
+                if not isinstance(_selectSpec, vmodl.query.PropertyCollector.TraversalSpec):
+                    _selectSpec = _named.get(_selectSpec.name)
+                    if _selectSpec is None:
+                        continue
+                if not isinstance(mo, _selectSpec.type):
+                    continue
+                _value = self.getPath(mo, _selectSpec.path)
+                for _child in (_value if isinstance(_value, list) else [_value] if _value is not None else []):
+                    _walk(_child, _selectSpec.skip, _selectSpec.selectSet, depth + 1)
+
+        for _objectSpec in filterSpec.objectSet:
+            _walk(_objectSpec.obj, _objectSpec.skip, _objectSpec.selectSet, 0)
+
+        return _objects
+
+    #
+    # declared type of a property path, arrays are sent typed
+    #
+    def _pathType(self, moType, path):
+        from pyVmomi import vmodl
+
+        _key = (moType, path)
+        if _key not in self._pathTypes:
+            _type = moType
+            for _name in path.split('.'):
+                try:
+                    _type = _type._GetPropertyInfo(_name).type
+                except AttributeError:
+                    raise vmodl.query.InvalidProperty(name=path)
+            self._pathTypes[_key] = _type
+        return self._pathTypes[_key]
+
+    #
+    # (filter spec, object) pairs a retrieval returns, missing objects
+    # are reported now
+    #
+    def _retrieve(self, specSet):
+        from pyVmomi import vmodl
+
+        _results = []
+        for _filterSpec in specSet:
+            for _mo in self._selectObjects(_filterSpec):
+                if not self.exists(_mo) and not _filterSpec.reportMissingObjectsInResults:
+                    raise vmodl.fault.ManagedObjectNotFound(msg='The object has already been deleted or has not been completely created', obj=_mo)
+                if any([isinstance(_mo, _propSpec.type) for _propSpec in _filterSpec.propSet]):
+                    _results.append((_filterSpec, _mo))
+
+        return _results
+
+    #
+    # ObjectContent of one object, built when its page is returned
+    #
+    def _content(self, filterSpec, mo):
+        from pyVmomi import vmodl
+
+        if not self.exists(mo):
+            _fault = vmodl.fault.ManagedObjectNotFound(msg='The object has already been deleted or has not been completely created', obj=mo)
+            return vmodl.query.PropertyCollector.ObjectContent(obj=mo, propSet=[], missingSet=[vmodl.query.PropertyCollector.MissingProperty(path='', fault=_fault)])
+
+        _propSet = []
+        for _propSpec in filterSpec.propSet:
+            if not isinstance(mo, _propSpec.type):
+                continue
+            _paths = _propSpec.pathSet or []
+            if _propSpec.all:
+                _paths = [_prop.name for _prop in type(mo)._GetPropertyList()]
+            for _path in _paths:
+                _type = self._pathType(type(mo), _path)
+                _value = self.getPath(mo, _path)
+                if _value is not None:
+                    if isinstance(_value, list):
+                        _value = _type(_value)
+                    _propSet.append(_new(vmodl.DynamicProperty, name=_path, val=_value))
+
+        return _new(vmodl.query.PropertyCollector.ObjectContent, obj=mo, propSet=_propSet)
+
+    def _page(self, results, maxObjects):
+        from pyVmomi import vmodl
+
+        if len(results) == 0:
+            return None
+
+        _token = None
+        if maxObjects is not None and maxObjects > 0 and len(results) > maxObjects:
+            _token = 'token-{0}'.format(self._nextKey())
+            self._pages[_token] = (results[maxObjects:], maxObjects)
+            results = results[:maxObjects]
+
+        return vmodl.query.PropertyCollector.RetrieveResult(token=_token, objects=[self._content(_filterSpec, _mo) for _filterSpec, _mo in results])
+
+    ## ---------- ---------- ---------- ----------
+    #  property collectors of WaitForUpdatesEx.  Each filter keeps the
+    #  values it last reported, a wait reports the differences with
+    #  the inventory now, maxObjectUpdates at a time.
+    #
+    def _createCollector(self):
+        from pyVmomi import vmodl
+
+        _key = 'session[fake]{0}'.format(self._nextKey())
+        self._collectors[_key] = {'filters': [], 'version': 0, 'pending': []}
+        return vmodl.query.PropertyCollector(_key, self.stub)
+
+    def _createFilter(self, collector, spec):
+        from pyVmomi import vmodl
+
+        _key = 'session[fake]{0}'.format(self._nextKey())
+        self._filters[_key] = {'collector': collector._moId, 'spec': spec, 'state': {}}
+        self._collectors[collector._moId]['filters'].append(_key)
+        return vmodl.query.PropertyCollector.Filter(_key, self.stub)
+
+    def _destroyFilter(self, filter):
+        _filter = self._filters.pop(filter._moId, None)
+        if _filter is not None and _filter['collector'] in self._collectors:
+            self._collectors[_filter['collector']]['filters'].remove(filter._moId)
+
+    def _destroyCollector(self, collector):
+        _collector = self._collectors.pop(collector._moId, None)
+        for _key in _collector['filters'] if _collector is not None else []:
+            self._filters.pop(_key, None)
+
+    def _same(self, value, other):
+        from pyVmomi import VmomiSupport
+
+        if value is other:
+            return True
+        if type(value) is not type(other):
+            return False
+        if isinstance(value, (VmomiSupport.DataObject, list)):
+            return repr(value) == repr(other)
+        return value == other
+
+    def _objectUpdates(self, filter):
+        from pyVmomi import vmodl
+
+        _PC = vmodl.query.PropertyCollector
+        _state = filter['state']
+        _current = {}
+        _updates = []
+        for _filterSpec, _mo in self._retrieve([filter['spec']]):
+            _props = dict([(_pset.name, _pset.val) for _pset in self._content(_filterSpec, _mo).propSet])
+            _current[_mo._moId] = (_mo, _props)
+            _old = _state[_mo._moId][1] if _mo._moId in _state else None
+            if _old is None:
+                _changes = [_PC.Change(name=_name, op='assign', val=_props[_name]) for _name in sorted(_props)]
+                _updates.append(_PC.ObjectUpdate(kind='enter', obj=_mo, changeSet=_changes))
+                continue
+            _changes = [_PC.Change(name=_name, op='assign', val=_props[_name]) for _name in sorted(_props) if not self._same(_old.get(_name), _props[_name])]
+            _changes += [_PC.Change(name=_name, op='remove') for _name in sorted(_old) if _name not in _props]
+            if len(_changes) > 0:
+                _updates.append(_PC.ObjectUpdate(kind='modify', obj=_mo, changeSet=_changes))
+
+        for _moId in _state:
+            if _moId not in _current:
+                _updates.append(_PC.ObjectUpdate(kind='leave', obj=_state[_moId][0], changeSet=[]))
+
+        filter['state'] = _current
+        return _updates
+
+    def _waitForUpdates(self, collector, version, options):
+        from pyVmomi import vmodl
+
+        _collector = self._collectors.get(collector._moId)
+        if _collector is None:
+            raise vmodl.fault.ManagedObjectNotFound(msg='The object has already been deleted or has not been completely created', obj=collector)
+
+        if len(_collector['pending']) == 0:
+            for _key in _collector['filters']:
+                _collector['pending'] += [(_key, _update) for _update in self._objectUpdates(self._filters[_key])]
+        if len(_collector['pending']) == 0:
+            return None
+
+        _max = options.maxObjectUpdates if options is not None and options.maxObjectUpdates else len(_collector['pending'])
+        _updates = _collector['pending'][:_max]
+        _collector['pending'] = _collector['pending'][_max:]
+
+        _filterSet = []
+        for _key in _collector['filters']:
+            _objectSet = [_update for _filterKey, _update in _updates if _filterKey == _key]
+            if len(_objectSet) > 0:
+                _filterSet.append(vmodl.query.PropertyCollector.FilterUpdate(filter=vmodl.query.PropertyCollector.Filter(_key, self.stub), objectSet=_objectSet))
+
+        _collector['version'] += 1
+        return vmodl.query.PropertyCollector.UpdateSet(version=str(_collector['version']), filterSet=_filterSet, truncated=len(_collector['pending']) > 0)
+
+    ## ---------- ---------- ---------- ----------
+    #  tasks, completed when they are created
+    #
+    def _task(self, entity, method, result=None, error=None):
+        from pyVmomi import vim
+
+        _key = 'task-{0}'.format(self._nextKey())
+        self._tasks[_key] = vim.TaskInfo(key=_key, task=vim.Task(_key, self.stub), descriptionId=method, entity=entity,
+                                         entityName=getattr(entity, '_moId', None), state='error' if error is not None else 'success',
+                                         result=result, error=error, cancelable=False, cancelled=False,
+                                         reason=vim.TaskReasonUser(userName='root'), queueTime=datetime.datetime.now(),
+                                         startTime=datetime.datetime.now(), completeTime=datetime.datetime.now())
+        return vim.Task(_key, self.stub)
+
+    def _vmMethod(self, mo, name, args):
+        from pyVmomi import vim, vmodl
+
+        _vm = self.inventory.vms.get(mo._moId)
+        if _vm is None:
+            raise vmodl.fault.ManagedObjectNotFound(msg='The object has already been deleted or has not been completely created', obj=mo)
+
+        if name in ['PowerOnVM_Task', 'PowerOffVM_Task', 'ResetVM_Task', 'SuspendVM_Task']:
+            _state = {'PowerOnVM_Task': 'poweredOn', 'PowerOffVM_Task': 'poweredOff', 'ResetVM_Task': 'poweredOn', 'SuspendVM_Task': 'suspended'}[name]
+            if name == 'PowerOnVM_Task' and _vm.powerState == 'poweredOn':
+                return self._task(mo, name, error=vim.fault.InvalidPowerState(msg='The attempted operation cannot be performed in the current state (Powered on).',
+                                                                               requestedState='poweredOn', existingState='poweredOn'))
+            _vm.powerState = _state
+            _vm.ipAddress = '10.0.{0}.{1}'.format(int(_vm.moId.split('-')[1]) / 256 % 256, int(_vm.moId.split('-')[1]) % 256) if _state == 'poweredOn' else None
+            return self._task(mo, name)
+        if name in ['ShutdownGuest', 'StandbyGuest']:
+            _vm.powerState = 'poweredOff'
+            _vm.ipAddress = None
+            return None
+        if name in ['RebootGuest']:
+            return None
+        if name in ['ReconfigVM_Task']:
+            _spec = args[0]
+            if _spec.numCPUs:
+                _vm.numCpu = _spec.numCPUs
+            if _spec.memoryMB:
+                _vm.memoryMB = _spec.memoryMB
+            if _spec.annotation is not None:
+                _vm.annotation = _spec.annotation
+            for _change in _spec.deviceChange or []:
+                _delta = 1 if _change.operation == 'add' else -1 if _change.operation == 'remove' else 0
+                if isinstance(_change.device, vim.vm.device.VirtualDisk):
+                    _vm.disks = max(0, _vm.disks + _delta)
+                elif isinstance(_change.device, vim.vm.device.VirtualEthernetCard):
+                    _vm.nics = max(0, _vm.nics + _delta)
+            return self._task(mo, name)
+        if name in ['CloneVM_Task']:
+            _clone = self.inventory.cloneVm(_vm.moId, args[1])
+            _spec = args[2]
+            if _spec is not None and _spec.powerOn:
+                _clone.powerState = 'poweredOn'
+            if _spec is not None and _spec.template:
+                _clone.template = True
+            return self._task(mo, name, result=self.mo(_clone.moId))
+        if name in ['Destroy_Task']:
+            self.inventory.removeVm(_vm.moId)
+            return self._task(None, name)
+        if name in ['Rename_Task']:
+            _vm.name = args[0]
+            return self._task(mo, name)
+        if name in ['CreateSnapshot_Task']:
+            _vm.snapshots += 1
+            return self._task(mo, name, result=vim.vm.Snapshot('snapshot-{0}-{1}'.format(_vm.moId, _vm.snapshots), self.stub))
+        if name in ['RemoveAllSnapshots_Task']:
+            _vm.snapshots = 0
+            return self._task(mo, name)
+        if name in ['RevertToCurrentSnapshot_Task']:
+            return self._task(mo, name)
+        if name in ['ConsolidateVMDisks_Task']:
+            _vm.consolidationNeeded = False
+            return self._task(mo, name)
+        if name in ['UpgradeVM_Task']:
+            _vm.version = args[0] if len(args) > 0 and args[0] else 'vmx-15'
+            return self._task(mo, name)
+        if name in ['MarkAsTemplate']:
+            _vm.template = True
+            return None
+        if name in ['MarkAsVirtualMachine']:
+            _vm.template = False
+            return None
+        if name in ['MigrateVM_Task']:
+            self.inventory.moveVm(_vm.moId, host=getattr(args[1], '_moId', None), pool=getattr(args[0], '_moId', None))
+            return self._task(mo, name)
+        if name in ['RelocateVM_Task']:
+            _spec = args[0]
+            self.inventory.moveVm(_vm.moId, host=getattr(_spec.host, '_moId', None), pool=getattr(_spec.pool, '_moId', None),
+                                  datastore=getattr(_spec.datastore, '_moId', None))
+            return self._task(mo, name)
+
+        raise vmodl.fault.NotSupported(msg='{0} is not supported by the fake backend'.format(name))
+
+    def _snapshotMethod(self, mo, name, args):
+        from pyVmomi import vmodl
+
+        _found = self._getSnapshot(mo._moId)
+        if _found is None:
+            raise vmodl.fault.ManagedObjectNotFound(msg='The object has already been deleted or has not been completely created', obj=mo)
+        _vm, _index = _found
+
+        if name in ['RemoveSnapshot_Task']:
+            _removeChildren = args[0]
+            _vm.snapshots = _index - 1 if _removeChildren else _vm.snapshots - 1
+            return self._task(self.mo(_vm.moId), name)
+        if name in ['RevertToSnapshot_Task']:
+            return self._task(self.mo(_vm.moId), name)
+
+        raise vmodl.fault.NotSupported(msg='{0} is not supported by the fake backend'.format(name))
+
+    ## ---------- ---------- ---------- ----------
+    #  one SOAP call
+    #
+    def invoke(self, mo, info, args):
+        from pyVmomi import vim, vmodl
+
+        _name = info.wsdlName
+
+        if isinstance(mo, vim.ServiceInstance):
+            if _name == 'RetrieveServiceContent':
+                return self._serviceContent()
+            if _name == 'CurrentTime':
+                return datetime.datetime.now()
+        elif isinstance(mo, vim.SessionManager):
+            if _name in ['Login', 'LoginByToken', 'CloneSession']:
+                return self.getProperty(mo, 'currentSession')
+            if _name == 'Logout':
+                return None
+            if _name == 'AcquireCloneTicket':
+                return 'cst-fake'
+        elif isinstance(mo, vim.view.ViewManager):
+            if _name == 'CreateContainerView':
+                _key = 'session[fake]{0}'.format(self._nextKey())
+                self._views[_key] = (args[0]._moId, args[1] or [], args[2])
+                return vim.view.ContainerView(_key, self.stub)
+        elif isinstance(mo, vim.view.ContainerView):
+            if _name == 'DestroyView':
+                self._views.pop(mo._moId, None)
+                return None
+        elif isinstance(mo, vmodl.query.PropertyCollector):
+            if _name == 'RetrievePropertiesEx':
+                return self._page(self._retrieve(args[0]), args[1].maxObjects if args[1] is not None else None)
+            if _name == 'ContinueRetrievePropertiesEx':
+                if args[0] not in self._pages:
+                    raise vmodl.fault.InvalidArgument(invalidProperty='token')
+                _results, _maxObjects = self._pages.pop(args[0])
+                return self._page(_results, _maxObjects)
+            if _name == 'CancelRetrievePropertiesEx':
+                self._pages.pop(args[0], None)
+                return None
+            if _name == 'RetrieveContents':
+                return [self._content(_filterSpec, _mo) for _filterSpec, _mo in self._retrieve(args[0])]
+            if _name == 'CreatePropertyCollector':
+                return self._createCollector()
+            if _name == 'CreateFilter':
+                if mo._moId not in self._collectors:
+                    raise vmodl.fault.ManagedObjectNotFound(msg='The object has already been deleted or has not been completely created', obj=mo)
+                return self._createFilter(mo, args[0])
+            if _name == 'WaitForUpdatesEx':
+                return self._waitForUpdates(mo, args[0], args[1])
+            if _name == 'DestroyPropertyCollector':
+                self._destroyCollector(mo)
+                return None
+        elif isinstance(mo, vmodl.query.PropertyCollector.Filter):
+            if _name == 'DestroyPropertyFilter':
+                self._destroyFilter(mo)
+                return None
+        elif isinstance(mo, vim.event.EventManager):
+            if _name == 'QueryEvents':
+                return []
+        elif isinstance(mo, vim.VirtualMachine):
+            return self._vmMethod(mo, _name, args)
+        elif isinstance(mo, vim.vm.Snapshot):
+            return self._snapshotMethod(mo, _name, args)
+
+        raise vmodl.fault.NotSupported(msg='{0}.{1} is not supported by the fake backend'.format(type(mo).__name__, _name))
+
+
+#
+# pyVmomi stub adapter that sends each call to the backend instead of
+# vcenter.  SoapStubAdapterBase gives property access (through the
+# property collector, like a real stub) and request serialization, so
+# the arguments of every call are checked as vcenter would.  With
+# backend.wire set, requests and responses also go through SOAP XML
+# and an HTTP connection, for the bytes and the parsing cost of a real
+# vcenter, and for vcli --record.
+#
+def _newStub(backend, version):
+    from pyVmomi import SoapAdapter
+
+    class FakeStub(SoapAdapter.SoapStubAdapterBase):
+        def __init__(self):
+            SoapAdapter.SoapStubAdapterBase.__init__(self, version)
+            self.backend = backend
+            self.requestContext = None
+            self.cookie = 'vmware_soap_session="fake"'
+            self.host = 'fake'
+            self._connection = _Connection(self)
+
+        def GetConnection(self):
+            return self._connection
+
+        def ReturnConnection(self, conn):
+            pass
+
+        def InvokeMethod(self, mo, info, args):
+            _request = self.SerializeRequest(mo, info, args)
+            self.backend.roundTrips += 1
+            self.backend.bytesSent += len(_request)
+            if not self.backend.wire:
+                return self.backend.invoke(mo, info, args)
+            return self._wire(mo, info, args, _request)
+
+        def _wire(self, mo, info, args, request):
+            from pyVmomi import SoapAdapter
+
+            _conn = self.GetConnection()
+            _conn.call = (mo, info, args)
+            _conn.request('POST', '/sdk', request, {'Cookie': self.cookie, 'Content-Type': 'text/xml; charset=utf-8'})
+            _response = _conn.getresponse()
+            _xml = _response.read()
+            self.ReturnConnection(_conn)
+            self.backend.bytesReceived += len(_xml)
+
+            _obj = SoapAdapter.SoapResponseDeserializer(self).Deserialize(_xml, info.result)
+            if _response.status != 200:
+                raise _obj
+            return _obj
+
+        #
+        # (HTTP status, SOAP XML) of a call, as vcenter answers it
+        #
+        def _respond(self, mo, info, args):
+            from pyVmomi import SoapAdapter, VmomiSupport
+
+            _ns = VmomiSupport.GetWsdlNamespace(self.version)
+            _nsMap = SoapAdapter.SOAP_NSMAP.copy()
+            _nsMap[_ns] = ''
+
+            _fault = False
+            try:
+                _result = self.backend.invoke(mo, info, args)
+                _body = ['<{0}Response xmlns="{1}">'.format(info.wsdlName, _ns)]
+                if _result is not None and info.result is not type(None) and not (isinstance(_result, list) and len(_result) == 0):
+                    _body.append(SoapAdapter.SerializeToUnicode(_result, VmomiSupport.Object(name='returnval', type=info.result, version=self.version, flags=0),
+                                                                self.version, _nsMap))
+                _body.append('</{0}Response>'.format(info.wsdlName))
+            except VmomiSupport.GetVmodlType('vmodl.MethodFault') as _e:
+                _fault = True
+                _body = ['<soapenv:Fault><faultcode>ServerFaultCode</faultcode><faultstring>{0}</faultstring>'.format(SoapAdapter.XmlEscape(_e.msg or '')),
+                         '<detail>', SoapAdapter.SerializeToUnicode(_e, VmomiSupport.Object(name='{0}Fault'.format(_e._wsdlName), type=object, version=self.version, flags=0),
+                                                                    self.version, _nsMap), '</detail></soapenv:Fault>']
+
+            _xml = u''.join([SoapAdapter.XML_HEADER, '\n', SoapAdapter.SOAP_ENVELOPE_START, SoapAdapter.SOAP_BODY_START] + _body +
+                            [SoapAdapter.SOAP_BODY_END, SoapAdapter.SOAP_ENVELOPE_END]).encode('utf-8')
+            return 500 if _fault else 200, _xml
+
+    return FakeStub()
+
+
+#
+# httplib connection of a wire stub, answered by the backend.  The
+# stub sets call to the (mo, info, args) of the request it sends.
+#
+class _Connection(object):
+    def __init__(self, stub):
+        self.call = None
+        self._stub = stub
+
+    def request(self, method, url, body=None, headers=None):
+        pass
+
+    def getresponse(self):
+        from VCLI import CassetteResponse
+
+        _status, _xml = self._stub._respond(*self.call)
+        return CassetteResponse(_status, 'OK' if _status == 200 else 'Internal Server Error', [('Content-Type', 'text/xml; charset=utf-8')], _xml)
+
+
+## ---------- ---------- ---------- ----------
+#  vAPI (tagging) stand-ins
+#
+class NotFound(Exception):
+    pass
+
+
+class _DynamicID(object):
+    def __init__(self, type=None, id=None):
+        self.type = type
+        self.id = id
+
+    def __eq__(self, other):
+        return isinstance(other, _DynamicID) and (self.type, self.id) == (other.type, other.id)
+
+    def __hash__(self):
+        return hash((self.type, self.id))
+
+    def __repr__(self):
+        return 'DynamicID(type={0!r}, id={1!r})'.format(self.type, self.id)
+
+
+class _Model(object):
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class _Service(object):
+    def __init__(self, config=None):
+        self._backend = _backend
+
+    def _call(self):
+        self._backend.roundTrips += 1
+        self._backend.vapiCalls += 1
+        return self._backend.inventory
+
+
+class _Session(_Service):
+    def create(self):
+        self._call()
+        return 'fake-session'
+
+    def get(self):
+        self._call()
+        return _Model(user='fake', created_time=datetime.datetime(2019, 12, 28), last_accessed_time=datetime.datetime(2019, 12, 28))
+
+    def delete(self):
+        self._call()
+
+
+class _Category(_Service):
+    def list(self):
+        return sorted(self._call().categories)
+
+    def get(self, category_id):
+        _categories = self._call().categories
+        if category_id not in _categories:
+            raise NotFound(category_id)
+        _category = _categories[category_id]
+        _tags = self._backend.inventory.tags
+        return _Model(id=category_id, name=_category['name'], description=_category['description'], cardinality=_category['cardinality'],
+                      associable_types=set(_category['associable_types']), used_by=set(),
+                      tags=[_tagId for _tagId in _tags if _tags[_tagId]['category_id'] == category_id])
+
+
+class _Tag(_Service):
+    def list(self):
+        return sorted(self._call().tags)
+
+    def get(self, tag_id):
+        _tags = self._call().tags
+        if tag_id not in _tags:
+            raise NotFound(tag_id)
+        _tag = _tags[tag_id]
+        return _Model(id=tag_id, name=_tag['name'], description=_tag['description'], category_id=_tag['category_id'], used_by=set())
+
+    def list_tags_for_category(self, category_id):
+        _tags = self._call().tags
+        return sorted([_tagId for _tagId in _tags if _tags[_tagId]['category_id'] == category_id])
+
+
+class _TagAssociation(_Service):
+    def attach(self, tag_id=None, object_id=None):
+        _inventory = self._call()
+        if tag_id not in _inventory.tags:
+            raise NotFound(tag_id)
+        _inventory.attached.setdefault(object_id.id, set()).add(tag_id)
+
+    def detach(self, tag_id=None, object_id=None):
+        self._call().attached.get(object_id.id, set()).discard(tag_id)
+
+    def list_attached_tags(self, object_id=None):
+        return sorted(self._call().attached.get(object_id.id, set()))
+
+    def list_attached_objects(self, tag_id=None):
+        _inventory = self._call()
+        return [_DynamicID(type='VirtualMachine', id=_moId) for _moId in sorted(_inventory.attached) if tag_id in _inventory.attached[_moId]]
+
+
+class _Connector(object):
+    def set_security_context(self, context):
+        self.context = context
+
+
+class _StubConfigurationFactory(object):
+    @staticmethod
+    def new_std_configuration(connector):
+        return _Model(connector=connector)
+
+
+def _module(name, **attributes):
+    import types
+
+    _mod = types.ModuleType(name)
+    _mod.__dict__.update(attributes)
+    return _mod
+
+
+def _smartConnect(host=None, port=443, user=None, pwd=None, **kwargs):
+    from pyVmomi import vim
+
+    _si = vim.ServiceInstance('ServiceInstance', _backend.stub)
+    _si.content.sessionManager.Login(user or 'fake', pwd or 'fake', None)
+    return _si
+
+
+#
+# Make the fake backend the one vcli talks to, in this process.
+# conf:  sizes for Inventory(), e.g. the .vcli.conf fake section
+#
+def install(conf=None):
+    global _backend
+
+    _conf = conf if conf is not None else {}
+    _backend = FakeBackend(Inventory(**dict([(_key, _conf.get(_key)) for _key in SIZES])), wire=_conf.get('wire') in [True, 'true', 'yes'])
+
+    _modules = {
+        'pyVim.connect': _module('pyVim.connect', SmartConnect=_smartConnect, Disconnect=lambda si: None),
+        'vmware.vapi.lib.connect': _module('vmware.vapi.lib.connect', get_requests_connector=lambda session=None, url=None: _Connector()),
+        'vmware.vapi.security.session': _module('vmware.vapi.security.session', create_session_security_context=lambda session_id: {'session': session_id}),
+        'vmware.vapi.security.user_password': _module('vmware.vapi.security.user_password', create_user_password_security_context=lambda user, password: {'user': user}),
+        'vmware.vapi.stdlib.client.factories': _module('vmware.vapi.stdlib.client.factories', StubConfigurationFactory=_StubConfigurationFactory),
+        'com.vmware.cis_client': _module('com.vmware.cis_client', Session=_Session),
+        'com.vmware.cis.tagging_client': _module('com.vmware.cis.tagging_client', Category=_Category, Tag=_Tag, TagAssociation=_TagAssociation),
+        'com.vmware.vapi.std_client': _module('com.vmware.vapi.std_client', DynamicID=_DynamicID),
+    }
+
+    #
+    # parent packages, when the vAPI bindings are not installed
+    #
+    for _name in _modules.keys():
+        _parts = _name.split('.')
+        for _i in range(1, len(_parts)):
+            _parent = '.'.join(_parts[:_i])
+            if _parent in sys.modules or _parent in _modules:
+                continue
+            try:
+                __import__(_parent)
+            except ImportError:
+                sys.modules[_parent] = _module(_parent, __path__=[])
+
+    for _name in _modules:
+        sys.modules[_name] = _modules[_name]
+        _parent, _child = _name.rsplit('.', 1)
+        setattr(sys.modules[_parent], _child, _modules[_name])
+
+    return _backend
+
+
+def getBackend():
+    return _backend
+
+
+#
+# Run one vcli command against a fresh fake inventory, without
+# .vcli.conf.  Returns (exit code, round trips).
+#
+def run(argv, **sizes):
+    _backend = install(sizes)
+    return command(argv), _backend.roundTrips
+
+
+#
+# Run one vcli command against the installed backend, output goes to
+# /dev/null.  Returns the exit code.
+#
+def command(argv):
+    import os
+    from VCLI import VCLI
+
+    _vcli = VCLI.__new__(VCLI)
+    _vcli._backend = 'fake'
+    _vcli._host = 'fake'
+    _vcli._port = 443
+    _vcli._username = 'fake'
+    _vcli._secret = 'fake'
+    _vcli._ts = _vcli._getTimestamp()
+    _vcli._propertyCache = {}
+
+    _stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        try:
+            _vcli._run(argv)
+            _code = 0
+        except SystemExit as _e:
+            _code = _e.code
+    finally:
+        sys.stdout = _stdout
+
+    return _code
+
+
+def main():
+    import argparse
+
+    _parser = argparse.ArgumentParser(description='Run a vcli command against a synthetic inventory and count its round trips')
+    for _key in sorted(SIZES):
+        _parser.add_argument('--{0}'.format(_key), type=int, help='Default={0}.'.format(SIZES[_key]))
+    _parser.add_argument('--wire', action='store_true', help='Send responses through SOAP XML and count their bytes.')
+    _parser.add_argument('command', nargs=argparse.REMAINDER, help='vcli command, e.g. list vm')
+    _args = _parser.parse_args()
+
+    _sizes = dict([(_key, getattr(_args, _key)) for _key in SIZES])
+    _code, _roundTrips = run(_args.command, wire=_args.wire, **_sizes)
+    print '# Round trips:  {0}'.format(_roundTrips)
+    if _args.wire:
+        print '# Bytes:        {0:,} sent, {1:,} received'.format(_backend.bytesSent, _backend.bytesReceived)
+    sys.exit(_code or 0)
+
+
+# Start program
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,617 @@
+#!/usr/bin/env python
+'''
+    VMware Command Line Interface (vcli) tests
+
+    File name: VCLITest.py
+    Author: Dung Nguyen
+    Date created: 12/28/2019
+    Python Version: 2.7
+
+    vcli commands run against the fake vcenter of VCLIFake.py, with
+    .vcli.conf and ~/.vcli under a temporary HOME.  Needs pyVmomi and
+    PyYAML.
+
+    Usage:
+        python VCLITest.py [-v] [VCLITestCase[.test]]
+'''
+
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+
+class VCLITestCase(unittest.TestCase):
+    '''
+    One fresh fake inventory and one temporary HOME per test.
+    '''
+
+    #
+    # vcenter: entries of .vcli.conf, on top of host and backend
+    #
+    conf = {}
+
+    #
+    # fake: entries of .vcli.conf, the inventory size
+    #
+    sizes = {'clusters': 2, 'hosts': 4, 'vms': 40, 'snapshots': 1}
+
+    def setUp(self):
+        import yaml
+        import VCLIFake
+        from VCLI import VCLI
+
+        self._home = os.environ.get('HOME')
+        self.home = tempfile.mkdtemp(prefix='vcli-test.')
+        os.environ['HOME'] = self.home
+
+        _vcenter = {'host': 'fake', 'username': 'fake', 'backend': 'fake'}
+        _vcenter.update(self.conf)
+        _file = open(os.path.join(self.home, '.vcli.conf'), 'w')
+        yaml.safe_dump({'vcenter': _vcenter, 'fake': self.sizes}, _file, default_flow_style=False)
+        _file.close()
+
+        VCLI._inventoryMemo = {}
+        self.backend = VCLIFake.install(self.sizes)
+
+    def tearDown(self):
+        from VCLI import VCLI
+
+        VCLI._inventoryMemo = {}
+        if self._home is not None:
+            os.environ['HOME'] = self._home
+        shutil.rmtree(self.home, True)
+
+    #
+    # run one vcli command, return (exit code, output), attrs
+    # override what VCLI read from .vcli.conf
+    #
+    def vcli(self, *argv, **attrs):
+        import StringIO
+        from VCLI import VCLI
+
+        _vcli = VCLI()
+        _vcli._secret = 'fake'
+        for _name in attrs:
+            setattr(_vcli, _name, attrs[_name])
+        self.last = _vcli
+
+        _stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            try:
+                _vcli._run(list(argv))
+                _code = 0
+            except SystemExit as _e:
+                _code = _e.code or 0
+            _output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = _stdout
+
+        return _code, _output
+
+    #
+    # first column of the rows of a listing
+    #
+    def names(self, output):
+        return [_line.split()[0] for _line in output.splitlines() if _line.strip() != '' and not _line.startswith('#')]
+
+
+class FakeBackendTest(VCLITestCase):
+    conf = {'session_cache': True, 'vm_index': True}
+
+    def test_list_vm(self):
+        _code, _output = self.vcli('list', 'vm', '--os', 'all')
+        self.assertEqual(_code, 0)
+        self.assertEqual(len(self.names(_output)), 40)
+
+    def test_session_cache(self):
+        self.vcli('list', 'host')
+        _roundTrips = self.backend.roundTrips
+        _code, _output = self.vcli('list', 'host', '-v')
+        self.assertEqual(_code, 0)
+        self.assertIn('Reusing cached vcenter session', _output)
+        self.assertIn('esx004', _output.lower())
+        self.assertTrue(self.backend.roundTrips > _roundTrips)
+
+    def test_vm_index(self):
+        _code, _output = self.vcli('info', 'server000007')
+        self.assertEqual(_code, 0)
+        self.assertEqual(len([_name for _name in os.listdir(os.path.join(self.home, '.vcli')) if _name.startswith('vmindex.')]), 1)
+        self.assertIn('server000007', _output)
+
+
+
+class RoundTripTest(VCLITestCase):
+    conf = {'page_size': 100000}
+
+    #
+    # round trips of a listing against an inventory of vms VMs
+    #
+    def roundTrips(self, vms, *argv):
+        import VCLIFake
+
+        self.backend = VCLIFake.install(dict(self.sizes, vms=vms, hosts=vms / 10))
+        _code, _output = self.vcli(*argv)
+        self.assertEqual(_code, 0)
+        self.assertEqual(len(self.names(_output)), vms)
+        return self.backend.roundTrips
+
+    def test_list_vm_constant(self):
+        self.assertEqual(self.roundTrips(100, 'list', 'vm', '--os', 'all'), self.roundTrips(5000, 'list', 'vm', '--os', 'all'))
+
+
+class ConfTest(VCLITestCase):
+
+    def writeConf(self, home, vcenter):
+        import yaml
+
+        _file = open(os.path.join(home, '.vcli.conf'), 'w')
+        yaml.safe_dump({'vcenter': vcenter}, _file, default_flow_style=False)
+        _file.close()
+
+    def test_conf_per_home(self):
+        from VCLI import VCLI
+
+        self.assertEqual(VCLI()._getConf('backend'), 'fake')
+
+        # another HOME, in the same process
+        _home = tempfile.mkdtemp(prefix='vcli-test.', dir=self.home)
+        self.writeConf(_home, {'host': 'vcenter2', 'username': 'fake', 'backend': 'fake', 'page_size': 7})
+        os.environ['HOME'] = _home
+        _vcli = VCLI()
+        self.assertEqual(_vcli._host, 'vcenter2')
+        self.assertEqual(_vcli._pageSize, 7)
+
+        # the same file, changed
+        self.writeConf(_home, {'host': 'vcenter3', 'username': 'fake', 'backend': 'fake'})
+        os.utime(os.path.join(_home, '.vcli.conf'), (0, 0))
+        self.assertEqual(VCLI()._host, 'vcenter3')
+
+
+class PropertyCacheTest(VCLITestCase):
+
+    def cpus(self, output):
+        return [_line.split()[1] for _line in output.splitlines() if _line.startswith('On ') or _line.startswith('Off ')]
+
+    def test_per_instance(self):
+        _code, _output = self.vcli('info', 'server000007')
+        self.assertEqual(_code, 0)
+        self.assertEqual(self.cpus(_output), ['1'])
+        _first = self.last
+        self.assertNotEqual(_first._propertyCache, {})
+
+        # a second command, nothing refreshed what the first one read
+        [_vm for _vm in self.backend.inventory.vms.values() if _vm.name == 'server000007'][0].numCpu = 7
+        _code, _output = self.vcli('info', 'server000007')
+        self.assertEqual(_code, 0)
+        self.assertEqual(self.cpus(_output), ['7'])
+        self.assertIsNot(self.last._propertyCache, _first._propertyCache)
+        self.assertTrue(self.last._propertyFetches > 0)
+
+    def test_keyed_by_type(self):
+        from pyVmomi import vim
+
+        _code, _output = self.vcli('info', 'server000007')
+        self.assertEqual(_code, 0)
+        _keys = self.last._propertyCache.keys()
+        self.assertTrue(len(_keys) > 0)
+        self.assertTrue(all([_type in [vim.VirtualMachine, vim.HostSystem, vim.Datastore] for _type, _moId in _keys]))
+
+
+class NameMatchTest(VCLITestCase):
+
+    def listVm(self, *args):
+        _code, _output = self.vcli(*(('list', 'vm', '--os', 'all') + args))
+        self.assertEqual(_code, 0)
+        return self.names(_output)
+
+    def test_substring(self):
+        self.assertEqual(self.listVm('SERVER00001'), ['server0000{0}'.format(_i) for _i in range(10, 20)])
+
+    def test_regex(self):
+        self.assertEqual(self.listVm('-r', 'SERVER00000\\D'), [])
+        self.assertEqual(len(self.listVm('-r', 'SERVER00000\\d')), 9)
+        self.assertEqual(self.listVm('-r', '^Server00004\\d$'), ['server000040'])
+
+    def test_glob(self):
+        self.assertEqual(self.listVm('-g', 'SERVER00001?'), ['server0000{0}'.format(_i) for _i in range(10, 20)])
+        self.assertEqual(self.listVm('-g', 'server00000[!1-8]'), ['server000009'])
+
+
+class RequestInventoryTest(VCLITestCase):
+
+    def test_listings_keep_nothing(self):
+        for _argv in [('list', 'vm'), ('list', 'host', '-l'), ('list', 'network', '-l'), ('list', 'datastore'), ('list', 'cluster')]:
+            _code, _output = self.vcli(*_argv)
+            self.assertEqual(_code, 0)
+            self.assertEqual(self.last._requestInventory, None, ' '.join(_argv))
+
+    def test_clone_reuses_vms(self):
+        _code, _output = self.vcli('clone', 'server000001', 'server000041', 'server000042')
+        self.assertEqual(_code, 0)
+        self.assertNotEqual(self.last._requestInventory, None)
+        self.assertEqual(len([_vm for _vm in self.backend.inventory.vms.values() if _vm.name in ['server000041', 'server000042']]), 2)
+
+    def test_add_tag_retrieves_vms_once(self):
+        from pyVmomi import vim
+
+        _invoke = self.backend.invoke
+        _retrievals = []
+
+        # retrievals of all the vms, not the reads of one vm's properties
+        def _counted(mo, info, args):
+            if info.wsdlName == 'RetrievePropertiesEx' and any([_propSet.type is vim.VirtualMachine and not isinstance(_spec.objectSet[0].obj, vim.VirtualMachine)
+                                                                for _spec in args[0] for _propSet in _spec.propSet]):
+                _retrievals.append(args[0])
+            return _invoke(mo, info, args)
+
+        self.backend.invoke = _counted
+        _code, _output = self.vcli('add', '-T', 'app01', 'server000001', 'server000002')
+        self.assertEqual(_code, 0)
+        self.assertEqual(len([_line for _line in _output.splitlines() if _line.startswith('Adding tag app01')]), 2)
+        self.assertEqual(len(_retrievals), 1)
+
+
+class AddNicTest(VCLITestCase):
+
+    def getVm(self, name):
+        return [_vm for _vm in self.backend.inventory.vms.values() if _vm.name == name][0]
+
+    def test_add_by_network(self):
+        _nics = self.getVm('server000001').nics
+        _code, _output = self.vcli('add', '-N', 'vlan103', 'server000001')
+        self.assertEqual(_code, 0)
+        self.assertIn('Adding vlan103 network to server000001', _output)
+        self.assertEqual(self.getVm('server000001').nics, _nics + 1)
+
+    def test_add_by_vlan(self):
+        _nics = self.getVm('server000002').nics
+        _code, _output = self.vcli('add', '-V', '105', 'server000002')
+        self.assertEqual(_code, 0)
+        self.assertIn('Adding vlan105 network to server000002', _output)
+        self.assertEqual(self.getVm('server000002').nics, _nics + 1)
+
+
+class ListClusterTest(VCLITestCase):
+
+    #
+    # sockets, cores, CPUs, used CPUs, memory GB, used memory GB and
+    # host names of a cluster, from the fake inventory
+    #
+    def expected(self, name):
+        _inventory = self.backend.inventory
+        _cluster = [_moId for _moId in _inventory.entities if _inventory.entities[_moId].props.get('name') == name][0]
+        _hosts = _inventory.entities[_cluster].props['host']
+        _vms = [_vm for _vm in _inventory.vms.values() if _vm.host in _hosts and _vm.powerState == 'poweredOn']
+        return [2 * len(_hosts), 32 * len(_hosts), 64 * len(_hosts), sum([_vm.numCpu for _vm in _vms]),
+                512 * len(_hosts), sum([_vm.memoryMB / 1024 for _vm in _vms]),
+                [_inventory.entities[_host].props['name'].split('.')[0].upper() for _host in _hosts]]
+
+    def rows(self, output):
+        import ast
+
+        _rows = {}
+        for _line in output.splitlines():
+            if _line.startswith('cluster'):
+                _fields = _line.split(None, 10)
+                _rows[_fields[0]] = [int(_fields[_i]) for _i in [1, 2, 3, 4, 6, 7]] + [ast.literal_eval(_fields[10])]
+        return _rows
+
+    def test_totals(self):
+        _code, _output = self.vcli('list', 'cluster')
+        self.assertEqual(_code, 0)
+        self.assertEqual(self.rows(_output), {'cluster01': self.expected('cluster01'), 'cluster02': self.expected('cluster02')})
+
+    def test_named_cluster(self):
+        _invoke = self.backend.invoke
+        _containers = []
+
+        def _counted(mo, info, args):
+            if info.wsdlName == 'CreateContainerView':
+                _containers.append(args[0]._moId)
+            return _invoke(mo, info, args)
+
+        self.backend.invoke = _counted
+        _code, _output = self.vcli('list', 'cluster', 'cluster02')
+        self.assertEqual(_code, 0)
+        self.assertEqual(self.rows(_output), {'cluster02': self.expected('cluster02')})
+
+        # the cluster lookup, then its hosts and its vms
+        _cluster = [_moId for _moId in self.backend.inventory.entities if self.backend.inventory.entities[_moId].props.get('name') == 'cluster02'][0]
+        self.assertEqual(_containers[1:], [_cluster, _cluster])
+
+
+class InventoryCacheTest(VCLITestCase):
+    conf = {'inventory_ttl': 3600}
+
+    def test_cache_read_back(self):
+        _code, _live = self.vcli('list', 'vm', '--os', 'all')
+        self.assertEqual(_code, 0)
+        self.assertEqual(len([_name for _name in os.listdir(os.path.join(self.home, '.vcli')) if _name.startswith('inventory.')]), 1)
+
+        _roundTrips = self.backend.roundTrips
+        _code, _cached = self.vcli('list', 'vm', '--os', 'all')
+        self.assertEqual(_code, 0)
+        self.assertEqual(_cached, _live)
+        self.assertEqual(self.backend.roundTrips, _roundTrips)
+
+    def test_cached_offline(self):
+        _code, _output = self.vcli('list', 'vm', '--os', 'all', '--cached')
+        self.assertEqual(_code, 1)
+        self.assertIn('No cached inventory', _output)
+
+        _code, _live = self.vcli('list', 'vm', '--os', 'all')
+        _roundTrips = self.backend.roundTrips
+        _code, _cached = self.vcli('list', 'vm', '--os', 'all', '--cached')
+        self.assertEqual(_code, 0)
+        self.assertEqual(_cached, _live)
+        self.assertEqual(self.backend.roundTrips, _roundTrips)
+
+    def test_invalidate(self):
+        self.vcli('list', 'vm', '--os', 'all')
+        _code, _output = self.vcli('stop', 'server000002')
+        self.assertEqual(_code, 0)
+        _code, _output = self.vcli('list', 'vm', 'server000002', '--os', 'all')
+        self.assertEqual(_code, 0)
+        self.assertIn('Off', [_line.split()[1] for _line in _output.splitlines() if _line.startswith('server000002')])
+
+    def test_write_actions_retrieve(self):
+        self.vcli('stop', 'server000001')
+
+        # renamed behind vcli's back, stop must not look it up in the cache
+        _vm = [_vm for _vm in self.backend.inventory.vms.values() if _vm.name == 'server000002'][0]
+        _vm.name = 'server000099'
+        _code, _output = self.vcli('stop', 'server000099')
+        self.assertEqual(_code, 0)
+        self.assertEqual(_vm.powerState, 'poweredOff')
+
+
+class NoCacheTest(VCLITestCase):
+
+    def test_no_cache_dir(self):
+        _code, _output = self.vcli('stop', 'server000002')
+        self.assertEqual(_code, 0)
+        self.assertFalse(os.path.exists(os.path.join(self.home, '.vcli')))
+
+
+
+class ParallelTest(VCLITestCase):
+    conf = {'parallel': 2}
+
+    def test_sharded_retrieval(self):
+        for _argv in [('list', 'vm', '--os', 'all'), ('list', 'host', '-l')]:
+            _code, _sharded = self.vcli(*(_argv + ('-v',)))
+            self.assertEqual(_code, 0)
+            self.assertIn('Retrieving 2 shards with 2 processes', _sharded)
+
+            _code, _serial = self.vcli(*_argv, _parallel=None)
+            self.assertEqual(_code, 0)
+            self.assertTrue(len(self.names(_serial)) > 0)
+
+            # same rows, in shard order, after the -v messages
+            _rows = set(_serial.splitlines())
+            self.assertEqual(sorted(_serial.splitlines()), sorted([_line for _line in _sharded.splitlines() if _line in _rows]))
+
+
+class InventorySyncTest(VCLITestCase):
+    conf = {'inventory_ttl': 0, 'inventory_sync': True, 'page_size': 16}
+
+    def getVm(self, name):
+        return [_vm for _vm in self.backend.inventory.vms.values() if _vm.name == name][0]
+
+    def test_sync_update(self):
+        _code, _output = self.vcli('list', 'vm', '--os', 'all')
+        self.assertEqual(_code, 0)
+        self.assertEqual(len(self.names(_output)), 40)
+
+        # changed behind vcli's back, by another client
+        self.getVm('server000002').powerState = 'poweredOff'
+        self.backend.inventory.removeVm(self.getVm('server000003').moId)
+        self.backend.inventory.cloneVm(self.getVm('server000004').moId, 'server000041')
+
+        _roundTrips = self.backend.roundTrips
+        _code, _output = self.vcli('list', 'vm', '--os', 'all', '-v')
+        self.assertEqual(_code, 0)
+        self.assertIn('Synced 3 object changes into the cached inventory', _output)
+        self.assertTrue(self.backend.roundTrips - _roundTrips < 5)
+
+        _rows = dict([(_line.split()[0], _line.split()) for _line in _output.splitlines() if _line.startswith('server')])
+        self.assertEqual(_rows['server000002'][1], 'Off')
+        self.assertNotIn('server000003', _rows)
+        self.assertIn('server000041', _rows)
+        self.assertEqual(len(_rows), 40)
+
+    def test_sync_collector_gone(self):
+        self.vcli('list', 'vm', '--os', 'all')
+
+        # as after a vcenter restart
+        self.backend._collectors.clear()
+        self.backend._filters.clear()
+
+        _code, _output = self.vcli('list', 'vm', '--os', 'all', '-v')
+        self.assertEqual(_code, 0)
+        self.assertIn('Inventory sync failed', _output)
+        self.assertEqual(len([_line for _line in _output.splitlines() if _line.startswith('server')]), 40)
+
+
+class StatsTest(VCLITestCase):
+
+    #
+    # (exit code, stderr) of a vcli command
+    #
+    def report(self, *argv):
+        import StringIO
+
+        _stderr = sys.stderr
+        sys.stderr = StringIO.StringIO()
+        try:
+            _code, _output = self.vcli(*argv)
+            _report = sys.stderr.getvalue()
+        finally:
+            sys.stderr = _stderr
+        return _code, _report
+
+    def test_stats_trace_fetches(self):
+        import json
+
+        _code, _report = self.report('--stats-json', '--trace-fetches', 'list', 'vm', '--os', 'all')
+        self.assertEqual(_code, 0)
+
+        # the calls after the login, counted by both
+        _stats = json.loads(_report.splitlines()[-1])
+        self.assertTrue(0 < _stats['soap_calls'] < self.backend.roundTrips)
+        self.assertIn('# Total:  {0:,} round trips'.format(_stats['soap_calls']), _report)
+        self.assertTrue(_stats['peak_rss_kb'] > 0)
+
+    def test_failed_command(self):
+        _code, _report = self.report('--stats', 'list', 'vm', '--os', 'all', '--cached')
+        self.assertEqual(_code, 1)
+        self.assertIn('# SOAP calls:', _report)
+
+
+class CassetteTest(VCLITestCase):
+    sizes = dict(VCLITestCase.sizes, wire=True)
+
+    def test_record_replay(self):
+        import json
+        import VCLIFake
+
+        _dir = os.path.join(self.home, 'cassette')
+        _code, _live = self.vcli('--record', _dir, 'list', 'vm', '--os', 'all')
+        self.assertEqual(_code, 0)
+        self.assertEqual(len(self.names(_live)), 40)
+
+        _session = json.load(open(os.path.join(_dir, 'session.json'), 'r'))
+        self.assertEqual(_session['cookie'], 'vmware_soap_session="recorded"')
+        self.assertNotIn('fake', open(os.path.join(_dir, 'session.json'), 'r').read())
+
+        # another vcenter, replay must not reach it
+        self.backend = VCLIFake.install(dict(self.sizes, vms=5))
+        _code, _replayed = self.vcli('--replay', _dir, 'list', 'vm', '--os', 'all')
+        self.assertEqual(_code, 0)
+        self.assertEqual(_replayed, _live)
+        self.assertEqual(self.backend.roundTrips, 0)
+
+    def test_scrub(self):
+        from VCLI import Cassette
+
+        _dir = os.path.join(self.home, 'cassette')
+        _cassette = Cassette(_dir)
+        _cassette.record('vapi', '{"params": {}}', 200, 'OK', [('Set-Cookie', 'vmware-api-session-id=live-id')], '{"result": {"output": "live-id"}}')
+        _cassette.scrub('live-id', Cassette.sessionId)
+        _cassette.record('vapi', '{"params": {"ctx": {"sessionId": "live-id"}}}', 200, 'OK', [], '{}')
+        _cassette.save(sessionId=Cassette.sessionId)
+
+        _text = open(os.path.join(_dir, 'vapi.jsonl'), 'r').read()
+        self.assertNotIn('live-id', _text)
+        self.assertEqual(_text.count('recorded'), 2)
+
+
+class DaemonTest(VCLITestCase):
+
+    #
+    # a VCLI set up as vcli daemon sets itself up
+    #
+    def daemon(self):
+        from VCLI import VCLI
+
+        _vcli = VCLI()
+        _vcli._secret = 'fake'
+        _vcli._loginVcenter()
+        _vcli._loginInventoryService()
+        _vcli._inventoryTtl = 0
+        _vcli._inventorySync = True
+        return _vcli
+
+    #
+    # one forwarded command, as the vcli wrapper sends it
+    #
+    def serve(self, daemon, *argv):
+        import socket
+        import threading
+
+        _server, _client = socket.socketpair()
+        _chunks = []
+
+        def _read():
+            while True:
+                _data = _client.recv(65536)
+                if not _data:
+                    break
+                _chunks.append(_data)
+
+        _reader = threading.Thread(target=_read)
+        _reader.start()
+        daemon._serve(_server, {'argv': list(argv), 'cwd': self.home})
+        _reader.join()
+        _client.close()
+
+        _output, _code = ''.join(_chunks).rsplit('\0', 1)
+        return int(_code), _output
+
+    def test_list_through_daemon(self):
+        _daemon = self.daemon()
+
+        _code, _output = self.serve(_daemon, 'list', 'vm', '--os', 'all')
+        self.assertEqual(_code, 0)
+        self.assertEqual(len(self.names(_output)), 40)
+
+        [_vm for _vm in self.backend.inventory.vms.values() if _vm.name == 'server000005'][0].powerState = 'poweredOff'
+        _code, _output = self.serve(_daemon, 'list', 'vm', 'server000005', '--os', 'all')
+        self.assertEqual(_code, 0)
+        self.assertEqual([_line.split()[1] for _line in _output.splitlines() if _line.startswith('server000005')], ['Off'])
+
+        _code, _output = self.serve(_daemon, 'list', 'host', '-l')
+        self.assertEqual(_code, 0)
+        self.assertEqual(len(self.names(_output)), 4)
+
+        _code, _output = self.serve(_daemon, 'list', 'nosuchobject')
+        self.assertNotEqual(_code, 0)
+
+    def test_stats_without_peak_rss(self):
+        import json
+
+        _daemon = self.daemon()
+        _code, _output = self.serve(_daemon, '--stats-json', 'list', 'host')
+        self.assertEqual(_code, 0)
+        _stats = json.loads(_output.splitlines()[-1])
+        self.assertIn('soap_calls', _stats)
+        self.assertNotIn('peak_rss_kb', _stats)
+
+        _code, _output = self.serve(_daemon, '--stats', 'list', 'host')
+        self.assertIn('the vcli daemon only has its lifetime peak', _output)
+
+    def test_no_prompt(self):
+        _daemon = self.daemon()
+
+        # the session expired and the password is gone
+        _daemon._si = None
+        _daemon._secret = None
+        _daemon._password = None
+        _code, _output = self.serve(_daemon, 'list', 'vm')
+        self.assertEqual(_code, 1)
+        self.assertIn('cannot prompt for the password', _output)
+        self.assertFalse(_daemon._serving)
+
+    def test_local_actions(self):
+        import imp
+
+        _wrapper = imp.load_source('vcliwrapper', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vcli'))
+        self.assertEqual(_wrapper.getAction(['list', 'vm']), 'list')
+        self.assertEqual(_wrapper.getAction(['--stats', 'decrypt', 'x']), 'decrypt')
+        self.assertEqual(_wrapper.getAction(['--profile', 'out.prof', 'encrypt']), 'encrypt')
+        self.assertEqual(_wrapper.getAction(['--prof', 'out.prof', '--trace-fetches', 'list', 'vm']), 'list')
+        self.assertEqual(_wrapper.getAction(['--record=dir', 'enc']), 'enc')
+        self.assertEqual(_wrapper.getAction(['-h']), None)
+
+        # daemon.sock exists, encrypt still runs here
+        os.mkdir(os.path.join(self.home, '.vcli'))
+        open(os.path.join(self.home, '.vcli', 'daemon.sock'), 'w').close()
+        self.assertEqual(_wrapper.forward(['--stats', 'encrypt']), None)
+
+
+# Start program
+if __name__ == '__main__':
+    unittest.main()